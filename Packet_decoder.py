@@ -1,191 +1,116 @@
+import argparse
 import struct
 import json
+import mmap
 import os
 import time
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from packet_schema import (
+    EVENT_CODE, EVENT_DETAILS_2021, HEADER_2021, HEADER_LAYOUTS, LAP_HISTORY_2021, MAX_LAP_HISTORY,
+    MAX_TYRE_STINTS, MERGED, NESTED_LIST, PACKET_FORMAT, PACKET_SCHEMAS, SCALAR,
+    SESSION_HISTORY_2021, TYRE_STINT_HISTORY_2021,
+    CompactRecord, LazyView, PacketSchema, camel_case, decode_body, decode_body_record, header_layout,
+    make_packet_view, make_record_type,
+)
 
 # Input and output paths
 INPUT_FILE = 'telemetry_logs\Mexico_2025-07-01_13-52-58.bin'
 OUTPUT_FILE = 'decoded_telemetry.json'
+COLUMNAR_OUTPUT_DIR = 'decoded_telemetry'
 
 HEADER_FORMAT = '<HBBBBQfIBB'
-HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
-NUM_CARS = 22
+HEADER_SIZE = HEADER_2021.size
+
+# Every logged packet is prefixed with its length (see Packet_reader.start_packet_logger)
+LENGTH_PREFIX = struct.Struct('<H')
+
+def iter_packet_spans(buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """Yield (offset, length) of every complete packet in a length-prefixed buffer, from start up to end."""
+    unpack_length = LENGTH_PREFIX.unpack_from
+    prefix_size = LENGTH_PREFIX.size
+    end = len(buffer) if end is None else end
+    offset = start
+    while offset + prefix_size <= end:
+        length = unpack_length(buffer, offset)[0]
+        payload = offset + prefix_size
+        if payload + length > end:
+            break  # Incomplete packet
+        yield payload, length
+        offset = payload + length
+
+def iter_mapped_packets(file_path: str,
+                        spans: Callable[[memoryview], Iterable[Tuple[int, int]]] = iter_packet_spans) -> Iterator[memoryview]:
+    """Memory-map a file and yield a zero-copy view of every (offset, length) span that spans(view) picks."""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    try:
+        for offset, length in spans(view):
+            yield view[offset:offset + length]
+    finally:
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # A caller still holds a packet view; the map closes once it is released
+
+def iter_packets(file_path: str) -> Iterator[memoryview]:
+    """Memory-map a log and yield each packet as a zero-copy memoryview; block logs are decompressed."""
+    from block_log import is_block_log, iter_block_packets
+
+    if os.path.getsize(file_path) and is_block_log(file_path):
+        yield from iter_block_packets(file_path)
+        return
+    yield from iter_mapped_packets(file_path)
 
 def read_packets(file_path: str) -> List[bytes]:
     """Read all packets from the binary file."""
-    packets = []
-    with open(file_path, 'rb') as f:
-        while True:
-            length_bytes = f.read(2)
-            if not length_bytes:
-                break
-            length = struct.unpack('<H', length_bytes)[0]
-            packet = f.read(length)
-            if len(packet) != length:
-                break  # Incomplete packet
-            packets.append(packet)
-    return packets
+    return [bytes(packet) for packet in iter_packets(file_path)]
 
 def decode_packet_header(packet: bytes) -> Dict[str, Any]:
     """Decode the common header for all packet types."""
-    header = struct.unpack_from(HEADER_FORMAT, packet)
-    return {
-        'packet_format': header[0],
-        'game_major_version': header[1],
-        'game_minor_version': header[2],
-        'packet_version': header[3],
-        'packet_id': header[4],
-        'session_uid': header[5],
-        'session_time': header[6],
-        'frame_identifier': header[7],
-        'player_car_index': header[8],
-        'secondary_player_car_index': header[9]
-    }
-# packet 0
-def decode_motion(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        car_motion_format = '<fff fff hhh hhh fff fff'  # 60 bytes per car
-        car_motion_size = struct.calcsize(car_motion_format)
+    return header_layout(packet).unpack(packet)
 
-        extra_data_format = '<4f4f4f4f4f3f3f3f f'
-        extra_data_size = struct.calcsize(extra_data_format)
+def build_decoder(schema: PacketSchema, packet_format: int) -> Callable[[bytes, Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Generate a decode_<name> function from a declarative packet schema."""
+    header_size = HEADER_LAYOUTS[packet_format].size
+    body_size = schema.fixed_size
+    label = schema.name.replace('_', ' ')
 
-        expected_size = HEADER_SIZE + (22 * car_motion_size) + extra_data_size
-
-        if len(packet) != expected_size:
-            print(f" Packet length mismatch: got {len(packet)}, expected {expected_size}")
-
-        player_index = header['player_car_index']
-        car_offset = HEADER_SIZE + (player_index * car_motion_size)
-        car_motion = struct.unpack_from(car_motion_format, packet, car_offset)
-
-        extra_offset = HEADER_SIZE + (22 * car_motion_size)
-        extra_data = struct.unpack_from(extra_data_format, packet, extra_offset)
-
-        def normalize(val): return max(-1.0, min(1.0, val / 32767.0))
+    def decoder(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if body_size is not None and len(packet) < header_size + body_size:
+            print(f" Packet too short for {label} (have {len(packet)}, need {header_size + body_size})")
+            return None
+        try:
+            return decode_body(schema, packet, header, header_size)
+        except Exception as e:
+            print(f" Error decoding {label} packet: {e}")
+            return None
 
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'position': dict(zip(('x', 'y', 'z'), car_motion[0:3])),
-            'velocity': dict(zip(('x', 'y', 'z'), car_motion[3:6])),
-            'forward_dir': dict(zip(('x', 'y', 'z'), map(normalize, car_motion[6:9]))),
-            'right_dir': dict(zip(('x', 'y', 'z'), map(normalize, car_motion[9:12]))),
-            'g_force': dict(zip(('lateral', 'longitudinal', 'vertical'), car_motion[12:15])),
-            'rotation': dict(zip(('yaw', 'pitch', 'roll'), car_motion[15:18])),
-            'suspension_position': list(extra_data[0:4]),
-            'suspension_velocity': list(extra_data[4:8]),
-            'suspension_acceleration': list(extra_data[8:12]),
-            'wheel_speed': list(extra_data[12:16]),
-            'wheel_slip': list(extra_data[16:20]),
-            'local_velocity': dict(zip(('x', 'y', 'z'), extra_data[20:23])),
-            'angular_velocity': dict(zip(('x', 'y', 'z'), extra_data[23:26])),
-            'angular_acceleration': dict(zip(('x', 'y', 'z'), extra_data[26:29])),
-            'front_wheels_angle': extra_data[29] if len(extra_data) > 29 else None
-        }
+    decoder.__name__ = decoder.__qualname__ = f"decode_{schema.name}"
+    decoder.__doc__ = f"Decode a {packet_format} {label} packet (generated from packet_schema)."
+    return decoder
 
-    except Exception as e:
-        print(f" Error decoding motion packet: {e}")
-        return None
+# packet 0
+decode_motion = build_decoder(PACKET_SCHEMAS[(2021, 0, 1)], 2021)
 
 # packet 1
-def decode_session(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        # 22 cars, each with 9 bytes of data
-        session_format = '<BbbBH BbBHHBBBBBB'
-        session_data = struct.unpack_from(session_format, packet, HEADER_SIZE)
-        
-        # Assist settings — 9 bytes at the very end
-        assist_format = '<BBBBBBBBB'
-        assist_data = struct.unpack_from(assist_format, packet, len(packet) - 9)
-
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'weather': session_data[0],
-            'track_temp': session_data[1],
-            'air_temp': session_data[2],
-            'total_laps': session_data[3],
-            'track_length': session_data[4],
-            'session_type': session_data[5],
-            'track_id': session_data[6],
-            'formula': session_data[7],
-            'session_time_left': session_data[8],
-            'session_duration': session_data[9],
-            'pit_speed_limit': session_data[10],
-            'game_paused': session_data[11],
-            'is_spectating': session_data[12],
-            'spectator_car_index': session_data[13],
-            'sli_pro_native_support': session_data[14],
-            'num_marshal_zones': session_data[15],
-            
-             # Assist settings
-            'assist_settings': {
-                'steering_assist': assist_data[0],
-                'braking_assist': assist_data[1],
-                'gearbox_assist': assist_data[2],
-                'pit_assist': assist_data[3],
-                'pit_release_assist': assist_data[4],
-                'ers_assist': assist_data[5],
-                'drs_assist': assist_data[6],
-                'racing_line': assist_data[7],
-                'racing_line_type': assist_data[8]
-            }
-        }
+decode_session = build_decoder(PACKET_SCHEMAS[(2021, 1, 1)], 2021)
 
-    except Exception as e:
-        print(f" Error decoding session packet: {e}")
-        return None
 # packet 2
-def decode_lap_data(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        lap_data_format = '<IIHHfffBBBBBBBBBBBBBBHHB'
-        lap_data_size = struct.calcsize(lap_data_format)
-
-        player_index = header['player_car_index']
-        offset = HEADER_SIZE + (lap_data_size * player_index)
-
-        lap_values = struct.unpack_from(lap_data_format, packet, offset)
+decode_lap_data = build_decoder(PACKET_SCHEMAS[(2021, 2, 1)], 2021)
 
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'last_lap_time_ms': lap_values[0],
-            'current_lap_time_ms': lap_values[1],
-            'sector1_time_ms': lap_values[2],
-            'sector2_time_ms': lap_values[3],
-            'lap_distance': lap_values[4],
-            'total_distance': lap_values[5],
-            'safety_car_delta': lap_values[6],
-            'car_position': lap_values[7],
-            'current_lap_num': lap_values[8],
-            'pit_status': lap_values[9],
-            'num_pit_stops': lap_values[10],
-            'sector': lap_values[11],
-            'current_lap_invalid': lap_values[12],
-            'penalties': lap_values[13],
-            'warnings': lap_values[14],
-            'num_unserved_drive_through_pens': lap_values[15],
-            'num_unserved_stop_go_pens': lap_values[16],
-            'grid_position': lap_values[17],
-            'driver_status': lap_values[18],
-            'result_status': lap_values[19],
-            'pit_lane_timer_active': lap_values[20],
-            'pit_lane_time_in_lane_ms': lap_values[21],
-            'pit_stop_timer_ms': lap_values[22],
-            'pit_stop_should_serve_pen': lap_values[23]
-        }
-
-    except Exception as e:
-        print(f" Error decoding lap data packet: {e}")
-        return None
 # packet 3
 def decode_event(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     try:
         event_offset = HEADER_SIZE
-        event_code = struct.unpack_from('<4s', packet, event_offset)[0].decode('utf-8')
+        event_code = EVENT_CODE.unpack(packet, event_offset)['event_code'].decode('utf-8')
 
         event_data = {
             'packet_id': header['packet_id'],
@@ -194,40 +119,9 @@ def decode_event(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, An
         }
 
         # Optional: decode event-specific data
-        if event_code == 'FTLP': # Fastest Lap
-            vehicle_idx, lap_time = struct.unpack_from('<Bf', packet, event_offset + 4)
-            event_data['vehicle_idx'] = vehicle_idx
-            event_data['lap_time'] = lap_time
-
-        elif event_code == 'RTMT': # Retirement
-            vehicle_idx = struct.unpack_from('<B', packet, event_offset + 4)[0]
-            event_data['vehicle_idx'] = vehicle_idx
-
-        elif event_code == 'RCWN': # Race Winner
-            vehicle_idx = struct.unpack_from('<B', packet, event_offset + 4)[0]
-            event_data['winner'] = vehicle_idx
-
-        elif event_code == 'PENA': # Penalty
-            pena_format = '<BBBBBHB'
-            values = struct.unpack_from(pena_format, packet, event_offset + 4)
-            event_data.update({
-                'penalty_type': values[0],
-                'infringement_type': values[1],
-                'vehicle_idx': values[2],
-                'other_vehicle_idx': values[3],
-                'time': values[4],
-                'lap_num': values[5],
-                'places_gained': values[6]
-            })
-
-        elif event_code == 'SPTP': # Speed Trap - Fastest Speed
-            sptp_format = '<BfB'
-            values = struct.unpack_from(sptp_format, packet, event_offset + 4)
-            event_data.update({
-                'vehicle_idx': values[0],
-                'speed': values[1],
-                'is_overall_fastest': values[2]
-            })
+        details = EVENT_DETAILS_2021.get(event_code)
+        if details:
+            event_data.update(details.unpack(packet, event_offset + EVENT_CODE.size))
 
         return event_data
 
@@ -236,357 +130,332 @@ def decode_event(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, An
         return None
 
 # packet 4
-def decode_participants(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        offset = HEADER_SIZE
-
-        num_active_cars = struct.unpack_from('<B', packet, offset)[0]
-        offset += 1
-
-        participant_format = '<BBBBBBB48sB'
-        participant_size = struct.calcsize(participant_format)
-
-        participants = []
-        for i in range(NUM_CARS):  # Usually 22
-            data = struct.unpack_from(participant_format, packet, offset + i * participant_size)
-            name = data[7].decode('utf-8', errors='ignore').rstrip('\x00')
-
-            participants.append({
-                'index': i,
-                'ai_controlled': bool(data[0]),
-                'driver_id': data[1],
-                'network_id': data[2],
-                'team_id': data[3],
-                'my_team': bool(data[4]),
-                'race_number': data[5],
-                'nationality': data[6],
-                'name': name,
-                'telemetry_public': bool(data[8])
-            })
-
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'num_active_cars': num_active_cars,
-            'participants': participants
-        }
-
-    except Exception as e:
-        print(f" Error decoding participants packet: {e}")
-        return None
+decode_participants = build_decoder(PACKET_SCHEMAS[(2021, 4, 1)], 2021)
 
 # packet 5
-def decode_car_setups(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        offset = HEADER_SIZE
-        setup_format = '<BBBBffffBBBBBBBBffffBf'
-        setup_size = struct.calcsize(setup_format)
-
-        car_setups = []
-        for i in range(NUM_CARS):  # Usually 22
-            values = struct.unpack_from(setup_format, packet, offset + i * setup_size)
-            car_setups.append({
-                'index': i,
-                'front_wing': values[0],
-                'rear_wing': values[1],
-                'on_throttle': values[2],
-                'off_throttle': values[3],
-                'front_camber': values[4],
-                'rear_camber': values[5],
-                'front_toe': values[6],
-                'rear_toe': values[7],
-                'front_suspension': values[8],
-                'rear_suspension': values[9],
-                'front_anti_roll_bar': values[10],
-                'rear_anti_roll_bar': values[11],
-                'front_suspension_height': values[12],
-                'rear_suspension_height': values[13],
-                'brake_pressure': values[14],
-                'brake_bias': values[15],
-                'rear_left_tyre_pressure': values[16],
-                'rear_right_tyre_pressure': values[17],
-                'front_left_tyre_pressure': values[18],
-                'front_right_tyre_pressure': values[19],
-                'ballast': values[20],
-                'fuel_load': values[21]
-            })
-
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'car_setups': car_setups
-        }
-
-    except Exception as e:
-        print(f" Error decoding car setups packet: {e}")
-        return None
+decode_car_setups = build_decoder(PACKET_SCHEMAS[(2021, 5, 1)], 2021)
 
 # packet 6
-def decode_car_telemetry(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    car_format = '<HfffBbHBBH4H4B4BH4f4B'
-    car_size = struct.calcsize(car_format)
-    player_index = header['player_car_index']
-    car_offset = HEADER_SIZE + (car_size * player_index)
+decode_car_telemetry = build_decoder(PACKET_SCHEMAS[(2021, 6, 1)], 2021)
 
-    try:
-        values = struct.unpack_from(car_format, packet, car_offset)
+# packet 7
+decode_car_status = build_decoder(PACKET_SCHEMAS[(2021, 7, 1)], 2021)
 
-        # Footer offset = after all 22 cars
-        footer_offset = HEADER_SIZE + (car_size * NUM_CARS)
-        mfd_panel_index, mfd_panel_secondary, suggested_gear = struct.unpack_from('<BBb', packet, footer_offset)
+# packet 8
+decode_final_classification = build_decoder(PACKET_SCHEMAS[(2021, 8, 1)], 2021)
 
-    except struct.error:
-        return None
+#not working on this since i rarely ever play online multiplayer, yes i play alone, shut up
+# packet 9
+def decode_lobby_info(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return None
 
+# packet 10
+decode_car_damage = build_decoder(PACKET_SCHEMAS[(2021, 10, 1)], 2021)
+
+# packet 11
+def lap_valid_flags(flags: int) -> Dict[str, bool]:
     return {
-        'packet_id': header['packet_id'],
-        'frame_id': header['frame_identifier'],
-        'speed': values[0],
-        'throttle': values[1],
-        'steer': values[2],
-        'brake': values[3],
-        'clutch': values[4],
-        'gear': values[5],
-        'engine_rpm': values[6],
-        'drs': values[7],
-        'rev_lights_percent': values[8],
-        'rev_lights_bit_value': values[9],
-        'brakes_temperature': list(values[10:14]),
-        'tyres_surface_temperature': list(values[14:18]),
-        'tyres_inner_temperature': list(values[18:22]),
-        'engine_temperature': values[22],
-        'tyres_pressure': list(values[23:27]),
-        'surface_type': list(values[27:31]),
-
-        # Footer
-        'mfd_panel_index': mfd_panel_index,
-        'mfd_panel_index_secondary': mfd_panel_secondary,
-        'suggested_gear': suggested_gear
+        'lap_valid': bool(flags & 0x01),
+        'sector1_valid': bool(flags & 0x02),
+        'sector2_valid': bool(flags & 0x04),
+        'sector3_valid': bool(flags & 0x08),
     }
 
-# packet 7
-def decode_car_status(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def decode_session_history(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     try:
         offset = HEADER_SIZE
-        car_format = '<5B 3f 2H 2B H 3B b f B 3f B'
-        car_size = struct.calcsize(car_format)
 
-        player_index = header['player_car_index']
-        car_offset = offset + (car_size * player_index)
-        values = struct.unpack_from(car_format, packet, car_offset)
+        summary = SESSION_HISTORY_2021.unpack(packet, offset)
+        offset += SESSION_HISTORY_2021.size
+
+        # Only the first num_laps entries are ever returned, so skip decoding the rest
+        lap_size = LAP_HISTORY_2021.size
+        lap_history = []
+        for i in range(min(summary['num_laps'], MAX_LAP_HISTORY)):
+            lap_offset = offset + i * lap_size
+            if lap_offset + lap_size > len(packet):
+                break
+            lap_data = LAP_HISTORY_2021.unpack(packet, lap_offset)
+            lap_data['lap_valid_flags'] = lap_valid_flags(lap_data.pop('lap_valid_bit_flags'))
+            lap_history.append(lap_data)
+
+        offset += MAX_LAP_HISTORY * lap_size
+
+        stint_size = TYRE_STINT_HISTORY_2021.size
+        tyre_stints = []
+        if len(packet) >= offset + (stint_size * MAX_TYRE_STINTS):
+            for i in range(min(summary['num_tyre_stints'], MAX_TYRE_STINTS)):
+                tyre_stints.append(TYRE_STINT_HISTORY_2021.unpack(packet, offset + i * stint_size))
 
         return {
             'packet_id': header['packet_id'],
             'frame_id': header['frame_identifier'],
-            'traction_control': values[0],
-            'abs': values[1],
-            'fuel_mix': values[2],
-            'brake_bias': values[3],
-            'pit_limiter_status': values[4],
-            'fuel_in_tank': values[5],
-            'fuel_capacity': values[6],
-            'fuel_remaining_laps': values[7],
-            'max_rpm': values[8],
-            'idle_rpm': values[9],
-            'max_gears': values[10],
-            'drs_allowed': values[11],
-            'drs_activation_distance': values[12],
-            'actual_tyre_compound': values[13],
-            'visual_tyre_compound': values[14],
-            'tyres_age_laps': values[15],
-            'vehicle_fia_flags': values[16],
-            'ers_store_energy': values[17],
-            'ers_deploy_mode': values[18],
-            'ers_harvested_mguk': values[19],
-            'ers_harvested_mguh': values[20],
-            'ers_deployed': values[21],
-            'network_paused': values[22]
+            **summary,
+            'lap_history': lap_history,
+            'tyre_stints': tyre_stints
         }
 
     except Exception as e:
-        print(f" Error decoding car status packet: {e}")
+        print(f" Error decoding session history packet: {e}")
         return None
 
-# packet 8
-def decode_final_classification(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        offset = HEADER_SIZE
-        NUM_CARS = struct.unpack_from('<B', packet, offset)[0]
-        offset += 1
-
-        classification_format = '<6B I d 3B 8B 8B 8B'
-        classification_size = struct.calcsize(classification_format)
 
-        player_index = header['player_car_index']
-        player_offset = offset + player_index * classification_size
-        values = struct.unpack_from(classification_format, packet, player_offset)
+# Decoders keyed by (packet_format, packet_id, packet_version)
+DECODER_REGISTRY = {
+    (2021, 0, 1): decode_motion,
+    (2021, 1, 1): decode_session,
+    (2021, 2, 1): decode_lap_data,
+    (2021, 3, 1): decode_event,
+    (2021, 4, 1): decode_participants,
+    (2021, 5, 1): decode_car_setups,
+    (2021, 6, 1): decode_car_telemetry,
+    (2021, 7, 1): decode_car_status,
+    (2021, 8, 1): decode_final_classification,
+    (2021, 9, 1): decode_lobby_info,
+    (2021, 10, 1): decode_car_damage,
+    (2021, 11, 1): decode_session_history,
+}
 
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'position': values[0],
-            'num_laps': values[1],
-            'grid_position': values[2],
-            'points': values[3],
-            'num_pit_stops': values[4],
-            'result_status': values[5],
-            'best_lap_time_ms': values[6],
-            'total_race_time': values[7],
-            'penalties_time': values[8],
-            'num_penalties': values[9],
-            'num_tyre_stints': values[10],
-            'tyre_stints_actual': list(values[11:19]),
-            'tyre_stints_visual': list(values[19:27]),
-            'tyre_stints_end_laps': list(values[27:35])
-        }
+# F1 2021 decoders by packet id
+PACKET_DECODERS = {
+    packet_id: decoder for (packet_format, packet_id, _), decoder in DECODER_REGISTRY.items()
+    if packet_format == 2021
+}
 
-    except Exception as e:
-        print(f" Error decoding final classification packet: {e}")
-        return None
+def get_decoder(header: Dict[str, Any]) -> Optional[Callable[[bytes, Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """Look up the decoder for a packet's format, id and version."""
+    return DECODER_REGISTRY.get((header['packet_format'], header['packet_id'], header['packet_version']))
 
-#not working on this since i rarely ever play online multiplayer, yes i play alone, shut up
-# packet 9
-def decode_lobby_info(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    return None
+# Compact output mode: named tuples from packet_schema instead of nested dicts.
+# Every record has .to_dict(), which returns exactly what the matching decode_* function does.
 
-# packet 10
-def decode_car_damage(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        car_format = '<4f4B4B15B'
-        car_size = struct.calcsize(car_format)
+HEADER_RECORD_TYPES = {
+    packet_format: make_record_type('PacketHeader', layout.names, layout.slot_shapes)
+    for packet_format, layout in HEADER_LAYOUTS.items()
+}
 
-        player_index = header['player_car_index']
-        player_offset = HEADER_SIZE + (car_size * player_index)
+# Header fast path: skips every field but the ones needed to route and place a packet
+HEADER_IDS = {
+    packet_format: layout.subset_struct(('packet_id', 'frame_identifier', 'player_car_index'))
+    for packet_format, layout in HEADER_LAYOUTS.items()
+}
+HEADER_ROUTES = {
+    packet_format: layout.subset_struct(('packet_version', 'packet_id', 'frame_identifier', 'player_car_index'))
+    for packet_format, layout in HEADER_LAYOUTS.items()
+}
 
-        if len(packet) < player_offset + car_size:
-            print(f" Packet too short for car damage (have {len(packet)}, need {player_offset + car_size})")
+def decode_header_record(packet: bytes):
+    """Decode the common header into a compact PacketHeader record."""
+    packet_format = PACKET_FORMAT.unpack_from(packet)[0]
+    layout = header_layout(packet)
+    record_type = HEADER_RECORD_TYPES.get(packet_format, HEADER_RECORD_TYPES[2021])
+    return record_type._make(layout.struct.unpack_from(packet))
+
+def decode_header_ids(packet: bytes) -> Tuple[int, int, int]:
+    """Read only (packet_id, frame_identifier, player_car_index) from the header."""
+    packet_format = PACKET_FORMAT.unpack_from(packet)[0]
+    return HEADER_IDS.get(packet_format, HEADER_IDS[2021]).unpack_from(packet)
+
+def build_record_decoder(schema: PacketSchema, packet_format: int) -> Callable:
+    """Generate the compact-record counterpart of build_decoder."""
+    header_size = HEADER_LAYOUTS[packet_format].size
+    body_size = schema.fixed_size
+    label = schema.name.replace('_', ' ')
+
+    def decoder(packet: bytes, packet_id: int, frame_id: int, player_index: int):
+        if body_size is not None and len(packet) < header_size + body_size:
+            print(f" Packet too short for {label} (have {len(packet)}, need {header_size + body_size})")
+            return None
+        try:
+            return decode_body_record(schema, packet, packet_id, frame_id, player_index, header_size)
+        except Exception as e:
+            print(f" Error decoding {label} packet: {e}")
             return None
 
-        values = struct.unpack_from(car_format, packet, player_offset)
+    decoder.__name__ = decoder.__qualname__ = f"decode_{schema.name}_record"
+    return decoder
 
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'tyres_wear': list(values[0:4]),
-            'tyres_damage': list(values[4:8]),
-            'brakes_damage': list(values[8:12]),
-            'front_left_wing_damage': values[12],
-            'front_right_wing_damage': values[13],
-            'rear_wing_damage': values[14],
-            'floor_damage': values[15],
-            'diffuser_damage': values[16],
-            'sidepod_damage': values[17],
-            'drs_fault': values[18],
-            'gearbox_damage': values[19],
-            'engine_damage': values[20],
-            'engine_mguh_wear': values[21],
-            'engine_es_wear': values[22],
-            'engine_ce_wear': values[23],
-            'engine_ice_wear': values[24],
-            'engine_mguk_wear': values[25],
-            'engine_tc_wear': values[26]
-        }
+EventRecord = make_record_type('Event', ('packet_id', 'frame_id', 'event_code', 'details'),
+                               (SCALAR, SCALAR, SCALAR, MERGED))
+EVENT_DETAIL_TYPES = {
+    code: make_record_type(f"Event{camel_case(code.lower())}", record.names, record.slot_shapes)
+    for code, record in EVENT_DETAILS_2021.items()
+}
+
+def decode_event_record(packet: bytes, packet_id: int, frame_id: int, player_index: int):
+    try:
+        event_offset = HEADER_SIZE
+        event_code = EVENT_CODE.struct.unpack_from(packet, event_offset)[0].decode('utf-8')
+
+        details = None
+        record = EVENT_DETAILS_2021.get(event_code)
+        if record:
+            values = record.struct.unpack_from(packet, event_offset + EVENT_CODE.size)
+            details = EVENT_DETAIL_TYPES[event_code]._make(record.compact_values(values))
+
+        return EventRecord(packet_id, frame_id, event_code, details)
 
     except Exception as e:
-        print(f" Error decoding car from here damage packet: {e}")
+        print(f" Error decoding event packet: {e}")
         return None
 
-# packet 11
-def decode_session_history(packet: bytes, header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+class LapHistoryRecord(make_record_type('LapHistory', LAP_HISTORY_2021.names, LAP_HISTORY_2021.slot_shapes)):
+    __slots__ = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        decoded = CompactRecord.to_dict(self)
+        decoded['lap_valid_flags'] = lap_valid_flags(decoded.pop('lap_valid_bit_flags'))
+        return decoded
+
+TyreStintRecord = make_record_type('TyreStint', TYRE_STINT_HISTORY_2021.names, TYRE_STINT_HISTORY_2021.slot_shapes)
+SessionHistoryRecord = make_record_type(
+    'SessionHistory',
+    ('packet_id', 'frame_id') + SESSION_HISTORY_2021.names + ('lap_history', 'tyre_stints'),
+    (SCALAR, SCALAR) + SESSION_HISTORY_2021.slot_shapes + (NESTED_LIST, NESTED_LIST),
+)
+
+def decode_session_history_record(packet: bytes, packet_id: int, frame_id: int, player_index: int):
     try:
         offset = HEADER_SIZE
+        summary = SESSION_HISTORY_2021.struct.unpack_from(packet, offset)
+        offset += SESSION_HISTORY_2021.size
+        num_laps, num_stints = summary[1], summary[2]
 
-        car_idx, num_laps, num_stints, best_lap, best_s1, best_s2, best_s3 = struct.unpack_from('<7B', packet, offset)
-        offset += 7
+        lap_size = LAP_HISTORY_2021.size
+        unpack_lap = LAP_HISTORY_2021.struct.unpack_from
+        lap_count = min(num_laps, MAX_LAP_HISTORY, max(0, (len(packet) - offset) // lap_size))
+        lap_history = tuple(LapHistoryRecord._make(unpack_lap(packet, offset + i * lap_size)) for i in range(lap_count))
 
-        lap_history_format = '<IHHHB'
-        lap_size = struct.calcsize(lap_history_format)
+        offset += MAX_LAP_HISTORY * lap_size
 
-        lap_history = []
-        for i in range(100):
-            lap_offset = offset + i * lap_size
-            if lap_offset + lap_size > len(packet):
-                break
-            lap_data = struct.unpack_from(lap_history_format, packet, lap_offset)
-            lap_history.append({
-                'lap_time_ms': lap_data[0],
-                'sector1_time_ms': lap_data[1],
-                'sector2_time_ms': lap_data[2],
-                'sector3_time_ms': lap_data[3],
-                'lap_valid_flags': {
-                    'lap_valid': bool(lap_data[4] & 0x01),
-                    'sector1_valid': bool(lap_data[4] & 0x02),
-                    'sector2_valid': bool(lap_data[4] & 0x04),
-                    'sector3_valid': bool(lap_data[4] & 0x08),
-                }
-            })
-
-        offset += 100 * lap_size
+        stint_size = TYRE_STINT_HISTORY_2021.size
+        unpack_stint = TYRE_STINT_HISTORY_2021.struct.unpack_from
+        tyre_stints = ()
+        if len(packet) >= offset + (stint_size * MAX_TYRE_STINTS):
+            tyre_stints = tuple(
+                TyreStintRecord._make(unpack_stint(packet, offset + i * stint_size))
+                for i in range(min(num_stints, MAX_TYRE_STINTS))
+            )
 
-        tyre_stints = []
-        if len(packet) >= offset + (3 * 8):  # 3 bytes × 8 entries
-            for i in range(8):
-                stint_offset = offset + i * 3
-                stint = struct.unpack_from('<BBB', packet, stint_offset)
-                tyre_stints.append({
-                    'end_lap': stint[0],
-                    'tyre_actual_compound': stint[1],
-                    'tyre_visual_compound': stint[2]
-                })
-
-        return {
-            'packet_id': header['packet_id'],
-            'frame_id': header['frame_identifier'],
-            'car_index': car_idx,
-            'num_laps': num_laps,
-            'num_tyre_stints': num_stints,
-            'best_lap_lap_num': best_lap,
-            'best_sector1_lap_num': best_s1,
-            'best_sector2_lap_num': best_s2,
-            'best_sector3_lap_num': best_s3,
-            'lap_history': lap_history[:num_laps],
-            'tyre_stints': tyre_stints[:num_stints]
-        }
+        return SessionHistoryRecord(packet_id, frame_id, *summary, lap_history, tyre_stints)
 
     except Exception as e:
         print(f" Error decoding session history packet: {e}")
         return None
 
-
-PACKET_DECODERS = {
-    0: decode_motion,
-    1: decode_session,
-    2: decode_lap_data,
-    3: decode_event,
-    4: decode_participants,
-    5: decode_car_setups,
-    6: decode_car_telemetry,
-    7: decode_car_status,
-    8: decode_final_classification,
-    9: decode_lobby_info,
-    10: decode_car_damage,
-    11: decode_session_history,
+# Record decoders keyed like DECODER_REGISTRY; lobby info has no decoder yet
+RECORD_DECODER_REGISTRY = {
+    key: build_record_decoder(schema, key[0]) for key, schema in PACKET_SCHEMAS.items()
 }
+RECORD_DECODER_REGISTRY[(2021, 3, 1)] = decode_event_record
+RECORD_DECODER_REGISTRY[(2021, 11, 1)] = decode_session_history_record
+
+def decode_packet_record(packet: bytes):
+    """Decode a packet into its compact record type, or None if it has no decoder."""
+    packet_format = PACKET_FORMAT.unpack_from(packet)[0]
+    route = HEADER_ROUTES.get(packet_format, HEADER_ROUTES[2021])
+    packet_version, packet_id, frame_id, player_index = route.unpack_from(packet)
+
+    decoder = RECORD_DECODER_REGISTRY.get((packet_format, packet_id, packet_version))
+    return decoder(packet, packet_id, frame_id, player_index) if decoder else None
+
+def packet_view(packet: bytes) -> Optional[LazyView]:
+    """Wrap a packet in a lazy view that decodes each field on first access.
+
+    Only packets described by a schema get a view; event, lobby info and session
+    history packets return None and go through the regular decoders.
+    """
+    packet_format = PACKET_FORMAT.unpack_from(packet)[0]
+    route = HEADER_ROUTES.get(packet_format, HEADER_ROUTES[2021])
+    packet_version, packet_id, frame_id, player_index = route.unpack_from(packet)
+
+    schema = PACKET_SCHEMAS.get((packet_format, packet_id, packet_version))
+    if schema is None:
+        return None
+    return make_packet_view(schema, packet, packet_id, frame_id, player_index, HEADER_LAYOUTS[packet_format].size)
 
-def main():
-    packets = read_packets(INPUT_FILE)
-    print(f"Processing {len(packets)} packets...")
-
-    frames = defaultdict(dict)
-    start_time = time.time()
+def iter_packet_records(packets: Iterable) -> Iterator[Any]:
+    """Decode packets in order into compact records, skipping ones without a decoder."""
+    for packet in packets:
+        record = decode_packet_record(packet)
+        if record is not None:
+            yield record
 
+def iter_decoded(packets: Iterable) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """Decode packets in order, yielding (frame_id, packet_name, decoded) for each success."""
     for packet in packets:
         header = decode_packet_header(packet)
-        packet_id = header['packet_id']
         frame_id = header['frame_identifier']
 
-        decoder = PACKET_DECODERS.get(packet_id)
+        decoder = get_decoder(header)
         if decoder:
             decoded = decoder(packet, header)
             if decoded:
                 # Store under the frame_id → packet_type name (optional fallback to 'packet_{id}')
                 packet_name = decoder.__name__.replace("decode_", "")
-                frames[frame_id][packet_name] = decoded
+                yield frame_id, packet_name, decoded
+
+def shard_log(file_path: str, num_shards: int) -> List[Tuple[int, int]]:
+    """Split a log into (start, end) byte ranges that begin and end on packet (or block) boundaries."""
+    from block_log import is_block_log, load_block_index
+    from packet_index import index_path_for, load_index
+
+    if os.path.getsize(file_path) and is_block_log(file_path):
+        ends = [block.end for block in load_block_index(file_path)]
+    elif os.path.exists(index_path_for(file_path)):
+        index = load_index(file_path)
+        # Each packet ends where its payload ends; boundaries sit right after a packet
+        ends = (index['offset'] + index['length']).tolist()
+    else:
+        ends = []
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    ends = [offset + length for offset, length in iter_packet_spans(mapped)]
+    if not ends:
+        return []
+
+    shards = []
+    start = 0
+    target = ends[-1] / num_shards
+    for end in ends:
+        if end >= target * (len(shards) + 1) or end == ends[-1]:
+            shards.append((start, end))
+            start = end
+    return shards
+
+def decode_shard(shard: Tuple[str, int, int]) -> List[Tuple[int, str, Dict[str, Any]]]:
+    """Decode one byte range of a log; runs inside a worker process."""
+    from block_log import is_block_log, iter_block_packets
+
+    file_path, start, end = shard
+    if is_block_log(file_path):
+        return list(iter_decoded(iter_block_packets(file_path, start, end)))
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as whole, whole[start:end] as view:
+            return list(iter_decoded(
+                view[offset:offset + length] for offset, length in iter_packet_spans(view)
+            ))
+
+def decode_to_json(input_file: str, output_file: str, workers: int = 1) -> None:
+    """Decode every packet and save the frames as one JSON dict keyed by frame_id."""
+    print(f"Processing {input_file} ({os.path.getsize(input_file)} bytes)...")
+
+    frames = defaultdict(dict)
+    start_time = time.time()
+
+    if workers > 1:
+        # Several shards per worker keeps the pool busy when packet mixes are uneven
+        shards = [(input_file, start, end) for start, end in shard_log(input_file, workers * 4)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() returns shards in file order, so later packets still overwrite earlier ones
+            for entries in pool.map(decode_shard, shards):
+                for frame_id, packet_name, decoded in entries:
+                    frames[frame_id][packet_name] = decoded
+    else:
+        for frame_id, packet_name, decoded in iter_decoded(iter_packets(input_file)):
+            frames[frame_id][packet_name] = decoded
 
     end_time = time.time()
     print(f"Decoded data for {len(frames)} frame_ids in {end_time - start_time:.2f} seconds")
@@ -594,10 +463,51 @@ def main():
     # Optional: sort by frame_id for consistent output
     sorted_frames = dict(sorted(frames.items()))
 
-    with open(OUTPUT_FILE, 'w') as f:
+    with open(output_file, 'w') as f:
         json.dump(sorted_frames, f, indent=2)
 
-    print(f" Decoding complete → saved to {OUTPUT_FILE}")
+    print(f" Decoding complete → saved to {output_file}")
+
+def decode_to_columns(input_file: str, output_dir: str) -> None:
+    """Batch-decode the log and save one memory-mappable array per packet type and field."""
+    from batch_decoder import decode_log_batch
+    from columnar_store import write_columns
+    from session_table import SESSION_TABLE, join_packets
+
+    print(f"Processing {input_file} ({os.path.getsize(input_file)} bytes)...")
+    start_time = time.time()
+
+    decoded = decode_log_batch(input_file)
+    packets = sum(len(columns['packet_id']) for columns in decoded.values())
+    # The player's fields from every packet type, aligned onto the car telemetry samples
+    table = join_packets(decoded)
+    if table:
+        decoded[SESSION_TABLE] = table
+    write_columns(output_dir, decoded, source=os.path.basename(input_file))
+
+    end_time = time.time()
+    print(f"Decoded {packets} packets in {end_time - start_time:.2f} seconds")
+    print(f" Decoding complete → saved to {output_dir}")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Decode an F1 2021 telemetry log.")
+    parser.add_argument('input', nargs='?', default=INPUT_FILE, help="length-prefixed .bin log")
+    parser.add_argument('--format', choices=('columnar', 'json'), default='columnar',
+                        help="columnar .npy store (default) or the legacy frame-keyed JSON")
+    parser.add_argument('--output', help="output directory (columnar) or file (json)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="decode byte-range shards of the log in N processes (json format)")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.format != 'json':
+        parser.error("--workers applies to --format json; the columnar batch decode is already vectorized")
+
+    if args.format == 'json':
+        decode_to_json(args.input, args.output or OUTPUT_FILE, args.workers)
+    else:
+        decode_to_columns(args.input, args.output or COLUMNAR_OUTPUT_DIR)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
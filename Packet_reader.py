@@ -1,7 +1,19 @@
+import argparse
+import asyncio
+import signal
 import socket
 import struct
 import os
+import time
 from datetime import datetime
+from typing import Optional
+
+from block_log import CODECS, BlockLogWriter
+from ingest_metrics import IngestMetrics
+from ingest_pipeline import DROP_NEWEST, DROP_OLDEST, run_pipeline
+from lap_index import LapIndexWriter
+from packet_index import IndexWriter
+from packet_ring import PacketRing
 
 # Folder to store logs
 LOG_FOLDER = "telemetry_logs"
@@ -37,40 +49,169 @@ def dump_session_packet(packet):
     return fields[6]
 
 
-def start_packet_logger():
-    UDP_IP = "127.0.0.1"
-    UDP_PORT = 20777
-
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.bind((UDP_IP, UDP_PORT))
-    print(f" Listening for telemetry on {UDP_IP}:{UDP_PORT}...")
-
-    # Ensure folder exists
-    os.makedirs(LOG_FOLDER, exist_ok=True)
-
-    track_name = None
-    file = None
-
-    while True:
-        data, _ = sock.recvfrom(2048)
-
-        if not track_name:
+class PacketLogWriter:
+    """Opens a log once the first Session packet names the track, then appends every packet.
+
+    With a codec the log is written as compressed blocks (see block_log) instead of raw packets.
+    The last RING_SECONDS of packets are also kept in memory: whatever arrived before the
+    Session packet is backfilled into the log, and snapshot() saves them on demand.
+    """
+
+    def __init__(self, log_folder: str = LOG_FOLDER, codec: Optional[str] = None):
+        self.log_folder = log_folder
+        self.codec = codec
+        self.recent = PacketRing()
+        self.snapshot_requested = False
+        self.blocks = None
+        self.track_name = None
+        self.file_path = None
+        self.file = None
+        self.index = None
+        self.laps = None
+        self.offset = 0
+
+    def write(self, data: bytes, received_at: Optional[float] = None) -> None:
+        if not self.track_name:
             header_format = '<HBBBBQfIBB'
             packet_id = struct.unpack_from(header_format, data)[4]
 
             if packet_id == 1:
                 track_id = dump_session_packet(data)
                 if track_id is not None:
-                    track_name = TRACK_NAMES.get(track_id, f"UnknownTrack_{track_id}")
-                    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                    filename = f"{track_name}_{timestamp}.bin"
-                    file_path = os.path.join(LOG_FOLDER, filename)
-                    file = open(file_path, 'ab')
-                    print(f"\n Logging to: {file_path}")
+                    self.open(TRACK_NAMES.get(track_id, f"UnknownTrack_{track_id}"))
+                    self.backfill()
+
+        self.append(data)
+        self.recent.append(data, received_at)
+        if self.snapshot_requested:
+            self.snapshot_requested = False
+            self.snapshot()
+
+    def append(self, data: bytes) -> None:
+        if self.blocks:
+            if data[5] == 2:
+                self.laps.append(self.blocks.offset, data)
+            self.blocks.write(data)
+        elif self.file:
+            self.file.write(struct.pack('<H', len(data)))
+            self.file.write(data)
+            self.offset += 2
+            self.index.append(self.offset, data)
+            if data[5] == 2:
+                self.laps.append(self.offset, data)
+            self.offset += len(data)
+
+    def open(self, track_name: str) -> None:
+        # Ensure folder exists
+        os.makedirs(self.log_folder, exist_ok=True)
+
+        self.track_name = track_name
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = f"{track_name}_{timestamp}.bin"
+        self.file_path = os.path.join(self.log_folder, filename)
+        self.laps = LapIndexWriter(self.file_path)
+        if self.codec:
+            self.blocks = BlockLogWriter(self.file_path, self.codec)
+            print(f"\n Logging to: {self.file_path} ({self.codec} blocks)")
+            return
+
+        self.file = open(self.file_path, 'ab')
+        self.index = IndexWriter(self.file_path)
+        self.offset = self.file.tell()
+        print(f"\n Logging to: {self.file_path}")
+
+    def backfill(self) -> None:
+        """Log the packets received before the log was opened."""
+        pending = self.recent.snapshot()
+        for data in pending:
+            self.append(data)
+        if pending:
+            print(f" Backfilled {len(pending)} packets received before the session packet")
+
+    def snapshot(self, seconds: Optional[float] = None) -> str:
+        """Save the last seconds of packets (everything buffered by default) as a raw log; returns its path."""
+        os.makedirs(self.log_folder, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        file_path = os.path.join(self.log_folder, f"{self.track_name or 'PreSession'}_snapshot_{timestamp}.bin")
+        count = self.recent.write_snapshot(file_path, seconds)
+        print(f"\n Saved {count} recent packets to: {file_path}")
+        return file_path
+
+    def write_batch(self, batch) -> None:
+        """Write (data, received_at) pairs, keeping their receive times for the recent packet ring."""
+        for data, received_at in batch:
+            self.write(data, received_at)
+
+    def close(self) -> None:
+        if self.blocks:
+            self.blocks.close()
+        if self.file:
+            self.file.close()
+            self.index.close()
+        if self.laps:
+            self.laps.close()
+
+
+def install_snapshot_signal(writer: PacketLogWriter) -> None:
+    """Save the recent packets on SIGUSR1 (kill -USR1 <pid>) where the platform has it."""
+    if hasattr(signal, 'SIGUSR1'):
+        # Only flag it here; the snapshot is taken after the next packet, outside the ring's lock
+        signal.signal(signal.SIGUSR1, lambda signum, frame: setattr(writer, 'snapshot_requested', True))
+
+
+def start_packet_logger(codec: Optional[str] = None):
+    UDP_IP = "127.0.0.1"
+    UDP_PORT = 20777
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((UDP_IP, UDP_PORT))
+    print(f" Listening for telemetry on {UDP_IP}:{UDP_PORT}...")
 
-        if file:
-            file.write(struct.pack('<H', len(data)))
-            file.write(data)
+    writer = PacketLogWriter(codec=codec)
+    install_snapshot_signal(writer)
+    metrics = IngestMetrics(UDP_PORT)
+
+    try:
+        while True:
+            data, _ = sock.recvfrom(2048)
+            metrics.observe_datagram(data)
+
+            started = time.perf_counter()
+            writer.write(data)
+            metrics.write_latency.record(time.perf_counter() - started)
+    except KeyboardInterrupt:
+        print("\n Stopping logger...")
+    finally:
+        # Report while the socket still exists so its kernel drop counter can be read
+        metrics.report()
+        sock.close()
+        writer.close()
+
+
+def start_async_packet_logger(drop_policy: str = DROP_OLDEST, codec: Optional[str] = None):
+    """Log through the asyncio pipeline so disk writes never hold up the socket."""
+    writer = PacketLogWriter(codec=codec)
+    install_snapshot_signal(writer)
+    try:
+        # Raw datagrams pass straight through with their receive time; the writer runs on the persistence thread
+        asyncio.run(run_pipeline(lambda data, received_at: (data, received_at), writer.write_batch,
+                                 drop_policy=drop_policy, metrics=IngestMetrics(20777), receive_times=True))
+    except KeyboardInterrupt:
+        print("\n Stopping logger...")
+    finally:
+        writer.close()
 
 if __name__ == "__main__":
-    start_packet_logger()
+    parser = argparse.ArgumentParser(description="Log F1 2021 UDP telemetry to telemetry_logs/.")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="receive, decode and write on separate asyncio pipeline stages")
+    parser.add_argument('--drop-policy', choices=(DROP_OLDEST, DROP_NEWEST), default=DROP_OLDEST,
+                        help="what to shed when the receive queue is full (--async only)")
+    parser.add_argument('--compress', choices=sorted(CODECS),
+                        help="write compressed blocks with a block index instead of raw packets")
+    args = parser.parse_args()
+
+    if args.use_async:
+        start_async_packet_logger(args.drop_policy, args.compress)
+    else:
+        start_packet_logger(args.compress)
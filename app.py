@@ -1,35 +1,67 @@
 import dash
 from dash import dcc, html, Input, Output, State
-import plotly.graph_objs as go
 import json
+import os
 import numpy as np
 
-# Load decoded telemetry
-with open('decoded_telemetry.json') as f:
-    frames = json.load(f)
-
-# Extract data from car_telemetry
-frame_ids = []
-throttle = []
-brake = []
-gear = []
-
-for frame_id, packets in frames.items():
-    telemetry = packets.get("car_telemetry")
-    if telemetry:
-        time_sec = int(frame_id) / 60.0  # convert frame_id to seconds
-        frame_ids.append(time_sec)
-        throttle.append(telemetry.get("throttle", 0))
-        brake.append(telemetry.get("brake", 0))
-        gear.append(telemetry.get("gear", 0))
-
-# Sort by time
-combined = sorted(zip(frame_ids, throttle, brake, gear), key=lambda x: x[0])
-frame_ids, throttle, brake, gear = zip(*combined)
-frame_ids = np.array(frame_ids)
-throttle = np.array(throttle)
-brake = np.array(brake)
-gear = np.array(gear)
+from batch_decoder import player_columns
+from columnar_store import load_columns, manifest_path
+from lod_pyramid import load_or_build_pyramid
+
+# Decoded telemetry: columnar store from Packet_decoder.py, or the legacy JSON
+DECODED_DIR = 'decoded_telemetry'
+DECODED_JSON = 'decoded_telemetry.json'
+# Level-of-detail pyramid cached next to the decoded data
+PYRAMID_FILE = 'lod_pyramid.npz'
+
+# Memory-map only the columns the dashboard plots; a store without car telemetry falls back to the JSON
+columns = load_columns(
+    DECODED_DIR, 'car_telemetry',
+    fields=['frame_identifier', 'player_car_index', 'throttle', 'brake', 'gear'],
+) if os.path.exists(manifest_path(DECODED_DIR)) else {}
+
+if columns:
+    source_path = manifest_path(DECODED_DIR)
+    pyramid_path = os.path.join(DECODED_DIR, PYRAMID_FILE)
+    telemetry = player_columns(columns)
+    order = np.argsort(telemetry['frame_identifier'], kind='stable')
+    frame_ids = telemetry['frame_identifier'][order] / 60.0  # convert frame_id to seconds
+    throttle = telemetry['throttle'][order]
+    brake = telemetry['brake'][order]
+    gear = telemetry['gear'][order]
+else:
+    source_path = DECODED_JSON
+    pyramid_path = DECODED_JSON + '.lod.npz'
+    # Load decoded telemetry
+    with open(DECODED_JSON) as f:
+        frames = json.load(f)
+
+    # Extract data from car_telemetry
+    frame_ids = []
+    throttle = []
+    brake = []
+    gear = []
+
+    for frame_id, packets in frames.items():
+        telemetry = packets.get("car_telemetry")
+        if telemetry:
+            time_sec = int(frame_id) / 60.0  # convert frame_id to seconds
+            frame_ids.append(time_sec)
+            throttle.append(telemetry.get("throttle", 0))
+            brake.append(telemetry.get("brake", 0))
+            gear.append(telemetry.get("gear", 0))
+
+    # Sort by time
+    combined = sorted(zip(frame_ids, throttle, brake, gear), key=lambda x: x[0])
+    frame_ids, throttle, brake, gear = zip(*combined)
+    frame_ids = np.array(frame_ids)
+    throttle = np.array(throttle)
+    brake = np.array(brake)
+    gear = np.array(gear)
+
+# Min/max levels of detail so any zoom draws a bounded number of points
+pyramid = load_or_build_pyramid(pyramid_path, frame_ids,
+                                {'throttle': throttle, 'brake': brake, 'gear': gear}, source_path)
 
 # Dash app setup
 app = dash.Dash(__name__)
@@ -37,9 +69,19 @@ app.title = "F1 Telemetry Dashboard"
 
 # Parameters
 max_time = frame_ids[-1]
-window_size = 5  # seconds
+window_size = 5  # seconds shown by default
 update_interval = 50  # milliseconds between updates
-scroll_speed = 0.05  # seconds advanced each update
+scroll_fraction = 0.01  # of the window advanced each update (0.05 s for 5 s)
+chunk_windows = 12  # windows of samples sent to the browser per request
+max_points = 1000  # per trace and window
+gear_max = int(max(gear))
+
+zoom_options = [
+    {'label': '5 s', 'value': 5},
+    {'label': '30 s', 'value': 30},
+    {'label': '2 min', 'value': 120},
+    {'label': 'Session', 'value': float(np.ceil(max_time)) or 1.0},
+]
 
 # Layout
 app.layout = html.Div([
@@ -52,12 +94,21 @@ app.layout = html.Div([
                   style={'margin': '10px'}),
         html.Button('⟲ Reset', id='reset-button', n_clicks=0,
                   style={'margin': '10px'}),
+        dcc.RadioItems(id='zoom', options=zoom_options, value=window_size, inline=True,
+                       style={'display': 'inline-block', 'margin': '10px'}),
     ], style={'textAlign': 'center'}),
+
+    dcc.Slider(id='position-slider', min=0, max=max_time, value=0,
+               marks=None, updatemode='drag', tooltip={'placement': 'bottom'}),
     
     dcc.Graph(id='throttle-brake-graph'),
     dcc.Graph(id='gear-graph'),
 
-    html.Div(id='current-window', style={'display': 'none'}, children=str(0)),
+    # Playback position (window start, seconds), advanced in the browser
+    dcc.Store(id='current-window', data=0),
+    # Range the browser needs next, and the chunk the server sent
+    dcc.Store(id='chunk-request'),
+    dcc.Store(id='chunk-data'),
     
     dcc.Interval(
         id='interval-component',
@@ -67,120 +118,167 @@ app.layout = html.Div([
     )
 ])
 
-# Combined callback for all playback controls
-@app.callback(
-    [Output('current-window', 'children'),
+# Playback controls run in the browser; the server is only asked for data chunks
+app.clientside_callback(
+    """
+    function (playClicks, pauseClicks, resetClicks, nIntervals, sliderValue, windowSize, currentWindow) {
+        var noUpdate = window.dash_clientside.no_update;
+        var idle = {'margin': '10px'};
+        var lastStart = Math.max(%(max_time)s - windowSize, 0);
+        var triggered = dash_clientside.callback_context.triggered;
+        if (!triggered.length) {
+            return [0, true, idle, idle, 0];  // Initial load
+        }
+
+        var triggerId = triggered[0].prop_id.split('.')[0];
+        if (triggerId === 'play-button') {
+            return [noUpdate, false, {'margin': '10px', 'backgroundColor': 'lightgreen'}, idle, noUpdate];
+        }
+        if (triggerId === 'pause-button') {
+            return [noUpdate, true, idle, {'margin': '10px', 'backgroundColor': 'lightcoral'}, noUpdate];
+        }
+        if (triggerId === 'reset-button') {
+            return [0, true, idle, idle, 0];
+        }
+        if (triggerId === 'position-slider' || triggerId === 'zoom') {
+            var position = Math.min(triggerId === 'zoom' ? currentWindow : sliderValue, lastStart);
+            return [position, noUpdate, noUpdate, noUpdate, position];
+        }
+
+        // Auto-scroll logic
+        var newWindow = currentWindow + windowSize * %(scroll_fraction)s;
+        if (newWindow > lastStart) {
+            return [lastStart, true, idle, idle, lastStart];  // Stop when reaching end
+        }
+        return [newWindow, false, noUpdate, noUpdate, newWindow];
+    }
+    """ % {'scroll_fraction': scroll_fraction, 'max_time': max_time},
+    [Output('current-window', 'data'),
      Output('interval-component', 'disabled'),
      Output('play-button', 'style'),
-     Output('pause-button', 'style')],
+     Output('pause-button', 'style'),
+     Output('position-slider', 'value')],
     [Input('play-button', 'n_clicks'),
      Input('pause-button', 'n_clicks'),
      Input('reset-button', 'n_clicks'),
-     Input('interval-component', 'n_intervals')],
-    [State('current-window', 'children')]
+     Input('interval-component', 'n_intervals'),
+     Input('position-slider', 'value'),
+     Input('zoom', 'value')],
+    [State('current-window', 'data')]
 )
-def control_playback(play_clicks, pause_clicks, reset_clicks, n_intervals, current_window_str):
-    ctx = dash.callback_context
-    
-    if not ctx.triggered:
-        # Initial load
-        return str(0), True, {'margin': '10px'}, {'margin': '10px'}
-    
-    trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    current_window = float(current_window_str)
-    
-    # Handle button clicks
-    if trigger_id == 'play-button':
-        return (current_window_str, False, 
-                {'margin': '10px', 'backgroundColor': 'lightgreen'}, 
-                {'margin': '10px'})
-    
-    elif trigger_id == 'pause-button':
-        return (current_window_str, True, 
-                {'margin': '10px'}, 
-                {'margin': '10px', 'backgroundColor': 'lightcoral'})
-    
-    elif trigger_id == 'reset-button':
-        return str(0), True, {'margin': '10px'}, {'margin': '10px'}
-    
-    elif trigger_id == 'interval-component':
-        # Auto-scroll logic
-        new_window = current_window + scroll_speed
-        
-        if new_window + window_size > max_time:
-            new_window = max(max_time - window_size, 0)
-            return str(new_window), True, {'margin': '10px'}, {'margin': '10px'}  # Stop when reaching end
-        
-        return str(new_window), False, {'margin': '10px'}, {'margin': '10px'}
-    
-    return current_window_str, True, {'margin': '10px'}, {'margin': '10px'}
 
-# Update graphs
+# Ask for a new chunk a window ahead of running off the one already loaded, or on zoom
+app.clientside_callback(
+    """
+    function (currentWindow, windowSize, chunk) {
+        if (chunk && chunk.window === windowSize && currentWindow >= chunk.start
+                && currentWindow + 2 * windowSize <= chunk.end) {
+            return window.dash_clientside.no_update;
+        }
+        return {'start': currentWindow, 'window': windowSize};
+    }
+    """,
+    Output('chunk-request', 'data'),
+    [Input('current-window', 'data'),
+     Input('zoom', 'value')],
+    State('chunk-data', 'data')
+)
+
+def window_slice(start, end):
+    """Index range of the samples with start <= time <= end, by binary search over the sorted times."""
+    return np.searchsorted(frame_ids, start, side='left'), np.searchsorted(frame_ids, end, side='right')
+
+# Serve chunk_windows windows from the requested position, at the detail level that fits one window
 @app.callback(
-    [Output('throttle-brake-graph', 'figure'),
-     Output('gear-graph', 'figure')],
-    Input('current-window', 'children')
+    Output('chunk-data', 'data'),
+    Input('chunk-request', 'data')
 )
-def update_graphs(current_window_str):
-    current_window = float(current_window_str)
-    window_start = current_window
-    window_end = window_start + window_size
-
-    mask = (frame_ids >= window_start) & (frame_ids <= window_end)
-    window_times = frame_ids[mask]
-    window_throttle = throttle[mask]
-    window_brake = brake[mask]
-    window_gear = gear[mask]
-
-    # Throttle & Brake Graph
-    throttle_brake_fig = {
-        'data': [
-            go.Scatter(
-                x=window_times,
-                y=window_throttle,
-                mode='lines',
-                name='Throttle',
-                line=dict(color='green', width=2)
-            ),
-            go.Scatter(
-                x=window_times,
-                y=window_brake,
-                mode='lines',
-                name='Brake',
-                line=dict(color='red', width=2)
-            )
-        ],
-        'layout': go.Layout(
-            title='Throttle and Brake',
-            xaxis={'title': '', 'range': [window_start, window_end]},
-            yaxis={'range': [0, 1]},
-            hovermode='closest',
-            margin=dict(l=40, r=40, t=40, b=40)
-        )
-    }
+def load_chunk(request):
+    request = request or {'start': 0, 'window': window_size}
+    chunk_start = float(request['start'])
+    chunk_window = float(request['window'])
+    chunk_end = chunk_start + chunk_window * chunk_windows
 
-    # Gear Graph
-    gear_fig = {
-        'data': [
-            go.Scatter(
-                x=window_times,
-                y=window_gear,
-                mode='lines+markers',
-                name='Gear',
-                line=dict(color='blue', width=2),
-                marker=dict(size=6)
-            )
-        ],
-        'layout': go.Layout(
-            title='Gear',
-            xaxis={'title': '', 'range': [window_start, window_end]},
-            yaxis={'title': 'Gear', 'dtick': 1,'range': [0, max(gear) ]},
-            hovermode='closest',
-            margin=dict(l=40, r=40, t=40, b=40)
-        )
-    }
+    window_lo, window_hi = window_slice(chunk_start, chunk_start + chunk_window)
+    level = pyramid.level_for(int(window_hi - window_lo), max_points)
+    lo, hi = window_slice(chunk_start, chunk_end)
 
-    return throttle_brake_fig, gear_fig
+    chunk = {'start': chunk_start, 'end': chunk_end, 'window': request['window'], 'level': level}
+    for name in ('throttle', 'brake', 'gear'):
+        times, values = pyramid.window(name, lo, hi, level)
+        chunk[name] = {'t': times.tolist(), 'y': values.tolist()}
+    return chunk
+
+# Update graphs from the loaded chunk
+app.clientside_callback(
+    """
+    function (currentWindow, chunk) {
+        if (!chunk) {
+            return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+        }
+        var windowStart = currentWindow;
+        var windowEnd = windowStart + chunk.window;
+
+        // Binary search for the first sample at or after a time
+        function lowerBound(times, value, strict) {
+            var lo = 0, hi = times.length;
+            while (lo < hi) {
+                var mid = (lo + hi) >> 1;
+                if (strict ? times[mid] <= value : times[mid] < value) { lo = mid + 1; } else { hi = mid; }
+            }
+            return lo;
+        }
+        // Each channel has its own sample times once downsampled
+        function windowTrace(channel, trace) {
+            var lo = lowerBound(channel.t, windowStart, false);
+            var hi = lowerBound(channel.t, windowEnd, true);
+            trace.type = 'scatter';
+            trace.x = channel.t.slice(lo, hi);
+            trace.y = channel.y.slice(lo, hi);
+            return trace;
+        }
+        var margin = {'l': 40, 'r': 40, 't': 40, 'b': 40};
+
+        // Throttle & Brake Graph
+        var throttleBrakeFig = {
+            'data': [
+                windowTrace(chunk.throttle, {'mode': 'lines', 'name': 'Throttle',
+                                             'line': {'color': 'green', 'width': 2}}),
+                windowTrace(chunk.brake, {'mode': 'lines', 'name': 'Brake',
+                                          'line': {'color': 'red', 'width': 2}})
+            ],
+            'layout': {
+                'title': {'text': 'Throttle and Brake'},
+                'xaxis': {'title': {'text': ''}, 'range': [windowStart, windowEnd]},
+                'yaxis': {'range': [0, 1]},
+                'hovermode': 'closest',
+                'margin': margin
+            }
+        };
+
+        // Gear Graph; markers only while individual samples are visible
+        var gearFig = {
+            'data': [
+                windowTrace(chunk.gear, {'mode': chunk.level ? 'lines' : 'lines+markers', 'name': 'Gear',
+                                         'line': {'color': 'blue', 'width': 2}, 'marker': {'size': 6}})
+            ],
+            'layout': {
+                'title': {'text': 'Gear'},
+                'xaxis': {'title': {'text': ''}, 'range': [windowStart, windowEnd]},
+                'yaxis': {'title': {'text': 'Gear'}, 'dtick': 1, 'range': [0, %(gear_max)s]},
+                'hovermode': 'closest',
+                'margin': margin
+            }
+        };
+
+        return [throttleBrakeFig, gearFig];
+    }
+    """ % {'gear_max': gear_max},
+    [Output('throttle-brake-graph', 'figure'),
+     Output('gear-graph', 'figure')],
+    [Input('current-window', 'data'),
+     Input('chunk-data', 'data')]
+)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,164 @@
+import mmap
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from block_log import is_block_log
+from Packet_decoder import INPUT_FILE, iter_packets
+from packet_index import load_index
+from packet_schema import (
+    HEADER_2021, NUM_CARS, PACKET_SCHEMAS, AllCars, Block, PacketSchema, PlayerCar, Record, normalize_direction,
+)
+
+# NumPy equivalents of the struct codes used in packet_schema (all little-endian, unpadded)
+STRUCT_CODE_DTYPES = {
+    'B': 'u1', 'b': 'i1',
+    'H': '<u2', 'h': '<i2',
+    'I': '<u4', 'i': '<i4',
+    'Q': '<u8', 'q': '<i8',
+    'f': '<f4', 'd': '<f8',
+}
+
+# Fixed-size F1 2021 packets decoded in batch; the rest are variable or rare
+BATCH_PACKET_IDS = (0, 2, 4, 5, 6, 7, 10)
+
+
+def record_dtype(record: Record) -> np.dtype:
+    """Structured dtype with the same layout as a packet_schema record."""
+    fields = []
+    for field in record.fields:
+        if field.code.endswith('s'):
+            base = f"S{field.code[:-1]}"
+        else:
+            base = STRUCT_CODE_DTYPES[field.code]
+        fields.append((field.name, base, field.count) if field.count > 1 else (field.name, base))
+    return np.dtype(fields)
+
+
+def schema_dtype(schema: PacketSchema) -> np.dtype:
+    """Whole-packet dtype: header, then each section of a fixed-size schema in order."""
+    fields = [('header', record_dtype(HEADER_2021))]
+    for i, section in enumerate(schema.sections):
+        if isinstance(section, (PlayerCar, AllCars)):
+            fields.append(('cars', record_dtype(section.record), NUM_CARS))
+        elif isinstance(section, Block):
+            fields.append((f"block_{i}", record_dtype(section.record)))
+        else:
+            raise ValueError(f"{schema.name} has no fixed layout")
+    return np.dtype(fields)
+
+
+HEADER_DTYPE = record_dtype(HEADER_2021)
+
+# Whole-packet layouts for every batch-decoded packet type, keyed by packet_id
+PACKET_DTYPES = {
+    packet_id: (PACKET_SCHEMAS[(2021, packet_id, 1)].name, schema_dtype(PACKET_SCHEMAS[(2021, packet_id, 1)]))
+    for packet_id in BATCH_PACKET_IDS
+}
+
+# Fields stored as raw int16 that decode_motion rescales to [-1, 1]
+NORMALIZED_FIELDS = tuple(
+    field.name
+    for packet_id in BATCH_PACKET_IDS
+    for section in PACKET_SCHEMAS[(2021, packet_id, 1)].sections
+    for field in section.record.fields
+    if field.convert is normalize_direction
+)
+
+
+def _to_columns(records: np.ndarray) -> Dict[str, np.ndarray]:
+    """Flatten structured packet records into one array per field."""
+    columns = {}
+    for group in records.dtype.names:
+        values = records[group]
+        if values.dtype.names:
+            for name in values.dtype.names:
+                columns[name] = values[name]
+        else:
+            columns[group] = values
+
+    for name in NORMALIZED_FIELDS:
+        if name in columns:
+            columns[name] = np.clip(columns[name] / 32767.0, -1.0, 1.0)
+    return columns
+
+
+def decode_records(packet_id: int, payload: bytes) -> Dict[str, np.ndarray]:
+    """Decode a run of same-type packets laid end to end into per-field arrays."""
+    _, dtype = PACKET_DTYPES[packet_id]
+    return _to_columns(np.frombuffer(payload, dtype=dtype))
+
+
+def decode_packets_batch(packets: Iterable) -> Dict[str, Dict[str, np.ndarray]]:
+    """Group packets by packet_id and decode each group in a single pass."""
+    groups = defaultdict(list)
+    for packet in packets:
+        packet_id = packet[5]
+        if packet_id in PACKET_DTYPES and len(packet) == PACKET_DTYPES[packet_id][1].itemsize:
+            groups[packet_id].append(packet)
+
+    return {
+        PACKET_DTYPES[packet_id][0]: decode_records(packet_id, b''.join(group))
+        for packet_id, group in sorted(groups.items())
+    }
+
+
+def decode_log_batch(file_path: str, packet_ids: Optional[Sequence[int]] = None) -> Dict[str, Dict[str, np.ndarray]]:
+    """Decode whole packet types of a log, gathering each group via the sidecar index."""
+    if os.path.getsize(file_path) == 0:
+        return {}  # Nothing logged yet, and an empty file cannot be mapped
+    if is_block_log(file_path):
+        # Compressed blocks cannot be sliced in place; stream them through the grouping decoder
+        wanted = set(packet_ids if packet_ids is not None else PACKET_DTYPES)
+        return decode_packets_batch(packet for packet in iter_packets(file_path) if packet[5] in wanted)
+
+    index = load_index(file_path)
+    if len(index) == 0:
+        return {}
+
+    decoded = {}
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log:
+        for packet_id in sorted(packet_ids if packet_ids is not None else PACKET_DTYPES):
+            name, dtype = PACKET_DTYPES[packet_id]
+            size = dtype.itemsize
+            rows = index[(index['packet_id'] == packet_id) & (index['length'] == size)]
+            if len(rows) == 0:
+                continue
+            mismatched = np.count_nonzero(index['packet_id'] == packet_id) - len(rows)
+            if mismatched:
+                print(f" Skipping {mismatched} {name} packets with unexpected length")
+
+            payload = b''.join([log[offset:offset + size] for offset in rows['offset'].tolist()])
+            decoded[name] = decode_records(packet_id, payload)
+    return decoded
+
+
+def player_columns(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Reduce per-car arrays to the player's car for every packet."""
+    player_index = columns['player_car_index'].astype(np.intp)
+    valid = player_index < NUM_CARS  # 255 while spectating
+    rows = np.flatnonzero(valid)
+
+    selected = {}
+    for name, values in columns.items():
+        if values.ndim >= 2 and values.shape[1] == NUM_CARS:
+            selected[name] = values[rows, player_index[valid]]
+        else:
+            selected[name] = values[valid]
+    return selected
+
+
+def main():
+    start_time = time.time()
+    decoded = decode_log_batch(INPUT_FILE)
+    end_time = time.time()
+
+    for name, columns in decoded.items():
+        print(f" {name}: {len(columns['packet_id'])} packets, {len(columns)} fields")
+    print(f"Batch decoded {len(decoded)} packet types in {end_time - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    main()
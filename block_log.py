@@ -0,0 +1,263 @@
+import argparse
+import lzma
+import os
+import struct
+import zlib
+from typing import Iterator, List, NamedTuple, Optional
+
+from Packet_decoder import HEADER_FORMAT, LENGTH_PREFIX, iter_packet_spans, iter_packets
+from sidecar import SidecarFormat, SidecarWriter, read_sidecar
+
+# Block logs start with this header; raw logs start with a length prefix, so the two never collide
+BLOCK_LOG_MAGIC = b'F1BZ'
+BLOCK_LOG_VERSION = 1
+FILE_HEADER = struct.Struct('<4sHB')  # magic, version, codec id
+
+# Each block is this header followed by the compressed, length-prefixed packet stream
+BLOCK_HEADER = struct.Struct('<III')  # compressed size, raw size, packet count
+
+# Sidecar block index written next to each block log as <log>.blk
+BLOCK_INDEX_SUFFIX = '.blk'
+BLOCK_INDEX_MAGIC = b'F1BK'
+BLOCK_INDEX_VERSION = 1
+BLOCK_ROW = struct.Struct('<QIIIIIff')
+BLOCK_INDEX_SIDECAR = SidecarFormat(BLOCK_INDEX_MAGIC, BLOCK_INDEX_VERSION, BLOCK_ROW.size, "block index")
+
+BLOCK_BYTES = 256 * 1024  # raw bytes buffered before a block is compressed and written
+
+CODECS = {
+    'zlib': (1, lambda data, level: zlib.compress(data, level), zlib.decompress),
+    'lzma': (2, lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+DEFAULT_LEVELS = {'zlib': 6, 'lzma': 1}
+CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+
+
+class BlockInfo(NamedTuple):
+    offset: int  # of the block header
+    compressed_size: int
+    raw_size: int
+    packet_count: int
+    min_frame: int
+    max_frame: int
+    min_time: float
+    max_time: float
+
+    @property
+    def end(self) -> int:
+        return self.offset + BLOCK_HEADER.size + self.compressed_size
+
+
+def block_index_path_for(log_path: str) -> str:
+    return log_path + BLOCK_INDEX_SUFFIX
+
+
+def is_block_log(file_path: str) -> bool:
+    with open(file_path, 'rb') as f:
+        return f.read(len(BLOCK_LOG_MAGIC)) == BLOCK_LOG_MAGIC
+
+
+def read_file_header(f) -> str:
+    """Check the file header at the start of f and return the codec name."""
+    header = f.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        raise ValueError("Block log is too short to hold its header")
+    magic, version, codec_id = FILE_HEADER.unpack(header)
+    if magic != BLOCK_LOG_MAGIC or version != BLOCK_LOG_VERSION or codec_id not in CODEC_NAMES:
+        raise ValueError(f"Not a version {BLOCK_LOG_VERSION} block log")
+    return CODEC_NAMES[codec_id]
+
+
+def describe_block(offset: int, compressed_size: int, raw: bytes, packet_count: int) -> BlockInfo:
+    """Index row for a block, with the frame and session time ranges of its packets."""
+    # Ranges rather than first/last values: both reset when a session restarts mid-block
+    headers = [HEADER_STRUCT.unpack_from(raw, start) for start, _ in iter_packet_spans(raw)]
+    frames = [header[7] for header in headers]
+    times = [header[6] for header in headers]
+    return BlockInfo(offset, compressed_size, len(raw), packet_count, min(frames), max(frames), min(times), max(times))
+
+
+class BlockIndexWriter(SidecarWriter):
+    """Appends one row per block to the sidecar index."""
+
+    def __init__(self, log_path: str):
+        super().__init__(block_index_path_for(log_path), BLOCK_INDEX_SIDECAR)
+
+    def append(self, block: BlockInfo) -> None:
+        self.write(BLOCK_ROW.pack(*block), flush=True)
+
+
+class BlockLogWriter:
+    """Buffers length-prefixed packets and writes them as compressed blocks, one write per block."""
+
+    def __init__(self, file_path: str, codec: str = 'zlib', level: Optional[int] = None,
+                 block_bytes: int = BLOCK_BYTES):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}")
+        codec_id, self._compress, _ = CODECS[codec]
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.block_bytes = block_bytes
+        self.file_path = file_path
+
+        self.file = open(file_path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(BLOCK_LOG_MAGIC, BLOCK_LOG_VERSION, codec_id))
+        self.index = BlockIndexWriter(file_path)
+        self.offset = self.file.tell()
+
+        self._buffer = bytearray()
+        self._count = 0
+
+    def write(self, packet) -> None:
+        self._buffer += LENGTH_PREFIX.pack(len(packet))
+        self._buffer += packet
+        self._count += 1
+        if len(self._buffer) >= self.block_bytes:
+            self.flush_block()
+
+    def flush_block(self) -> None:
+        if not self._count:
+            return
+        raw = bytes(self._buffer)
+        compressed = self._compress(raw, self.level)
+        self.file.write(BLOCK_HEADER.pack(len(compressed), len(raw), self._count) + compressed)
+        self.file.flush()
+        self.index.append(describe_block(self.offset, len(compressed), raw, self._count))
+
+        self.offset += BLOCK_HEADER.size + len(compressed)
+        self._buffer.clear()
+        self._count = 0
+
+    def close(self) -> None:
+        self.flush_block()
+        self.file.close()
+        self.index.close()
+
+
+def _read_block_rows(path: str) -> List[BlockInfo]:
+    return [BlockInfo(*row) for row in BLOCK_ROW.iter_unpack(read_sidecar(path, BLOCK_INDEX_SIDECAR))]
+
+
+def _scan_blocks(f, offset: int, decompress) -> Iterator[BlockInfo]:
+    """Walk block headers from offset, stopping at a torn final block."""
+    f.seek(offset)
+    while True:
+        header = f.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            return
+        compressed_size, raw_size, packet_count = BLOCK_HEADER.unpack(header)
+        compressed = f.read(compressed_size)
+        if len(compressed) < compressed_size:
+            return
+        yield describe_block(offset, compressed_size, decompress(compressed), packet_count)
+        offset += BLOCK_HEADER.size + compressed_size
+
+
+def load_block_index(log_path: str) -> List[BlockInfo]:
+    """Load the block index of a block log, creating or extending it if the log has grown."""
+    path = block_index_path_for(log_path)
+    blocks = _read_block_rows(path) if os.path.exists(path) else []
+    indexed_end = blocks[-1].end if blocks else FILE_HEADER.size
+
+    if indexed_end < os.path.getsize(log_path):
+        with open(log_path, 'rb') as f:
+            decompress = CODECS[read_file_header(f)][2]
+            new_blocks = list(_scan_blocks(f, indexed_end, decompress))
+        if new_blocks:
+            writer = BlockIndexWriter(log_path)
+            try:
+                for block in new_blocks:
+                    writer.append(block)
+            finally:
+                writer.close()
+            blocks += new_blocks
+    return blocks
+
+
+def query_blocks(blocks: List[BlockInfo], start_time: Optional[float] = None, end_time: Optional[float] = None,
+                 start_frame: Optional[int] = None, end_frame: Optional[int] = None) -> List[BlockInfo]:
+    """Blocks that may hold packets in the given session time and frame ranges (bounds inclusive)."""
+    return [
+        block for block in blocks
+        if (start_time is None or block.max_time >= start_time)
+        and (end_time is None or block.min_time <= end_time)
+        and (start_frame is None or block.max_frame >= start_frame)
+        and (end_frame is None or block.min_frame <= end_frame)
+    ]
+
+
+def _iter_block_headers(f, offset: int) -> Iterator[tuple]:
+    """(offset, compressed size) of each block, without reading the block bodies."""
+    size = os.fstat(f.fileno()).st_size
+    while offset + BLOCK_HEADER.size <= size:
+        f.seek(offset)
+        compressed_size = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))[0]
+        yield offset, compressed_size
+        offset += BLOCK_HEADER.size + compressed_size
+
+
+def iter_block_packets(file_path: str, start: Optional[int] = None, end: Optional[int] = None,
+                       blocks: Optional[List[BlockInfo]] = None) -> Iterator[memoryview]:
+    """Decompress blocks one at a time and yield their packets.
+
+    Reads every block whose header lies in [start, end), or exactly the given blocks
+    (e.g. from query_blocks) when blocks is passed.
+    """
+    with open(file_path, 'rb') as f:
+        decompress = CODECS[read_file_header(f)][2]
+        if blocks is None:
+            selected = _iter_block_headers(f, start or FILE_HEADER.size)
+        else:
+            selected = ((block.offset, block.compressed_size) for block in blocks)
+
+        for offset, compressed_size in selected:
+            if end is not None and offset >= end:
+                return
+            f.seek(offset + BLOCK_HEADER.size)
+            compressed = f.read(compressed_size)
+            if len(compressed) < compressed_size:
+                return  # Torn final block
+            raw = memoryview(decompress(compressed))
+            for packet_offset, length in iter_packet_spans(raw):
+                yield raw[packet_offset:packet_offset + length]
+
+
+def compress_log(input_file: str, output_file: str, codec: str = 'zlib', level: Optional[int] = None,
+                 block_bytes: int = BLOCK_BYTES) -> int:
+    """Rewrite a raw or block log as a new block log; returns the number of packets."""
+    tmp_file = output_file + '.tmp'
+    for path in (tmp_file, block_index_path_for(tmp_file)):
+        if os.path.exists(path):
+            os.remove(path)
+
+    count = 0
+    writer = BlockLogWriter(tmp_file, codec, level, block_bytes)
+    try:
+        for packet in iter_packets(input_file):
+            writer.write(packet)
+            count += 1
+    finally:
+        writer.close()
+
+    os.replace(tmp_file, output_file)
+    os.replace(block_index_path_for(tmp_file), block_index_path_for(output_file))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a telemetry log to the block-compressed format.")
+    parser.add_argument('input', help="raw .bin log written by Packet_reader")
+    parser.add_argument('output', help="block log to create")
+    parser.add_argument('--codec', choices=sorted(CODECS), default='zlib')
+    parser.add_argument('--level', type=int, help="compression level (zlib 0-9, lzma preset 0-9)")
+    args = parser.parse_args()
+
+    count = compress_log(args.input, args.output, args.codec, args.level)
+    before, after = os.path.getsize(args.input), os.path.getsize(args.output)
+    print(f"Compressed {count} packets: {before} → {after} bytes ({before / max(after, 1):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+# One .npy file per packet type and field, described by a small JSON manifest
+MANIFEST_FILE = 'manifest.json'
+STORE_VERSION = 1
+
+
+def manifest_path(store_dir: str) -> str:
+    return os.path.join(store_dir, MANIFEST_FILE)
+
+
+def write_columns(store_dir: str, decoded: Dict[str, Dict[str, np.ndarray]], source: Optional[str] = None) -> None:
+    """Write batch-decoded packet columns as individually loadable .npy files."""
+    tmp_dir = store_dir + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    manifest = {'version': STORE_VERSION, 'source': source, 'packets': {}}
+    for packet_name, columns in decoded.items():
+        os.makedirs(os.path.join(tmp_dir, packet_name))
+        fields = {}
+        for field, values in columns.items():
+            file_name = os.path.join(packet_name, f"{field}.npy")
+            np.save(os.path.join(tmp_dir, file_name), np.ascontiguousarray(values))
+            fields[field] = {'file': file_name, 'dtype': values.dtype.str, 'shape': list(values.shape)}
+        rows = len(next(iter(columns.values()))) if columns else 0
+        manifest['packets'][packet_name] = {'rows': rows, 'fields': fields}
+
+    with open(manifest_path(tmp_dir), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.replace(tmp_dir, store_dir)
+
+
+def load_manifest(store_dir: str) -> Dict:
+    with open(manifest_path(store_dir)) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        raise ValueError(f"{store_dir} is not a version {STORE_VERSION} columnar store")
+    return manifest
+
+
+def load_columns(store_dir: str, packet_name: str, fields: Optional[Iterable[str]] = None,
+                 mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Load selected fields of one packet type, memory-mapped unless mmap is False."""
+    available = load_manifest(store_dir)['packets'].get(packet_name)
+    if available is None:
+        return {}
+
+    names = list(fields) if fields is not None else list(available['fields'])
+    missing = [name for name in names if name not in available['fields']]
+    if missing:
+        raise KeyError(f"{packet_name} has no columns {missing}")
+
+    mmap_mode = 'r' if mmap else None
+    return {
+        name: np.load(os.path.join(store_dir, available['fields'][name]['file']), mmap_mode=mmap_mode)
+        for name in names
+    }
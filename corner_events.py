@@ -0,0 +1,169 @@
+import argparse
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from distance_resample import DISTANCE_STEP, DistanceCache
+
+# Event codes
+BRAKE_ON = 0
+BRAKE_PEAK = 1
+LIFT = 2
+COAST = 3
+THROTTLE_ON = 4
+EVENT_NAMES = {BRAKE_ON: 'brake_on', BRAKE_PEAK: 'brake_peak', LIFT: 'lift', COAST: 'coast', THROTTLE_ON: 'throttle_on'}
+
+BRAKE_THRESHOLD = 0.05  # pedal fraction counted as braking
+FULL_THROTTLE = 0.95  # dropping below this is a lift
+PEDAL_OFF = 0.05  # throttle and brake both below this is coasting
+
+EVENT_DTYPE = np.dtype([
+    ('session_uid', '<u8'),
+    ('lap', 'u1'),
+    ('event', 'u1'),
+    ('gear', 'i1'),
+    ('distance', '<f4'),  # lap distance of the event
+    ('length', '<f4'),  # metres until the brake zone, lift or coast ends (0 for point events)
+    ('speed', '<f4'),
+    ('value', '<f4'),  # brake at BRAKE_ON/BRAKE_PEAK, throttle otherwise
+])
+
+
+def _spans(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(row, start, end) of every run of True along axis 1, end exclusive."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    # Runs cannot cross rows, so starts and ends pair up in row-major order
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def _run_argmax(values: np.ndarray, rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Column of the largest value inside each run."""
+    lengths = ends - starts
+    run_ids = np.repeat(np.arange(len(starts)), lengths)
+    columns = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    order = np.lexsort((-values[rows[run_ids], columns], run_ids))
+    first = np.cumsum(lengths) - lengths
+    return columns[order[first]]
+
+
+def detect_events(grid: np.ndarray, laps: np.ndarray, channels: Dict[str, np.ndarray]) -> np.ndarray:
+    """Corner events of every lap at once from distance-resampled channels (see distance_resample)."""
+    if len(laps) == 0:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    brake, throttle = channels['brake'], channels['throttle']
+    driven = ~np.isnan(brake) & ~np.isnan(throttle)
+    step = grid[1] - grid[0] if len(grid) > 1 else DISTANCE_STEP
+
+    found = []
+
+    def emit(event, rows, columns, lengths, value):
+        found.append((event, rows, columns, lengths, value[rows, columns]))
+
+    rows, starts, ends = _spans(driven & (brake >= BRAKE_THRESHOLD))
+    # Runs already open where the lap's data starts have no onset to report
+    opened = (starts > 0) & driven[rows, np.maximum(starts - 1, 0)]
+    emit(BRAKE_ON, rows[opened], starts[opened], ((ends - starts) * step)[opened], brake)
+    emit(BRAKE_PEAK, rows, _run_argmax(brake, rows, starts, ends), np.zeros(len(rows)), brake)
+
+    for event, mask, value in (
+            (LIFT, driven & (throttle < FULL_THROTTLE), throttle),
+            (COAST, driven & (throttle < PEDAL_OFF) & (brake < PEDAL_OFF), throttle)):
+        rows, starts, ends = _spans(mask)
+        opened = (starts > 0) & driven[rows, np.maximum(starts - 1, 0)]
+        emit(event, rows[opened], starts[opened], ((ends - starts) * step)[opened], value)
+
+    # Throttle back on after being off it: end of a closed-throttle run followed by driven samples
+    rows, starts, ends = _spans(driven & (throttle < PEDAL_OFF))
+    closed = ends < driven.shape[1]
+    rows, ends = rows[closed], ends[closed]
+    reapplied = driven[rows, ends]
+    emit(THROTTLE_ON, rows[reapplied], ends[reapplied], np.zeros(np.count_nonzero(reapplied)), throttle)
+
+    total = sum(len(rows) for _, rows, _, _, _ in found)
+    events = np.empty(total, dtype=EVENT_DTYPE)
+    position = 0
+    for event, rows, columns, lengths, values in found:
+        chunk = events[position:position + len(rows)]
+        chunk['session_uid'] = laps['session_uid'][rows]
+        chunk['lap'] = laps['lap'][rows]
+        chunk['event'] = event
+        chunk['distance'] = grid[columns]
+        chunk['length'] = lengths
+        chunk['value'] = values
+        chunk['speed'] = channels['speed'][rows, columns] if 'speed' in channels else np.nan
+        chunk['gear'] = np.nan_to_num(channels['gear'][rows, columns]) if 'gear' in channels else 0
+        position += len(rows)
+
+    return events[np.lexsort((events['distance'], events['lap'], events['session_uid']))]
+
+
+def build_event_table(log_paths: Iterable[str], cache: Optional[DistanceCache] = None,
+                      step: float = DISTANCE_STEP) -> np.ndarray:
+    """Events of every lap in several logs, from their cached distance grids."""
+    cache = cache or DistanceCache()
+    tables = [detect_events(*cache.load(log_path, step)) for log_path in log_paths]
+    return np.concatenate(tables) if tables else np.empty(0, dtype=EVENT_DTYPE)
+
+
+def query_events(events: np.ndarray, event: Optional[int] = None, session_uid: Optional[int] = None,
+                 lap: Optional[int] = None, start_distance: Optional[float] = None,
+                 end_distance: Optional[float] = None) -> np.ndarray:
+    """Select events by type, session, lap and lap distance range (bounds inclusive)."""
+    mask = np.ones(len(events), dtype=bool)
+    if event is not None:
+        mask &= events['event'] == event
+    if session_uid is not None:
+        mask &= events['session_uid'] == session_uid
+    if lap is not None:
+        mask &= events['lap'] == lap
+    if start_distance is not None:
+        mask &= events['distance'] >= start_distance
+    if end_distance is not None:
+        mask &= events['distance'] <= end_distance
+    return events[mask]
+
+
+def match_events(events: np.ndarray, reference: np.ndarray, tolerance: float = 50.0) -> np.ndarray:
+    """Index of the nearest reference event (same type, within tolerance metres) for each event; -1 if none.
+
+    Comparing e.g. the BRAKE_ON events of two laps this way pairs up the braking points of each corner.
+    """
+    matched = np.full(len(events), -1, dtype=np.intp)
+    for event in np.unique(events['event']).tolist():
+        rows = np.flatnonzero(events['event'] == event)
+        candidates = np.flatnonzero(reference['event'] == event)
+        if len(candidates) == 0:
+            continue
+        candidates = candidates[np.argsort(reference['distance'][candidates], kind='stable')]
+        distances = reference['distance'][candidates]
+        wanted = events['distance'][rows]
+        right = np.searchsorted(distances, wanted)
+        left = np.clip(right - 1, 0, len(distances) - 1)
+        right = np.minimum(right, len(distances) - 1)
+        nearest = np.where(np.abs(distances[left] - wanted) <= np.abs(distances[right] - wanted), left, right)
+        close = np.abs(distances[nearest] - wanted) <= tolerance
+        matched[rows[close]] = candidates[nearest[close]]
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect braking, lift, coasting and throttle events in telemetry logs.")
+    parser.add_argument('logs', nargs='+', help="raw or block .bin logs")
+    parser.add_argument('--output', help="save the event table as .npy")
+    parser.add_argument('--step', type=float, default=DISTANCE_STEP, help="metres between grid points")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    events = build_event_table(args.logs, step=args.step)
+    counts = ', '.join(f"{np.count_nonzero(events['event'] == code)} {name}" for code, name in EVENT_NAMES.items())
+    print(f" {len(events)} events ({counts}) in {time.time() - start_time:.2f} s")
+    if args.output:
+        np.save(args.output, events)
+
+if __name__ == "__main__":
+    main()
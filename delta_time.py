@@ -0,0 +1,159 @@
+import argparse
+import struct
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from distance_resample import DISTANCE_STEP, DistanceCache
+from Packet_decoder import HEADER_FORMAT, HEADER_SIZE
+from packet_schema import LAP_DATA_2021, NUM_CARS
+
+# Delta traces kept in memory by DeltaCache
+DELTA_CACHE_PAIRS = 256
+
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+LIVE_FIELDS = LAP_DATA_2021.subset_struct(('current_lap_time_ms', 'lap_distance', 'current_lap_num'))
+
+
+class ReferenceLap:
+    """Lap time (ms) at every point of a lap distance grid, to compare other laps against."""
+
+    def __init__(self, grid: np.ndarray, lap_time_ms: np.ndarray, step: float = DISTANCE_STEP):
+        driven = ~np.isnan(lap_time_ms)
+        if np.count_nonzero(driven) < 2:
+            raise ValueError("Reference lap has too few samples")
+        # Fill gaps in the grid so a lookup is always defined
+        self.times = np.interp(grid, grid[driven], lap_time_ms[driven])
+        self.grid = grid
+        self.step = step
+
+    def times_on(self, grid: np.ndarray) -> np.ndarray:
+        """Reference times on another lap's grid (logs can differ in track length, so in grid size)."""
+        if len(grid) == len(self.grid) and np.array_equal(grid, self.grid):
+            return self.times
+        return np.interp(grid, self.grid, self.times)
+
+    def time_at(self, distance: float) -> float:
+        """Reference time at a lap distance in O(1), interpolating between grid points."""
+        position = min(max(distance / self.step, 0.0), len(self.times) - 1.0)
+        i = min(int(position), len(self.times) - 2)
+        return self.times[i] + (position - i) * (self.times[i + 1] - self.times[i])
+
+
+def session_best(laps: np.ndarray, session_uid: Optional[int] = None) -> Optional[int]:
+    """Row of the fastest complete, valid lap (DistanceCache lap rows)."""
+    mask = (laps['complete'] == 1) & (laps['invalid'] == 0) & (laps['lap_time_ms'] > 0)
+    if session_uid is not None:
+        mask &= laps['session_uid'] == session_uid
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+        return None
+    return int(rows[laps['lap_time_ms'][rows].argmin()])
+
+
+def load_reference(cache: DistanceCache, log_path: str, session_uid: Optional[int] = None,
+                   lap: Optional[int] = None, step: float = DISTANCE_STEP) -> Optional[ReferenceLap]:
+    """A stored lap as reference, or the session best when no lap is given."""
+    grid, laps, channels = cache.load(log_path, step)
+    if lap is None:
+        row = session_best(laps, session_uid)
+    else:
+        match = np.flatnonzero((laps['lap'] == lap) &
+                               ((laps['session_uid'] == session_uid) if session_uid is not None else True))
+        row = int(match[-1]) if len(match) else None
+    if row is None or 'lap_time_ms' not in channels or np.count_nonzero(~np.isnan(channels['lap_time_ms'][row])) < 2:
+        return None
+    return ReferenceLap(grid, channels['lap_time_ms'][row], step)
+
+
+def delta_traces(lap_time_ms: np.ndarray, reference: ReferenceLap, grid: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cumulative delta (ms, positive = slower) of (laps, grid) lap times in one pass; NaN where not driven.
+
+    grid is the one lap_time_ms was resampled on, when it may differ from the reference's.
+    """
+    times = reference.times if grid is None else reference.times_on(grid)
+    return lap_time_ms - times.astype(np.float32)
+
+
+class LiveDelta:
+    """Running delta against a reference lap, updated in O(1) from each lap data packet."""
+
+    def __init__(self, reference: ReferenceLap):
+        self.reference = reference
+        self.lap = None
+        self.distance = None
+        self.delta_ms = None
+
+    def update(self, lap: int, lap_distance: float, lap_time_ms: float) -> Optional[float]:
+        if lap_distance < 0:
+            return None  # Not across the line yet
+        self.lap, self.distance = lap, lap_distance
+        self.delta_ms = lap_time_ms - self.reference.time_at(lap_distance)
+        return self.delta_ms
+
+    def feed(self, packet) -> Optional[float]:
+        """Delta for the player's car in a lap data packet; other packets return None."""
+        header = HEADER_STRUCT.unpack_from(packet)
+        if header[4] != 2 or header[8] >= NUM_CARS:
+            return None
+        lap_time_ms, lap_distance, lap = LIVE_FIELDS.unpack_from(packet, HEADER_SIZE + header[8] * LAP_DATA_2021.size)
+        return self.update(lap, lap_distance, lap_time_ms)
+
+
+class DeltaCache:
+    """Delta traces per (lap, reference lap) pair, most recently used kept."""
+
+    def __init__(self, cache: Optional[DistanceCache] = None, max_pairs: int = DELTA_CACHE_PAIRS):
+        self.cache = cache or DistanceCache()
+        self.max_pairs = max_pairs
+        self._traces = OrderedDict()
+
+    def delta(self, log_path: str, session_uid: int, lap: int, reference_log: Optional[str] = None,
+              reference_session: Optional[int] = None, reference_lap: Optional[int] = None,
+              step: float = DISTANCE_STEP) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Grid and delta trace of a lap; the reference defaults to the best lap of the same session."""
+        reference_log = reference_log or log_path
+        if reference_log == log_path and reference_session is None:
+            reference_session = session_uid
+        key = (log_path, session_uid, lap, reference_log, reference_session, reference_lap, step)
+        if key in self._traces:
+            self._traces.move_to_end(key)
+            return self._traces[key]
+
+        loaded = self.cache.load_lap(log_path, session_uid, lap, step)
+        reference = load_reference(self.cache, reference_log, reference_session, reference_lap, step)
+        if loaded is None or reference is None:
+            return None
+        grid, channels = loaded
+        trace = (grid, delta_traces(channels['lap_time_ms'], reference, grid))
+
+        self._traces[key] = trace
+        if len(self._traces) > self.max_pairs:
+            self._traces.popitem(last=False)
+        return trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the time delta of every lap in a log against a reference lap.")
+    parser.add_argument('log', help="raw or block .bin log")
+    parser.add_argument('--reference-log', help="log holding the reference lap (default: the same log)")
+    parser.add_argument('--reference-lap', type=int, help="reference lap number (default: session best)")
+    parser.add_argument('--step', type=float, default=DISTANCE_STEP, help="metres between grid points")
+    args = parser.parse_args()
+
+    cache = DistanceCache()
+    grid, laps, channels = cache.load(args.log, args.step)
+    reference = load_reference(cache, args.reference_log or args.log, lap=args.reference_lap, step=args.step)
+    if reference is None or 'lap_time_ms' not in channels:
+        print(" No reference lap found")
+        return
+
+    deltas = delta_traces(channels['lap_time_ms'], reference, grid)
+    for row, trace in zip(laps, deltas):
+        driven = np.flatnonzero(~np.isnan(trace))
+        final = f"{trace[driven[-1]] / 1000:+.3f} s at {grid[driven[-1]]:.0f} m" if len(driven) else "not driven"
+        print(f" Lap {row['lap']}: {final}")
+
+if __name__ == "__main__":
+    main()
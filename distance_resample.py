@@ -0,0 +1,193 @@
+import argparse
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from batch_decoder import decode_log_batch
+from lap_index import LAP_SEGMENT, load_lap_index
+from Packet_decoder import PACKET_DECODERS, decode_packet_header, iter_packets
+from session_table import join_packets
+
+# Resampled lap files, one .npz per log and grid step
+DISTANCE_CACHE_DIR = 'distance_grids'
+
+# Metres between grid points
+DISTANCE_STEP = 5.0
+
+# Resampled channel → (packet, field) of the player's car
+DISTANCE_CHANNELS = {
+    'speed': ('car_telemetry', 'speed'),
+    'throttle': ('car_telemetry', 'throttle'),
+    'brake': ('car_telemetry', 'brake'),
+    'steer': ('car_telemetry', 'steer'),
+    'gear': ('car_telemetry', 'gear'),
+    'engine_rpm': ('car_telemetry', 'engine_rpm'),
+    'drs': ('car_telemetry', 'drs'),
+    'lap_time_ms': ('lap_data', 'current_lap_time_ms'),
+}
+# Channels that take the latest sample instead of being interpolated between samples
+STEP_CHANNELS = ('gear', 'drs')
+
+RESAMPLED_LAP_DTYPE = np.dtype([
+    ('session_uid', '<u8'),
+    ('lap', 'u1'),
+    ('lap_time_ms', '<u4'),  # 0 while the lap is unfinished
+    ('invalid', 'u1'),
+    ('complete', 'u1'),
+])
+
+
+def session_track_length(log_path: str) -> Optional[int]:
+    """Track length in metres from the first session packet of a log."""
+    for packet in iter_packets(log_path):
+        if packet[5] == 1:
+            session = PACKET_DECODERS[1](packet, decode_packet_header(packet))
+            if session and session['track_length']:
+                return int(session['track_length'])
+    return None
+
+
+def distance_grid(track_length: float, step: float = DISTANCE_STEP) -> np.ndarray:
+    return np.arange(0.0, track_length, step)
+
+
+def _kept_samples(lap_pos: np.ndarray, distance: np.ndarray, span: float) -> np.ndarray:
+    """Mask of samples below every later sample of the same lap.
+
+    A flashback rewinds the lap distance; the samples it replays supersede the earlier ones,
+    so what remains is strictly increasing within each lap.
+    """
+    key = lap_pos * span + distance
+    later_min = np.minimum.accumulate(key[::-1])[::-1]
+    return np.append(key[:-1] < later_min[1:], True)
+
+
+def resample_laps(table: Dict[str, np.ndarray], grid: np.ndarray, span: float,
+                  channels=DISTANCE_CHANNELS) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Resample the laps of one session table onto a lap distance grid, all laps in one pass.
+
+    Laps are laid end to end (lap position * span + lap distance) so a single interp or
+    searchsorted covers every lap. Returns the lap numbers and a float32 (laps, grid)
+    array per channel, NaN where the lap was not driven.
+    """
+    lap_numbers = table['current_lap_num'].astype(np.int64)
+    distance = table['lap_distance'].astype(np.float64)
+    rows = np.flatnonzero((lap_numbers > 0) & (distance >= 0) & (distance < span))
+    rows = rows[np.argsort(lap_numbers[rows], kind='stable')]
+    laps, lap_pos = np.unique(lap_numbers[rows], return_inverse=True)
+    if len(laps) == 0:
+        return laps, {name: np.empty((0, len(grid)), dtype=np.float32) for name in channels}
+
+    kept = _kept_samples(lap_pos, distance[rows], span)
+    rows, lap_pos = rows[kept], lap_pos[kept]
+    source = lap_pos * span + distance[rows]
+
+    query = (np.arange(len(laps))[:, None] * span + grid[None, :]).ravel()
+    # Grid points between each lap's first and last sample
+    first = source[np.searchsorted(lap_pos, np.arange(len(laps)), side='left')]
+    last = source[np.searchsorted(lap_pos, np.arange(len(laps)), side='right') - 1]
+    covered = (query >= np.repeat(first, len(grid))) & (query <= np.repeat(last, len(grid)))
+    positions = np.clip(np.searchsorted(source, query, side='right') - 1, 0, len(source) - 1)
+
+    resampled = {}
+    for name in channels:
+        if name not in table:
+            continue
+        values = table[name][rows].astype(np.float64)
+        if name in STEP_CHANNELS:
+            out = values[positions]
+        else:
+            out = np.interp(query, source, values)
+        resampled[name] = np.where(covered, out, np.nan).astype(np.float32).reshape(len(laps), len(grid))
+    return laps, resampled
+
+
+def resample_log(log_path: str, step: float = DISTANCE_STEP,
+                 channels=DISTANCE_CHANNELS) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """Every player lap of a log on one distance grid: (grid, RESAMPLED_LAP_DTYPE rows, channel arrays)."""
+    decoded = decode_log_batch(log_path, packet_ids=(2, 6))
+    if 'car_telemetry' not in decoded or 'lap_data' not in decoded:
+        return distance_grid(0, step), np.empty(0, dtype=RESAMPLED_LAP_DTYPE), {}
+    columns = dict(channels, current_lap_num=('lap_data', 'current_lap_num'),
+                   lap_distance=('lap_data', 'lap_distance'))
+    track_length = session_track_length(log_path)
+    if track_length is None:
+        track_length = float(decoded['lap_data']['lap_distance'].max())
+    grid = distance_grid(track_length, step)
+    span = float(track_length) + step
+
+    segments = load_lap_index(log_path)
+    segments = segments[segments['sector'] == LAP_SEGMENT]
+
+    lap_rows, parts = [], {}
+    for session_uid in np.unique(decoded['car_telemetry']['session_uid']).tolist():
+        # Lap data samples carry the exact distance; telemetry takes its latest sample at each
+        table = join_packets(decoded, columns, base='lap_data', session_uid=session_uid)
+        if not table:
+            continue
+        laps, resampled = resample_laps(table, grid, span, channels)
+        for lap in laps.tolist():
+            match = segments[(segments['session_uid'] == session_uid) & (segments['lap'] == lap)]
+            segment = match[-1] if len(match) else None
+            lap_rows.append((session_uid, lap, segment['time_ms'] if segment is not None and segment['complete'] else 0,
+                             segment['invalid'] if segment is not None else 0,
+                             segment['complete'] if segment is not None else 0))
+        for name, values in resampled.items():
+            parts.setdefault(name, []).append(values)
+
+    return (grid, np.array(lap_rows, dtype=RESAMPLED_LAP_DTYPE),
+            {name: np.concatenate(values) for name, values in parts.items()})
+
+
+class DistanceCache:
+    """Distance-resampled laps cached per log and grid step, rebuilt when the log changes."""
+
+    def __init__(self, root: str = DISTANCE_CACHE_DIR):
+        self.root = root
+
+    def cache_path(self, log_path: str, step: float = DISTANCE_STEP) -> str:
+        return os.path.join(self.root, f"{os.path.basename(log_path)}.{step:g}m.npz")
+
+    def load(self, log_path: str, step: float = DISTANCE_STEP) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """(grid, RESAMPLED_LAP_DTYPE rows, channel arrays) for a log, resampling it on a miss."""
+        path = self.cache_path(log_path, step)
+        source_mtime = os.stat(log_path).st_mtime_ns
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                if int(cached['source_mtime']) == source_mtime and os.path.abspath(log_path) == str(cached['source']):
+                    channels = {name[len('channel/'):]: cached[name] for name in cached.files
+                                if name.startswith('channel/')}
+                    return cached['grid'], cached['laps'], channels
+
+        grid, laps, channels = resample_log(log_path, step)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, grid=grid, laps=laps, source=np.array(os.path.abspath(log_path)),
+                 source_mtime=np.array(source_mtime), **{f"channel/{name}": values for name, values in channels.items()})
+        os.replace(tmp_path, path)
+        return grid, laps, channels
+
+    def load_lap(self, log_path: str, session_uid: int, lap: int,
+                 step: float = DISTANCE_STEP) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """Grid and channel rows of one lap."""
+        grid, laps, channels = self.load(log_path, step)
+        match = np.flatnonzero((laps['session_uid'] == session_uid) & (laps['lap'] == lap))
+        if len(match) == 0:
+            return None
+        return grid, {name: values[match[-1]] for name, values in channels.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resample the player's laps onto a lap distance grid.")
+    parser.add_argument('logs', nargs='+', help="raw or block .bin logs")
+    parser.add_argument('--step', type=float, default=DISTANCE_STEP, help="metres between grid points")
+    args = parser.parse_args()
+
+    cache = DistanceCache()
+    for log_path in args.logs:
+        grid, laps, _ = cache.load(log_path, args.step)
+        print(f" {log_path}: {len(laps)} laps on {len(grid)} points -> {cache.cache_path(log_path, args.step)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from Packet_decoder import HEADER_SIZE, decode_header_ids
+
+PACKET_NAMES = {
+    0: 'motion', 1: 'session', 2: 'lap_data', 3: 'event', 4: 'participants', 5: 'car_setups',
+    6: 'car_telemetry', 7: 'car_status', 8: 'final_classification', 9: 'lobby_info',
+    10: 'car_damage', 11: 'session_history',
+}
+
+# Packet types the game sends at a steady frame cadence; others are bursty or round-robin
+FRAME_STREAM_PACKET_IDS = (0, 2, 6, 7)
+# Frame jumps larger than this are a pause, flashback or restart rather than lost packets
+MAX_FRAME_GAP = 600
+
+SUMMARY_INTERVAL = 10.0  # seconds
+
+# Latency buckets: upper bounds in microseconds, doubling from 1 µs to ~1 s
+LATENCY_BUCKETS_US = tuple(2 ** i for i in range(21))
+
+
+class LatencyHistogram:
+    """Fixed log2 buckets; recording is one bisect and one increment."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_US) + 1)
+        self.total = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_US, seconds * 1e6)] += 1
+        self.total += 1
+        self.total_seconds += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound (µs) of the bucket holding the q-th quantile."""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(LATENCY_BUCKETS_US[i]) if i < len(LATENCY_BUCKETS_US) else float('inf')
+        return float('inf')
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.total,
+            'mean_us': self.total_seconds * 1e6 / self.total if self.total else None,
+            'p50_us': self.quantile(0.5),
+            'p99_us': self.quantile(0.99),
+            'buckets_us': dict(zip(LATENCY_BUCKETS_US + (float('inf'),), self.counts)),
+        }
+
+
+def read_kernel_drops(port: int) -> Optional[int]:
+    """Datagrams the kernel dropped for the UDP socket bound to port (Linux only, else None)."""
+    if not sys.platform.startswith('linux'):
+        return None
+    drops = None
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if int(fields[1].rsplit(':', 1)[1], 16) == port:
+                        drops = (drops or 0) + int(fields[-1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return drops
+
+
+class IngestMetrics:
+    """Packet rates, frame-gap loss, drops and stage latencies for a UDP listener."""
+
+    def __init__(self, port: Optional[int] = None, summary_interval: float = SUMMARY_INTERVAL):
+        self.port = port
+        self.summary_interval = summary_interval
+        self.decode_latency = LatencyHistogram()
+        self.write_latency = LatencyHistogram()
+        self.packets = Counter()
+        self.missing = Counter()
+        self.queue_drops = 0
+        self.sink = None  # a telemetry_sink.NdjsonSink whose dropped records are reported too
+
+        self._last_frame: Dict[int, int] = {}
+        self._frame_step: Dict[int, int] = {}
+        self._window_packets = Counter()
+        self._window_start = self._started = time.monotonic()
+        self._rates: Dict[int, float] = {}
+
+    def observe(self, packet_id: int, frame_identifier: int) -> None:
+        """Count one received packet and infer losses from its frame identifier."""
+        self.packets[packet_id] += 1
+        self._window_packets[packet_id] += 1
+
+        if packet_id in FRAME_STREAM_PACKET_IDS:
+            last = self._last_frame.get(packet_id)
+            self._last_frame[packet_id] = frame_identifier
+            if last is not None:
+                delta = frame_identifier - last
+                if 0 < delta <= MAX_FRAME_GAP:
+                    # The smallest step seen is the send interval in frames
+                    step = min(self._frame_step.get(packet_id, delta), delta)
+                    self._frame_step[packet_id] = step
+                    if delta > step:
+                        self.missing[packet_id] += delta // step - 1
+
+        if time.monotonic() - self._window_start >= self.summary_interval:
+            self.report()
+
+    def observe_datagram(self, data: bytes) -> None:
+        if len(data) < HEADER_SIZE:
+            return
+        packet_id, frame_identifier, _ = decode_header_ids(data)
+        self.observe(packet_id, frame_identifier)
+
+    def record_queue_drop(self) -> None:
+        self.queue_drops += 1
+
+    def kernel_drops(self) -> Optional[int]:
+        # The kernel counter belongs to the socket, so it already starts at zero for this session
+        return read_kernel_drops(self.port) if self.port else None
+
+    def report(self) -> None:
+        """Close the current rate window and print the summary line."""
+        now = time.monotonic()
+        elapsed = max(now - self._window_start, 1e-9)
+        self._rates = {packet_id: count / elapsed for packet_id, count in self._window_packets.items()}
+        self._window_packets.clear()
+        self._window_start = now
+        print(self.summary_line())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Point-in-time copy of every metric, safe to inspect while ingestion continues."""
+        return {
+            'uptime_s': time.monotonic() - self._started,
+            'packets': {PACKET_NAMES.get(k, str(k)): v for k, v in sorted(self.packets.items())},
+            'rates_per_s': {PACKET_NAMES.get(k, str(k)): v for k, v in sorted(self._rates.items())},
+            'missing': {PACKET_NAMES.get(k, str(k)): v for k, v in sorted(self.missing.items())},
+            'queue_drops': self.queue_drops,
+            'sink_drops': self.sink.dropped if self.sink else None,
+            'kernel_drops': self.kernel_drops(),
+            'decode_latency': self.decode_latency.snapshot(),
+            'write_latency': self.write_latency.snapshot(),
+        }
+
+    def summary_line(self) -> str:
+        rates = ' '.join(f"{PACKET_NAMES.get(k, k)}={v:.0f}/s" for k, v in sorted(self._rates.items()))
+        kernel = self.kernel_drops()
+
+        def latency(histogram: LatencyHistogram) -> str:
+            if not histogram.total:
+                return '-'
+            return f"p50<{histogram.quantile(0.5):.0f}us p99<{histogram.quantile(0.99):.0f}us"
+
+        return (f"[ingest] {rates or 'idle'} | total={sum(self.packets.values())} "
+                f"missing={sum(self.missing.values())} queue_drops={self.queue_drops} "
+                f"{f'sink_drops={self.sink.dropped} ' if self.sink else ''}"
+                f"kernel_drops={'n/a' if kernel is None else kernel} | "
+                f"decode {latency(self.decode_latency)} | write {latency(self.write_latency)}")
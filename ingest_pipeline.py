@@ -0,0 +1,186 @@
+import asyncio
+import signal
+import socket
+import time
+from typing import Any, Callable, List, Optional
+
+UDP_IP = "127.0.0.1"
+UDP_PORT = 20777
+
+# Drop policies for the receive queue; UDP cannot be paused, so a full queue must shed datagrams
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+
+# Kernel receive buffer requested for the socket; absorbs bursts while the loop is busy
+RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024
+RECEIVE_QUEUE_SIZE = 4096
+PERSIST_QUEUE_SIZE = 64  # batches
+BATCH_SIZE = 256
+
+# Marks the end of the stream as it travels through the stages during shutdown
+_END = object()
+
+
+class PipelineStats:
+    """Counters for each stage, readable while the pipeline runs."""
+
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+        self.decoded = 0
+        self.decode_errors = 0
+        self.persisted = 0
+        self.persist_errors = 0  # batches
+
+    def __repr__(self):
+        return (f"PipelineStats(received={self.received}, dropped={self.dropped}, decoded={self.decoded}, "
+                f"decode_errors={self.decode_errors}, persisted={self.persisted}, "
+                f"persist_errors={self.persist_errors})")
+
+
+class TelemetryProtocol(asyncio.DatagramProtocol):
+    """Receive stage: pushes raw datagrams onto a bounded queue without ever waiting."""
+
+    def __init__(self, queue: asyncio.Queue, stats: PipelineStats, drop_policy: str = DROP_OLDEST, metrics=None):
+        self.queue = queue
+        self.stats = stats
+        self.drop_policy = drop_policy
+        self.metrics = metrics
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.stats.received += 1
+        if self.metrics:
+            self.metrics.observe_datagram(data)
+        if self.queue.full():
+            self.stats.dropped += 1
+            if self.metrics:
+                self.metrics.record_queue_drop()
+            if self.drop_policy == DROP_NEWEST:
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait((data, time.monotonic()))
+
+    def error_received(self, exc: Exception) -> None:
+        print(f" UDP receive error: {exc}")
+
+
+async def _decode_stage(receive_queue: asyncio.Queue, persist_queue: asyncio.Queue,
+                        decode: Callable[..., Any], stats: PipelineStats, batch_size: int,
+                        metrics=None, receive_times: bool = False) -> None:
+    """Decode datagrams in batches and hand them on; waits (backpressure) when persistence is behind."""
+    running = True
+    while running:
+        items = [await receive_queue.get()]
+        while len(items) < batch_size and not receive_queue.empty():
+            items.append(receive_queue.get_nowait())
+
+        batch = []
+        for item in items:
+            if item is _END:
+                running = False
+                break
+            data, received_at = item
+            started = time.perf_counter()
+            try:
+                decoded = decode(data, received_at) if receive_times else decode(data)
+            except Exception as e:
+                stats.decode_errors += 1
+                print(f" Error decoding datagram: {e}")
+                continue
+            if metrics:
+                metrics.decode_latency.record(time.perf_counter() - started)
+            if decoded is not None:
+                batch.append(decoded)
+
+        stats.decoded += len(batch)
+        if batch:
+            await persist_queue.put(batch)
+
+    await persist_queue.put(_END)
+
+
+async def _persist_stage(persist_queue: asyncio.Queue, persist: Callable[[List[Any]], None],
+                         stats: PipelineStats, metrics=None) -> None:
+    """Run the blocking persist callback on a worker thread, one batch at a time, in order.
+
+    A batch whose persist call raises is counted and skipped; the stage keeps consuming so the
+    decode stage never blocks on a full queue and shutdown can always drain.
+    """
+    while True:
+        batch = await persist_queue.get()
+        if batch is _END:
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(persist, batch)
+        except Exception as e:
+            stats.persist_errors += 1
+            print(f" Error persisting a batch of {len(batch)}: {e}")
+            continue
+        if metrics:
+            metrics.write_latency.record(time.perf_counter() - started)
+        stats.persisted += len(batch)
+
+
+async def run_pipeline(decode: Callable[..., Any], persist: Callable[[List[Any]], None],
+                       host: str = UDP_IP, port: int = UDP_PORT,
+                       drop_policy: str = DROP_OLDEST,
+                       receive_queue_size: int = RECEIVE_QUEUE_SIZE,
+                       persist_queue_size: int = PERSIST_QUEUE_SIZE,
+                       batch_size: int = BATCH_SIZE,
+                       stop: Optional[asyncio.Event] = None,
+                       stats: Optional[PipelineStats] = None,
+                       metrics=None,
+                       receive_times: bool = False) -> PipelineStats:
+    """Receive, decode and persist telemetry until stop is set (Ctrl+C sets it) or the task is cancelled.
+
+    decode maps a datagram to whatever persist should store (None skips it); persist gets
+    lists of those values on a worker thread. Shutdown stops receiving, then drains every
+    datagram already queued through both stages before returning (or re-raising, if the
+    task was cancelled). metrics, an ingest_metrics.IngestMetrics, sees every datagram and
+    times both stages (write per batch). With receive_times, decode is called as
+    decode(data, received_at), received_at being the time.monotonic() the datagram arrived.
+    """
+    if drop_policy not in (DROP_OLDEST, DROP_NEWEST):
+        raise ValueError(f"Unknown drop policy {drop_policy!r}")
+
+    loop = asyncio.get_running_loop()
+    stats = stats or PipelineStats()
+    stop = stop or asyncio.Event()
+    receive_queue = asyncio.Queue(maxsize=receive_queue_size)
+    persist_queue = asyncio.Queue(maxsize=persist_queue_size)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+    sock.bind((host, port))
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: TelemetryProtocol(receive_queue, stats, drop_policy, metrics), sock=sock)
+    print(f" Listening for telemetry on {host}:{port} (asyncio pipeline)...")
+
+    decode_task = asyncio.create_task(_decode_stage(receive_queue, persist_queue, decode, stats, batch_size,
+                                                    metrics, receive_times))
+    persist_task = asyncio.create_task(_persist_stage(persist_queue, persist, stats, metrics))
+
+    try:
+        # Ctrl+C sets stop, so the drain below runs as a normal shutdown
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+    except (NotImplementedError, RuntimeError):
+        pass  # No loop signal handlers on Windows or off the main thread; Ctrl+C cancels the task instead
+
+    try:
+        await stop.wait()
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+        if metrics:
+            # Report while the socket still exists so its kernel drop counter can be read
+            metrics.report()
+        transport.close()
+        # The decode stage keeps consuming, so this put only waits for room briefly
+        await receive_queue.put(_END)
+        await asyncio.gather(decode_task, persist_task)
+        print(f"\n Pipeline drained: {stats}")
+
+    return stats
@@ -0,0 +1,208 @@
+import os
+import struct
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from block_log import is_block_log, iter_block_packets, load_block_index
+from Packet_decoder import HEADER_FORMAT, HEADER_SIZE, iter_mapped_packets, iter_packet_spans
+from packet_index import iter_indexed_packets, load_index, query_index
+from packet_schema import LAP_DATA_2021, NUM_CARS
+from sidecar import SidecarFormat, SidecarWriter, read_sidecar, save_sidecar
+
+# Sidecar lap/sector index written next to each log as <log>.laps
+LAP_INDEX_SUFFIX = '.laps'
+LAP_INDEX_MAGIC = b'F1LP'
+LAP_INDEX_VERSION = 1
+
+# sector 0-2 rows cover one sector, LAP_SEGMENT rows the whole lap. Offsets are those of the
+# first and last lap data packet (payload offset in raw logs, block offset in block logs).
+LAP_SEGMENT = 255
+SEGMENT_ROW = struct.Struct('<QBBBBffIIQQI')
+SEGMENT_DTYPE = np.dtype([
+    ('session_uid', '<u8'),
+    ('lap', 'u1'),
+    ('sector', 'u1'),
+    ('invalid', 'u1'),
+    ('complete', 'u1'),  # 0 when the session ended or restarted inside the segment
+    ('start_time', '<f4'),
+    ('end_time', '<f4'),
+    ('start_frame', '<u4'),
+    ('end_frame', '<u4'),
+    ('start_offset', '<u8'),
+    ('end_offset', '<u8'),
+    ('time_ms', '<u4'),
+])
+LAP_INDEX_SIDECAR = SidecarFormat(LAP_INDEX_MAGIC, LAP_INDEX_VERSION, SEGMENT_ROW.size, "lap index")
+
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+LAP_FIELDS = LAP_DATA_2021.subset_struct(
+    ('last_lap_time_ms', 'sector1_time_ms', 'sector2_time_ms', 'current_lap_num', 'sector', 'current_lap_invalid'))
+
+
+def lap_index_path_for(log_path: str) -> str:
+    return log_path + LAP_INDEX_SUFFIX
+
+
+class _Segment:
+    __slots__ = ('sector', 'invalid', 'start', 'end')
+
+    def __init__(self, sector: int, invalid: int, point: tuple):
+        self.sector = sector
+        self.invalid = invalid
+        self.start = self.end = point  # (session_time, frame, offset)
+
+    def row(self, session_uid: int, lap: int, complete: bool, time_ms: int) -> bytes:
+        if not time_ms:
+            time_ms = round((self.end[0] - self.start[0]) * 1000)
+        return SEGMENT_ROW.pack(session_uid, lap, self.sector, self.invalid, complete, self.start[0], self.end[0],
+                                self.start[1], self.end[1], self.start[2], self.end[2], max(time_ms, 0))
+
+
+class LapSegmenter:
+    """Turns the player's lap data packets, in log order, into lap and sector rows."""
+
+    def __init__(self):
+        self.session_uid = None
+        self.lap_number = None
+        self._lap = None
+        self._sector = None
+        self._sector_times = (0, 0)
+
+    def feed(self, offset: int, packet) -> List[bytes]:
+        """Rows for the segments this packet closes."""
+        header = HEADER_STRUCT.unpack_from(packet)
+        session_uid, session_time, frame, player_index = header[5], header[6], header[7], header[8]
+        if player_index >= NUM_CARS:
+            return []  # Spectating
+        last_lap_ms, sector1_ms, sector2_ms, lap, sector, invalid = LAP_FIELDS.unpack_from(
+            packet, HEADER_SIZE + player_index * LAP_DATA_2021.size)
+        point = (session_time, frame, offset)
+
+        rows = []
+        if self._lap is not None and (session_uid != self.session_uid or lap != self.lap_number):
+            finished = session_uid == self.session_uid and lap == self.lap_number + 1
+            if finished:
+                previous_sector1, previous_sector2 = self._sector_times
+                rows.append(self._sector.row(self.session_uid, self.lap_number, True,
+                                             last_lap_ms - previous_sector1 - previous_sector2))
+                rows.append(self._lap.row(self.session_uid, self.lap_number, True, last_lap_ms))
+            else:
+                rows += self.finish()
+            self._lap = None
+        elif self._sector is not None and sector != self._sector.sector:
+            # Sector times are reported once the sector is over
+            rows.append(self._sector.row(self.session_uid, self.lap_number, True,
+                                         sector1_ms if self._sector.sector == 0 else sector2_ms))
+            self._sector = _Segment(sector, invalid, point)
+
+        if self._lap is None:
+            self.session_uid, self.lap_number = session_uid, lap
+            self._lap = _Segment(LAP_SEGMENT, invalid, point)
+            self._sector = _Segment(sector, invalid, point)
+
+        # A lap (or sector) stays invalid once the game flags it
+        self._lap.invalid |= invalid
+        self._sector.invalid |= invalid
+        self._lap.end = self._sector.end = point
+        self._sector_times = (sector1_ms, sector2_ms)
+        return rows
+
+    def finish(self) -> List[bytes]:
+        """Rows for the segments still open, marked incomplete."""
+        if self._lap is None:
+            return []
+        rows = [self._sector.row(self.session_uid, self.lap_number, False, 0),
+                self._lap.row(self.session_uid, self.lap_number, False, 0)]
+        self._lap = self._sector = None
+        return rows
+
+
+class LapIndexWriter(SidecarWriter):
+    """Segments lap data while a log is written and appends finished rows to the sidecar."""
+
+    def __init__(self, log_path: str):
+        super().__init__(lap_index_path_for(log_path), LAP_INDEX_SIDECAR)
+        self.segmenter = LapSegmenter()
+
+    def append(self, offset: int, packet) -> None:
+        rows = self.segmenter.feed(offset, packet)
+        if rows:
+            self.write(b''.join(rows), flush=True)
+
+    def close(self) -> None:
+        self.write(b''.join(self.segmenter.finish()))
+        super().close()
+
+
+def _read_segment_rows(path: str) -> np.ndarray:
+    return read_sidecar(path, LAP_INDEX_SIDECAR).view(SEGMENT_DTYPE)
+
+
+def _iter_lap_data(log_path: str) -> Iterator[tuple]:
+    """(offset, packet) for every lap data packet, using the log's packet or block index."""
+    if is_block_log(log_path):
+        for block in load_block_index(log_path):
+            for packet in iter_block_packets(log_path, blocks=[block]):
+                if packet[5] == 2:
+                    yield block.offset, packet
+        return
+
+    rows = query_index(load_index(log_path), packet_id=2)
+    yield from zip(rows['offset'].tolist(), iter_indexed_packets(log_path, rows))
+
+
+def build_lap_index(log_path: str, persist: bool = True) -> np.ndarray:
+    """Segment a whole log, (re)writing its sidecar unless persist is False."""
+    segmenter = LapSegmenter()
+    rows = []
+    for offset, packet in _iter_lap_data(log_path):
+        rows += segmenter.feed(offset, packet)
+    rows += segmenter.finish()
+    data = b''.join(rows)
+
+    if persist:
+        save_sidecar(lap_index_path_for(log_path), LAP_INDEX_SIDECAR, data)
+    return np.frombuffer(data, dtype=SEGMENT_DTYPE)
+
+
+def load_lap_index(log_path: str) -> np.ndarray:
+    """The lap/sector rows of a log, from its sidecar when that is up to date.
+
+    A sidecar older than its log belongs to a capture that is still running (or crashed), so
+    the log is segmented in memory instead of replacing the file the logger appends to.
+    """
+    path = lap_index_path_for(log_path)
+    if not os.path.exists(path):
+        return build_lap_index(log_path)
+    if os.path.getmtime(path) >= os.path.getmtime(log_path):
+        return _read_segment_rows(path)
+    return build_lap_index(log_path, persist=False)
+
+
+def find_segment(index: np.ndarray, lap: int, sector: int = LAP_SEGMENT,
+                 session_uid: Optional[int] = None) -> Optional[np.void]:
+    """The row for a lap (or one of its sectors), latest session first."""
+    mask = (index['lap'] == lap) & (index['sector'] == sector)
+    if session_uid is not None:
+        mask &= index['session_uid'] == session_uid
+    rows = np.flatnonzero(mask)
+    return index[rows[-1]] if len(rows) else None
+
+
+def iter_segment_packets(log_path: str, segment) -> Iterator[memoryview]:
+    """Every packet logged during a segment, read straight from its byte range."""
+    start, end = int(segment['start_offset']), int(segment['end_offset'])
+    if is_block_log(log_path):
+        blocks = [block for block in load_block_index(log_path) if start <= block.offset <= end]
+        start_time, end_time = segment['start_time'], segment['end_time']
+        for packet in iter_block_packets(log_path, blocks=blocks):
+            if start_time <= HEADER_STRUCT.unpack_from(packet)[6] <= end_time:
+                yield packet
+        return
+
+    def segment_spans(view):
+        # From the first lap data packet's length prefix to the end of the last one
+        return iter_packet_spans(view, start - 2, end + struct.unpack_from('<H', view, end - 2)[0])
+
+    yield from iter_mapped_packets(log_path, segment_spans)
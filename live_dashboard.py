@@ -0,0 +1,142 @@
+import json
+import time
+
+import dash
+from dash import dcc, html, Input, Output
+import plotly.graph_objs as go
+from flask import Response, stream_with_context
+
+from live_feed import LiveFeedBuffer
+
+# Parameters
+window_size = 5  # seconds shown
+samples_per_second = 60
+push_interval = 1 / samples_per_second  # seconds between pushes to one browser
+heartbeat_interval = 15  # seconds without samples before a keep-alive comment
+
+# Samples forwarded by `udp_server.py --live-feed`
+feed = LiveFeedBuffer()
+
+# Dash app setup
+app = dash.Dash(__name__)
+app.title = "F1 Telemetry Dashboard (Live)"
+stream_path = app.get_relative_path('/live/stream')
+
+
+def empty_figure(title, traces, yaxis):
+    return {
+        'data': traces,
+        'layout': go.Layout(
+            title=title,
+            xaxis={'title': '', 'range': [0, window_size]},
+            yaxis=yaxis,
+            hovermode='closest',
+            margin=dict(l=40, r=40, t=40, b=40)
+        )
+    }
+
+
+# Layout: figures start empty and only ever receive new points in the browser
+app.layout = html.Div([
+    html.H1("F1 Telemetry Dashboard (Live)", style={'textAlign': 'center'}),
+
+    dcc.Graph(id='throttle-brake-graph', figure=empty_figure('Throttle and Brake', [
+        go.Scatter(x=[], y=[], mode='lines', name='Throttle', line=dict(color='green', width=2)),
+        go.Scatter(x=[], y=[], mode='lines', name='Brake', line=dict(color='red', width=2)),
+    ], {'range': [0, 1]})),
+    dcc.Graph(id='gear-graph', figure=empty_figure('Gear', [
+        go.Scatter(x=[], y=[], mode='lines+markers', name='Gear', line=dict(color='blue', width=2),
+                   marker=dict(size=6)),
+    ], {'title': 'Gear', 'dtick': 1, 'range': [0, 8]})),
+
+    dcc.Store(id='live-stream', data=stream_path),
+    html.Div(id='live-status', style={'display': 'none'}),
+])
+
+
+@app.server.route('/live/stream')
+def live_stream():
+    """Server-sent events carrying only the samples each browser has not seen yet."""
+    def events():
+        seq = max(feed.seq - window_size * samples_per_second, 0)
+        while True:
+            new_seq, samples = feed.read_since(seq, timeout=heartbeat_interval)
+            if new_seq == seq:
+                yield ": keep-alive\n\n"
+                continue
+            seq = new_seq
+            payload = {
+                't': (samples['frame_identifier'] / 60.0).tolist(),  # frame_id in seconds, as in app.py
+                'throttle': samples['throttle'].tolist(),
+                'brake': samples['brake'].tolist(),
+                'gear': samples['gear'].tolist(),
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+            # Anything arriving meanwhile goes out together in the next event
+            time.sleep(push_interval)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Runs once in the browser: subscribe to the stream and extend the traces at most once per frame
+app.clientside_callback(
+    """
+    function (streamPath) {
+        var windowSize = %(window_size)s;
+        var maxPoints = %(max_points)s;
+        var pending = null;
+        var lastTime = null;
+
+        function plot(id) {
+            var graph = document.getElementById(id);
+            return graph && graph.querySelector('.js-plotly-plot');
+        }
+
+        function draw() {
+            var throttleBrake = plot('throttle-brake-graph');
+            var gear = plot('gear-graph');
+            if (!throttleBrake || !gear || !window.Plotly) {
+                window.requestAnimationFrame(draw);  // Graphs not rendered yet
+                return;
+            }
+            var batch = pending;
+            pending = null;
+
+            if (lastTime !== null && batch.t[0] < lastTime) {
+                // Frame counter went backwards (new session): start the traces again
+                Plotly.restyle(throttleBrake, {x: [[], []], y: [[], []]});
+                Plotly.restyle(gear, {x: [[]], y: [[]]});
+            }
+            lastTime = batch.t[batch.t.length - 1];
+
+            var range = {'xaxis.range': [lastTime - windowSize, lastTime]};
+            Plotly.extendTraces(throttleBrake, {x: [batch.t, batch.t], y: [batch.throttle, batch.brake]},
+                                [0, 1], maxPoints);
+            Plotly.relayout(throttleBrake, range);
+            Plotly.extendTraces(gear, {x: [batch.t], y: [batch.gear]}, [0], maxPoints);
+            Plotly.relayout(gear, range);
+        }
+
+        var source = new EventSource(streamPath);
+        source.onmessage = function (event) {
+            var batch = JSON.parse(event.data);
+            if (pending) {
+                for (var key in batch) {
+                    pending[key] = pending[key].concat(batch[key]);
+                }
+                return;  // A redraw is already scheduled
+            }
+            pending = batch;
+            window.requestAnimationFrame(draw);
+        };
+        return 'streaming';
+    }
+    """ % {'window_size': window_size, 'max_points': window_size * samples_per_second * 2},
+    Output('live-status', 'children'),
+    Input('live-stream', 'data')
+)
+
+if __name__ == '__main__':
+    # Threaded because each browser holds a stream open; no reloader, it would bind the feed port twice
+    app.run(debug=False, threaded=True)
@@ -0,0 +1,80 @@
+import socket
+import struct
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# udp_server.py forwards one small datagram per player telemetry sample to this port
+LIVE_FEED_IP = "127.0.0.1"
+LIVE_FEED_PORT = 20778
+
+SAMPLE = struct.Struct('<Iffb')  # frame identifier, throttle, brake, gear
+SAMPLE_DTYPE = np.dtype([('frame_identifier', '<u4'), ('throttle', '<f4'), ('brake', '<f4'), ('gear', 'i1')])
+
+LIVE_BUFFER_SAMPLES = 4096  # ~68 s at 60 Hz; slower readers skip ahead to the newest samples
+
+
+class LiveFeedPublisher:
+    """Fire-and-forget sender used by the UDP listener; never blocks and ignores a missing dashboard."""
+
+    def __init__(self, host: str = LIVE_FEED_IP, port: int = LIVE_FEED_PORT):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def publish(self, record: Dict[str, Any]) -> None:
+        car = record['carTelemetryData']
+        try:
+            self.sock.sendto(SAMPLE.pack(record['header']['frameIdentifier'], car['throttle'], car['brake'],
+                                         car['gear']), self.address)
+        except OSError:
+            pass  # Nobody listening or the socket buffer is full: drop the sample
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class LiveFeedBuffer:
+    """Receives published samples on a background thread into a preallocated ring.
+
+    seq counts every sample ever received, so readers ask for what arrived after the
+    seq they last saw and only ever touch new samples.
+    """
+
+    def __init__(self, host: str = LIVE_FEED_IP, port: int = LIVE_FEED_PORT, capacity: int = LIVE_BUFFER_SAMPLES):
+        self.capacity = capacity
+        self.samples = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.seq = 0
+        self._changed = threading.Condition()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self._thread = threading.Thread(target=self._receive, name='live-feed', daemon=True)
+        self._thread.start()
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                data = self.sock.recv(SAMPLE.size)
+            except OSError:
+                return  # Socket closed
+            if len(data) != SAMPLE.size:
+                continue
+            with self._changed:
+                self.samples[self.seq % self.capacity] = SAMPLE.unpack(data)
+                self.seq += 1
+                self._changed.notify_all()
+
+    def read_since(self, seq: int, timeout: Optional[float] = None) -> Tuple[int, np.ndarray]:
+        """Samples received after seq, oldest first, waiting up to timeout for at least one."""
+        with self._changed:
+            if timeout is not None:
+                self._changed.wait_for(lambda: self.seq > seq, timeout)
+            end = self.seq
+            start = max(seq, end - self.capacity)
+            positions = np.arange(start, end) % self.capacity
+            return end, self.samples[positions]
+
+    def close(self) -> None:
+        self.sock.close()
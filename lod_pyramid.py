@@ -0,0 +1,113 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Each level merges this many buckets of the level below
+LOD_FACTOR = 4
+# Stop adding levels once one has this few buckets
+MIN_BUCKETS = 64
+
+
+def _merge(values: np.ndarray, min_idx: np.ndarray, max_idx: np.ndarray, factor: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Next level up: the extreme samples of every factor consecutive buckets."""
+    pad = -len(min_idx) % factor
+    if pad:
+        # Repeating the last bucket leaves the extremes unchanged
+        min_idx = np.concatenate([min_idx, np.repeat(min_idx[-1:], pad)])
+        max_idx = np.concatenate([max_idx, np.repeat(max_idx[-1:], pad)])
+    min_idx = min_idx.reshape(-1, factor)
+    max_idx = max_idx.reshape(-1, factor)
+    rows = np.arange(len(min_idx))
+    return (min_idx[rows, values[min_idx].argmin(axis=1)],
+            max_idx[rows, values[max_idx].argmax(axis=1)])
+
+
+class LodPyramid:
+    """Min/max-per-bucket levels of detail over time-sorted channels.
+
+    Level k splits the samples into buckets of factor**k and keeps the index of the
+    lowest and highest sample in each, so a spike survives at every level. Only indices
+    are stored; times and values are gathered from the original arrays.
+    """
+
+    def __init__(self, times: np.ndarray, channels: Dict[str, np.ndarray],
+                 levels: Dict[str, List[Tuple[np.ndarray, np.ndarray]]], factor: int = LOD_FACTOR):
+        self.times = times
+        self.channels = channels
+        self.levels = levels
+        self.factor = factor
+
+    @classmethod
+    def build(cls, times: np.ndarray, channels: Dict[str, np.ndarray], factor: int = LOD_FACTOR) -> 'LodPyramid':
+        levels = {}
+        for name, values in channels.items():
+            # Level 0 is the samples themselves
+            min_idx = max_idx = np.arange(len(values), dtype=np.int32)
+            channel_levels = [(min_idx, max_idx)]
+            while len(min_idx) > MIN_BUCKETS:
+                min_idx, max_idx = _merge(values, min_idx, max_idx, factor)
+                channel_levels.append((min_idx, max_idx))
+            levels[name] = channel_levels
+        return cls(times, channels, levels, factor)
+
+    @property
+    def depth(self) -> int:
+        return min(len(channel_levels) for channel_levels in self.levels.values())
+
+    def level_for(self, samples: int, max_points: int) -> int:
+        """Finest level that draws samples consecutive samples with at most max_points points."""
+        level, points = 0, samples
+        while points > max_points and level + 1 < self.depth:
+            level += 1
+            points = 2 * -(-samples // self.factor ** level)  # two per bucket
+        return level
+
+    def window(self, channel: str, lo: int, hi: int, level: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Times and values of samples lo..hi-1 at a level, in time order."""
+        if level == 0:
+            return self.times[lo:hi], self.channels[channel][lo:hi]
+
+        bucket = self.factor ** level
+        min_idx, max_idx = self.levels[channel][level]
+        first, last = lo // bucket, -(-hi // bucket)
+        lows, highs = min_idx[first:last], max_idx[first:last]
+        # Each bucket contributes its two extremes, earliest first
+        idx = np.column_stack([np.minimum(lows, highs), np.maximum(lows, highs)]).ravel()
+        idx = idx[(idx >= lo) & (idx < hi)]
+        return self.times[idx], self.channels[channel][idx]
+
+    def save(self, path: str, source_mtime: int = 0) -> None:
+        arrays = {'factor': np.array(self.factor), 'rows': np.array(len(self.times)),
+                  'source_mtime': np.array(source_mtime)}
+        for name, channel_levels in self.levels.items():
+            for level, (min_idx, max_idx) in enumerate(channel_levels[1:], start=1):
+                arrays[f"{name}/{level}/min"] = min_idx
+                arrays[f"{name}/{level}/max"] = max_idx
+
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+
+def load_or_build_pyramid(cache_path: str, times: np.ndarray, channels: Dict[str, np.ndarray],
+                          source_path: str) -> LodPyramid:
+    """Load the pyramid cached for source_path, rebuilding it when the source has changed."""
+    source_mtime = os.stat(source_path).st_mtime_ns
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            current = int(cached['rows']) == len(times) and int(cached['source_mtime']) == source_mtime
+            if current and all(f"{name}/1/min" in cached or len(times) <= MIN_BUCKETS for name in channels):
+                identity = np.arange(len(times), dtype=np.int32)
+                levels = {}
+                for name in channels:
+                    channel_levels = [(identity, identity)]
+                    while f"{name}/{len(channel_levels)}/min" in cached:
+                        level = len(channel_levels)
+                        channel_levels.append((cached[f"{name}/{level}/min"], cached[f"{name}/{level}/max"]))
+                    levels[name] = channel_levels
+                return LodPyramid(times, channels, levels, int(cached['factor']))
+
+    pyramid = LodPyramid.build(times, channels)
+    pyramid.save(cache_path, source_mtime)
+    return pyramid
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from batch_decoder import decode_log_batch, player_columns
+from distance_resample import DISTANCE_STEP, distance_grid, resample_laps, session_track_length
+from lap_index import LAP_SEGMENT, load_lap_index
+
+OPENF1_URL = 'https://api.openf1.org/v1'
+# Cached payloads: <root>/<session_key>/<driver_number>/<endpoint>.npz
+OPENF1_CACHE_DIR = 'openf1_cache'
+ENDPOINTS = ('car_data', 'laps', 'location')
+DATE_FIELDS = ('date', 'date_start')
+
+STAND_IN_PORT = 8765
+# Wall clock the stand-in puts session time 0 at, for payloads built from game logs
+STAND_IN_EPOCH = np.datetime64('2021-10-31T19:00:00', 'us')
+
+REQUEST_TIMEOUT = 30  # seconds
+
+
+def parse_dates(values: List[Optional[str]]) -> np.ndarray:
+    """ISO 8601 UTC timestamps → float seconds since the epoch (NaN for missing ones)."""
+    cleaned = [value.replace('+00:00', '').rstrip('Z') if value else 'NaT' for value in values]
+    dates = np.array(cleaned, dtype='datetime64[us]')
+    seconds = dates.astype(np.int64) / 1e6
+    seconds[np.isnat(dates)] = np.nan
+    return seconds
+
+
+def format_dates(seconds: np.ndarray) -> List[str]:
+    dates = (seconds * 1e6).astype(np.int64).astype('datetime64[us]')
+    return [f"{value}+00:00" for value in np.datetime_as_string(dates, unit='us')]
+
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """OpenF1 JSON records → one array per field (dates as epoch seconds, missing numbers as NaN)."""
+    fields = []
+    for record in records:
+        fields += [field for field in record if field not in fields]
+
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        if field in DATE_FIELDS:
+            columns[field] = parse_dates(values)
+        elif any(isinstance(value, bool) for value in values) and \
+                all(isinstance(value, bool) or value is None for value in values):
+            columns[field] = np.array([bool(value) for value in values])
+        elif all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            columns[field] = np.array(values, dtype=np.int64)
+        elif all(isinstance(value, (int, float)) or value is None for value in values):
+            columns[field] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        elif all(isinstance(value, str) or value is None for value in values):
+            columns[field] = np.array(['' if value is None else value for value in values])
+        # Nested values (e.g. segment lists) are not cached
+    return columns
+
+
+def fetch_json(endpoint: str, base_url: str = OPENF1_URL, **params) -> List[Dict[str, Any]]:
+    url = f"{base_url}/{endpoint}?{urllib.parse.urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+        return json.load(response)
+
+
+class OpenF1Store:
+    """OpenF1 car_data, laps and location payloads cached as compressed columns per session and driver.
+
+    Each payload is fetched and parsed once; later reads load the .npz columns directly.
+    """
+
+    def __init__(self, root: str = OPENF1_CACHE_DIR, base_url: str = OPENF1_URL):
+        self.root = root
+        self.base_url = base_url
+
+    def path(self, endpoint: str, session_key: int, driver_number: int) -> str:
+        return os.path.join(self.root, str(session_key), str(driver_number), f"{endpoint}.npz")
+
+    def has(self, endpoint: str, session_key: int, driver_number: int) -> bool:
+        return os.path.exists(self.path(endpoint, session_key, driver_number))
+
+    def save(self, endpoint: str, session_key: int, driver_number: int, columns: Dict[str, np.ndarray]) -> None:
+        path = self.path(endpoint, session_key, driver_number)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, **columns)
+        os.replace(tmp_path, path)
+
+    def get(self, endpoint: str, session_key: int, driver_number: int) -> Dict[str, np.ndarray]:
+        """Columns of one payload, fetched from the API only on a cache miss."""
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown OpenF1 endpoint {endpoint!r}")
+        if not self.has(endpoint, session_key, driver_number):
+            records = fetch_json(endpoint, self.base_url, session_key=session_key, driver_number=driver_number)
+            self.save(endpoint, session_key, driver_number, records_to_columns(records))
+        with np.load(self.path(endpoint, session_key, driver_number)) as cached:
+            return {name: cached[name] for name in cached.files}
+
+    def align(self, session_key: int, driver_number: int, grid: np.ndarray,
+              track_length: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Real laps of a driver on a lap distance grid, in the game's channel units (see distance_resample).
+
+        OpenF1 has no lap distance, so it is integrated from speed within each lap and, given the
+        track length, scaled so every lap ends on the line.
+        """
+        car = self.get('car_data', session_key, driver_number)
+        laps = self.get('laps', session_key, driver_number)
+        if not len(car.get('date', ())) or not len(laps.get('date_start', ())):
+            return np.empty(0, dtype=np.int64), {}
+
+        order = np.argsort(car['date'], kind='stable')
+        dates = car['date'][order]
+        # Finished laps in start order
+        usable = np.flatnonzero(~np.isnan(laps['date_start']) & ~np.isnan(laps['lap_duration']))
+        usable = usable[np.argsort(laps['date_start'][usable], kind='stable')]
+        lap_numbers, starts = laps['lap_number'][usable], laps['date_start'][usable]
+        ends = starts + laps['lap_duration'][usable]
+
+        # Lap of every sample: the latest lap started at or before it, if that lap is still running
+        lap_pos = np.searchsorted(starts, dates, side='right') - 1
+        in_lap = (lap_pos >= 0) & (dates <= ends[np.maximum(lap_pos, 0)])
+        lap_pos, dates, order = lap_pos[in_lap], dates[in_lap], order[in_lap]
+
+        speed = car['speed'][order] / 3.6
+        step_distance = np.append(0.0, (speed[1:] + speed[:-1]) / 2 * np.diff(dates))
+        step_distance[np.append(True, lap_pos[1:] != lap_pos[:-1])] = 0.0  # restart at each lap
+        travelled = np.cumsum(step_distance)
+        lap_first = np.searchsorted(lap_pos, lap_pos, side='left')
+        distance = travelled - travelled[lap_first]
+        if track_length:
+            lap_last = np.searchsorted(lap_pos, lap_pos, side='right') - 1
+            distance *= track_length / np.maximum(distance[lap_last], 1.0)
+
+        table = {
+            'current_lap_num': lap_numbers[lap_pos],
+            'lap_distance': distance,
+            'speed': car['speed'][order],
+            'throttle': car['throttle'][order] / 100.0,
+            'brake': car['brake'][order] / 100.0,
+            'gear': car['n_gear'][order],
+            'engine_rpm': car['rpm'][order],
+            'drs': car['drs'][order],
+            'lap_time_ms': (dates - starts[lap_pos]) * 1000.0,
+        }
+        span = float(track_length or distance.max()) + (grid[1] - grid[0] if len(grid) > 1 else DISTANCE_STEP)
+        return resample_laps(table, grid, span)
+
+
+def payloads_from_log(log_path: str, session_key: int = 1, driver_number: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+    """OpenF1-shaped car_data, laps and location records built from the player's car in a game log."""
+    decoded = decode_log_batch(log_path, packet_ids=(0, 6))
+    epoch = STAND_IN_EPOCH.astype(np.int64) / 1e6
+    payloads = {endpoint: [] for endpoint in ENDPOINTS}
+    keys = {'session_key': session_key, 'meeting_key': session_key, 'driver_number': driver_number}
+
+    if 'car_telemetry' in decoded:
+        car = player_columns(decoded['car_telemetry'])
+        for date, speed, throttle, brake, gear, rpm, drs in zip(
+                format_dates(epoch + car['session_time'].astype(np.float64)), car['speed'].tolist(),
+                car['throttle'].tolist(), car['brake'].tolist(), car['gear'].tolist(),
+                car['engine_rpm'].tolist(), car['drs'].tolist()):
+            payloads['car_data'].append(dict(keys, date=date, speed=speed, throttle=round(throttle * 100),
+                                             brake=100 if brake > 0.5 else 0, n_gear=gear, rpm=rpm, drs=drs))
+
+    if 'motion' in decoded:
+        motion = player_columns(decoded['motion'])
+        for date, (x, y, z) in zip(format_dates(epoch + motion['session_time'].astype(np.float64)),
+                                   motion['position'].tolist()):
+            # OpenF1 is z-up; the game is y-up
+            payloads['location'].append(dict(keys, date=date, x=round(x), y=round(z), z=round(y)))
+
+    laps = load_lap_index(log_path)
+    laps = laps[laps['sector'] == LAP_SEGMENT]
+    for lap, start, time_ms, complete in zip(laps['lap'].tolist(), format_dates(epoch + laps['start_time'].astype(np.float64)),
+                                             laps['time_ms'].tolist(), laps['complete'].tolist()):
+        payloads['laps'].append(dict(keys, lap_number=lap, date_start=start,
+                                     lap_duration=time_ms / 1000 if complete else None, is_pit_out_lap=False))
+    return payloads
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers /v1/<endpoint>?field=value... from in-memory payloads, filtering on equality like OpenF1."""
+
+    payloads: Dict[str, List[Dict[str, Any]]] = {}
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint not in self.payloads:
+            self.send_error(404, f"Unknown endpoint {endpoint}")
+            return
+
+        filters = dict(urllib.parse.parse_qsl(url.query))
+        records = [record for record in self.payloads[endpoint]
+                   if all(str(record.get(field)) == value for field, value in filters.items())]
+        body = json.dumps(records).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # No access log line per request on stderr, whether serving the CLI or the tests
+
+
+def start_stand_in(payloads: Dict[str, List[Dict[str, Any]]], port: int = STAND_IN_PORT) -> ThreadingHTTPServer:
+    """Serve payloads on localhost from a background thread; returns the server (call shutdown() to stop)."""
+    handler = type('PayloadHandler', (StandInHandler,), {'payloads': payloads})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache OpenF1 reference data, or serve a local stand-in for it.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch = subparsers.add_parser('fetch', help="cache car_data, laps and location for a session and driver")
+    fetch.add_argument('session_key', type=int)
+    fetch.add_argument('driver_number', type=int)
+    fetch.add_argument('--url', default=OPENF1_URL, help="API base URL (e.g. the stand-in's)")
+
+    serve = subparsers.add_parser('serve', help="serve OpenF1-shaped data built from a game log")
+    serve.add_argument('log', help="raw or block .bin log")
+    serve.add_argument('--port', type=int, default=STAND_IN_PORT)
+    serve.add_argument('--session-key', type=int, default=1)
+    serve.add_argument('--driver-number', type=int, default=1)
+
+    align = subparsers.add_parser('align', help="print cached laps on the lap distance grid of a game log")
+    align.add_argument('session_key', type=int)
+    align.add_argument('driver_number', type=int)
+    align.add_argument('log', help="game log whose track length sets the grid")
+    align.add_argument('--step', type=float, default=DISTANCE_STEP, help="metres between grid points")
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        store = OpenF1Store(base_url=args.url)
+        for endpoint in ENDPOINTS:
+            columns = store.get(endpoint, args.session_key, args.driver_number)
+            rows = len(next(iter(columns.values()))) if columns else 0
+            print(f" {endpoint}: {rows} rows -> {store.path(endpoint, args.session_key, args.driver_number)}")
+
+    elif args.command == 'serve':
+        payloads = payloads_from_log(args.log, args.session_key, args.driver_number)
+        server = start_stand_in(payloads, args.port)
+        print(f" Serving {', '.join(f'{len(records)} {name}' for name, records in payloads.items())} "
+              f"on http://127.0.0.1:{args.port}/v1")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+
+    else:
+        track_length = session_track_length(args.log)
+        laps, channels = OpenF1Store().align(args.session_key, args.driver_number,
+                                             distance_grid(track_length or 0, args.step), track_length)
+        for i, lap in enumerate(laps.tolist()):
+            print(f" Lap {lap}: top speed {np.nanmax(channels['speed'][i]):.0f} km/h, "
+                  f"lap time {np.nanmax(channels['lap_time_ms'][i]) / 1000:.3f} s at the last grid point")
+
+if __name__ == "__main__":
+    main()
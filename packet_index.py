@@ -0,0 +1,122 @@
+import mmap
+import os
+import struct
+from typing import Iterator, Optional
+
+import numpy as np
+
+from block_log import is_block_log
+from Packet_decoder import HEADER_FORMAT, iter_mapped_packets, iter_packet_spans
+from sidecar import SidecarFormat, SidecarWriter, read_sidecar
+
+# Sidecar index written next to each log as <log>.idx
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'F1IX'
+INDEX_VERSION = 1
+
+# One fixed-width row per packet; offset points at the payload, past the length prefix
+INDEX_ROW = struct.Struct('<QHBIfQ')
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('length', '<u2'),
+    ('packet_id', 'u1'),
+    ('frame_identifier', '<u4'),
+    ('session_time', '<f4'),
+    ('session_uid', '<u8'),
+])
+INDEX_SIDECAR = SidecarFormat(INDEX_MAGIC, INDEX_VERSION, INDEX_ROW.size, "packet index")
+
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+
+
+def index_path_for(log_path: str) -> str:
+    return log_path + INDEX_SUFFIX
+
+
+def pack_index_row(offset: int, packet) -> bytes:
+    """Build the index row for a packet whose payload starts at offset in the log."""
+    header = HEADER_STRUCT.unpack_from(packet)
+    return INDEX_ROW.pack(offset, len(packet), header[4], header[7], header[6], header[5])
+
+
+class IndexWriter(SidecarWriter):
+    """Appends index rows while a log is being written."""
+
+    def __init__(self, log_path: str):
+        super().__init__(index_path_for(log_path), INDEX_SIDECAR)
+
+    def append(self, offset: int, packet) -> None:
+        self.write(pack_index_row(offset, packet))
+
+    def append_rows(self, rows: bytes) -> None:
+        self.write(rows)
+
+
+def _read_index_rows(path: str) -> np.ndarray:
+    return read_sidecar(path, INDEX_SIDECAR).view(INDEX_DTYPE)
+
+
+def build_index(log_path: str, start_offset: int = 0) -> int:
+    """Index the packets of a log from start_offset (a length prefix) onwards; returns rows written."""
+    size = os.path.getsize(log_path)
+    if size <= start_offset:
+        return 0
+    if is_block_log(log_path):
+        raise ValueError(f"{log_path} is a block log; use block_log.load_block_index")
+
+    count = 0
+    writer = IndexWriter(log_path)
+    try:
+        with open(log_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as whole, whole[start_offset:] as view:
+                rows = bytearray()
+                for offset, length in iter_packet_spans(view):
+                    rows += pack_index_row(start_offset + offset, view[offset:offset + length])
+                    count += 1
+            writer.append_rows(rows)
+    finally:
+        writer.close()
+    return count
+
+
+def load_index(log_path: str) -> np.ndarray:
+    """Load the sidecar index of a log, creating or extending it if the log has grown."""
+    path = index_path_for(log_path)
+    if not os.path.exists(path):
+        if not build_index(log_path):
+            return np.empty(0, dtype=INDEX_DTYPE)  # Nothing logged yet
+        return _read_index_rows(path)
+
+    rows = _read_index_rows(path)
+    indexed_end = int(rows['offset'][-1]) + int(rows['length'][-1]) if len(rows) else 0
+    if indexed_end < os.path.getsize(log_path) and build_index(log_path, indexed_end):
+        rows = _read_index_rows(path)
+    return rows
+
+
+def query_index(index: np.ndarray, packet_id: Optional[int] = None,
+                start_time: Optional[float] = None, end_time: Optional[float] = None,
+                start_frame: Optional[int] = None, end_frame: Optional[int] = None,
+                session_uid: Optional[int] = None) -> np.ndarray:
+    """Select index rows by packet type, session time and frame ranges (bounds inclusive)."""
+    mask = np.ones(len(index), dtype=bool)
+    if packet_id is not None:
+        mask &= index['packet_id'] == packet_id
+    if start_time is not None:
+        mask &= index['session_time'] >= start_time
+    if end_time is not None:
+        mask &= index['session_time'] <= end_time
+    if start_frame is not None:
+        mask &= index['frame_identifier'] >= start_frame
+    if end_frame is not None:
+        mask &= index['frame_identifier'] <= end_frame
+    if session_uid is not None:
+        mask &= index['session_uid'] == session_uid
+    return index[mask]
+
+
+def iter_indexed_packets(log_path: str, rows: np.ndarray) -> Iterator[memoryview]:
+    """Yield the packets referenced by index rows straight from the memory-mapped log."""
+    if len(rows) == 0:
+        return
+    yield from iter_mapped_packets(log_path, lambda view: zip(rows['offset'].tolist(), rows['length'].tolist()))
@@ -0,0 +1,96 @@
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from Packet_decoder import LENGTH_PREFIX
+
+RING_SECONDS = 30.0
+RING_BYTES = 16 * 1024 * 1024  # ~50 s of every packet type at a 60 Hz send rate
+RING_PACKETS = 32768
+
+
+class PacketRing:
+    """The most recent datagrams, kept in one preallocated bytearray.
+
+    Packets are copied into the buffer back to back and wrap to the start when the end
+    is reached; the oldest are evicted when their bytes are needed, when there are
+    max_packets of them, or once they are older than seconds. Appending allocates nothing.
+    """
+
+    def __init__(self, seconds: float = RING_SECONDS, capacity: int = RING_BYTES, max_packets: int = RING_PACKETS):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.max_packets = max_packets
+        self._buffer = bytearray(capacity)
+        self._offsets = array('I', [0]) * max_packets
+        self._lengths = array('I', [0]) * max_packets
+        self._times = array('d', [0.0]) * max_packets
+        self._head = 0  # slot of the oldest packet
+        self._count = 0
+        self._write_pos = 0
+        # Snapshots may be taken from another thread (or a signal handler) while packets arrive
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _evict(self) -> None:
+        self._head = (self._head + 1) % self.max_packets
+        self._count -= 1
+
+    def append(self, data, received_at: Optional[float] = None) -> None:
+        size = len(data)
+        if size > self.capacity:
+            return
+        now = time.monotonic() if received_at is None else received_at
+        offsets, lengths = self._offsets, self._lengths
+
+        with self._lock:
+            cutoff = now - self.seconds
+            while self._count and (self._count == self.max_packets or self._times[self._head] < cutoff):
+                self._evict()
+
+            position = self._write_pos
+            if position + size > self.capacity:
+                # Wrap: everything left in the skipped tail is older than what sits at the start
+                while self._count and offsets[self._head] >= position:
+                    self._evict()
+                position = 0
+            end = position + size
+            while self._count and offsets[self._head] < end and offsets[self._head] + lengths[self._head] > position:
+                self._evict()
+
+            self._buffer[position:end] = data
+            slot = (self._head + self._count) % self.max_packets
+            offsets[slot] = position
+            lengths[slot] = size
+            self._times[slot] = now
+            self._count += 1
+            self._write_pos = end
+
+    def snapshot(self, seconds: Optional[float] = None) -> List[bytes]:
+        """Copy out the packets received in the last seconds (all of them by default), oldest first.
+
+        The result can go straight to Packet_decoder.iter_decoded or batch_decoder.decode_packets_batch.
+        """
+        cutoff = time.monotonic() - seconds if seconds is not None else None
+        with self._lock:
+            packets = []
+            for i in range(self._count):
+                slot = (self._head + i) % self.max_packets
+                if cutoff is None or self._times[slot] >= cutoff:
+                    offset = self._offsets[slot]
+                    packets.append(bytes(self._buffer[offset:offset + self._lengths[slot]]))
+            return packets
+
+    def clear(self) -> None:
+        with self._lock:
+            self._head = self._count = self._write_pos = 0
+
+    def write_snapshot(self, file_path: str, seconds: Optional[float] = None) -> int:
+        """Save a snapshot as a raw length-prefixed log readable by Packet_decoder; returns packets written."""
+        packets = self.snapshot(seconds)
+        with open(file_path, 'wb') as f:
+            f.write(b''.join(LENGTH_PREFIX.pack(len(packet)) + packet for packet in packets))
+        return len(packets)
@@ -0,0 +1,738 @@
+import struct
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Declarative packet layouts. Each field is (name, struct code, shape, converter):
+#   shape 1 -> scalar, n -> list of n values, tuple of names -> dict keyed by those names.
+# Names starting with '_' are read to advance the offset but left out of decoded output.
+# Every layout is compiled once into a struct.Struct at import time.
+
+NUM_CARS = 22
+XYZ = ('x', 'y', 'z')
+
+
+def normalize_direction(value: int) -> float:
+    """Scale a packed int16 direction component to [-1, 1]."""
+    return max(-1.0, min(1.0, value / 32767.0))
+
+
+def decode_name(value: bytes) -> str:
+    return value.decode('utf-8', errors='ignore').rstrip('\x00')
+
+
+class Field(NamedTuple):
+    name: str
+    code: str
+    shape: Union[int, Tuple[str, ...]] = 1
+    convert: Optional[Callable[[Any], Any]] = None
+
+    @property
+    def count(self) -> int:
+        return self.shape if isinstance(self.shape, int) else len(self.shape)
+
+
+class Record:
+    """A run of fields compiled into a single little-endian struct.Struct."""
+
+    def __init__(self, fields: Sequence[tuple]):
+        self.fields = tuple(Field(*field) for field in fields)
+        self.struct = struct.Struct('<' + ''.join(
+            field.code if field.count == 1 else f"{field.count}{field.code}" for field in self.fields
+        ))
+        self.size = self.struct.size
+
+        # (name, start, stop, count, keys, convert) per visible field, used to rebuild nested values
+        self._plan = []
+        position = 0
+        for field in self.fields:
+            stop = position + field.count
+            if not field.name.startswith('_'):
+                keys = field.shape if isinstance(field.shape, tuple) else None
+                self._plan.append((field.name, position, stop, field.count, keys, field.convert))
+            position = stop
+
+        # Records made only of plain scalars can be built with a single zip
+        self._flat_names = None
+        if all(count == 1 and convert is None for _, _, _, count, _, convert in self._plan) \
+                and len(self._plan) == len(self.fields):
+            self._flat_names = tuple(name for name, *_ in self._plan)
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(name for name, *_ in self._plan)
+
+    @property
+    def slot_shapes(self) -> Tuple[Any, ...]:
+        """How each visible field is stored in a compact record: scalar, list or keyed group."""
+        return tuple(keys if keys else (LIST if count > 1 else SCALAR) for _, _, _, count, keys, _ in self._plan)
+
+    def compact_values(self, values: tuple) -> tuple:
+        """Visible field values with multi-value fields kept as tuples instead of lists or dicts."""
+        if self._flat_names is not None:
+            return values
+
+        compact = []
+        for _, start, stop, count, keys, convert in self._plan:
+            if count == 1 and keys is None:
+                compact.append(convert(values[start]) if convert else values[start])
+            else:
+                items = values[start:stop]
+                compact.append(tuple(map(convert, items)) if convert else items)
+        return tuple(compact)
+
+    def subset_struct(self, names: Sequence[str]) -> struct.Struct:
+        """Struct that reads only the named fields (in layout order) and skips the rest as padding."""
+        wanted = set(names)
+        parts = []
+        for field in self.fields:
+            size = struct.calcsize('<' + (field.code if field.count == 1 else f"{field.count}{field.code}"))
+            if field.name in wanted:
+                parts.append(field.code if field.count == 1 else f"{field.count}{field.code}")
+            else:
+                parts.append(f"{size}x")
+        return struct.Struct('<' + ''.join(parts))
+
+    def to_dict(self, values: tuple) -> Dict[str, Any]:
+        """Arrange unpacked values into the decoded dict shape."""
+        if self._flat_names is not None:
+            return dict(zip(self._flat_names, values))
+
+        decoded = {}
+        for name, start, stop, count, keys, convert in self._plan:
+            if keys is not None:
+                items = values[start:stop]
+                decoded[name] = dict(zip(keys, map(convert, items) if convert else items))
+            elif count == 1:
+                decoded[name] = convert(values[start]) if convert else values[start]
+            else:
+                items = values[start:stop]
+                decoded[name] = list(map(convert, items) if convert else items)
+        return decoded
+
+    def unpack(self, buffer, offset: int = 0) -> Dict[str, Any]:
+        return self.to_dict(self.struct.unpack_from(buffer, offset))
+
+
+# Sections describe where records sit inside a packet body, in order
+class Block(NamedTuple):
+    """Fields at the running offset, merged into the top level of the packet."""
+    record: Record
+
+
+class PlayerCar(NamedTuple):
+    """NUM_CARS consecutive records; only the player's one is decoded and merged."""
+    record: Record
+
+
+class AllCars(NamedTuple):
+    """NUM_CARS consecutive records decoded into a list under key, each tagged with its index."""
+    key: str
+    record: Record
+
+
+class Tail(NamedTuple):
+    """A record anchored to the end of the packet, nested under key."""
+    key: str
+    record: Record
+
+
+Section = Union[Block, PlayerCar, AllCars, Tail]
+
+
+class PacketSchema(NamedTuple):
+    name: str
+    sections: Tuple[Section, ...]
+
+    @property
+    def fixed_size(self) -> Optional[int]:
+        """Body size when every section has a fixed position, else None."""
+        size = 0
+        for section in self.sections:
+            if isinstance(section, Tail):
+                return None
+            size += section.record.size * (NUM_CARS if isinstance(section, (PlayerCar, AllCars)) else 1)
+        return size
+
+
+# Slot shapes of compact record types; a tuple of names means a keyed group
+SCALAR = None
+LIST = 'list'
+NESTED = 'nested'
+NESTED_LIST = 'nested_list'
+MERGED = 'merged'
+
+
+class CompactRecord:
+    """Mixin for the generated named tuples that stand in for decoded packet dicts."""
+    __slots__ = ()
+    _shapes: Tuple[Any, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Rebuild the dict the regular decoders return."""
+        decoded = {}
+        for name, shape, value in zip(self._fields, self._shapes, self):
+            if shape is SCALAR:
+                decoded[name] = value
+            elif shape == LIST:
+                decoded[name] = list(value)
+            elif shape == NESTED:
+                decoded[name] = value.to_dict()
+            elif shape == NESTED_LIST:
+                decoded[name] = [item.to_dict() for item in value]
+            elif shape == MERGED:
+                if value is not None:
+                    decoded.update(value.to_dict())
+            else:
+                decoded[name] = dict(zip(shape, value))
+        return decoded
+
+
+def make_record_type(type_name: str, names: Sequence[str], shapes: Sequence[Any], base: type = CompactRecord) -> type:
+    """Create a named tuple type whose to_dict() follows the given slot shapes."""
+    return type(type_name, (namedtuple(type_name, names), base), {'__slots__': (), '_shapes': tuple(shapes)})
+
+
+def camel_case(name: str) -> str:
+    return ''.join(part.title() for part in name.split('_'))
+
+
+class CompactLayout(NamedTuple):
+    """Record type of a packet plus the types of its nested sections."""
+    record_type: type
+    section_types: Tuple[Optional[type], ...]
+
+
+@lru_cache(maxsize=None)
+def compact_layout(schema: PacketSchema) -> CompactLayout:
+    """Build (once per schema) the compact record types for a packet layout."""
+    names = ['packet_id', 'frame_id']
+    shapes = [SCALAR, SCALAR]
+    section_types = []
+
+    for section in schema.sections:
+        record = section.record
+        if isinstance(section, (Block, PlayerCar)):
+            names.extend(record.names)
+            shapes.extend(record.slot_shapes)
+            section_types.append(None)
+        elif isinstance(section, AllCars):
+            names.append(section.key)
+            shapes.append(NESTED_LIST)
+            section_types.append(make_record_type(
+                f"{camel_case(section.key)}Entry", ('index',) + record.names, (SCALAR,) + record.slot_shapes))
+        else:
+            names.append(section.key)
+            shapes.append(NESTED)
+            section_types.append(make_record_type(camel_case(section.key), record.names, record.slot_shapes))
+
+    return CompactLayout(make_record_type(camel_case(schema.name), names, shapes), tuple(section_types))
+
+
+
+# Lazy views: fields are unpacked from the raw buffer on first access and cached in a slot,
+# so later reads are plain attribute lookups. __getattr__ only runs while a slot is still empty.
+FIELD = 'field'
+CARS = 'cars'
+RECORD = 'record'
+
+
+class LazyView:
+    """Base for generated lazy views over a packet buffer."""
+    __slots__ = ('_buffer', '_bases')
+    # name -> (kind, section index, offset in record, struct.Struct, count, keys, convert, nested view type)
+    _specs: Dict[str, tuple] = {}
+
+    def __init__(self, buffer, bases: Tuple[int, ...]):
+        self._buffer = buffer
+        self._bases = bases
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            kind, section, offset, unpacker, count, keys, convert, view_type = type(self)._specs[name]
+        except KeyError:
+            raise AttributeError(f"{type(self).__name__} has no field {name!r}") from None
+
+        base = self._bases[section] + offset
+        if kind == FIELD:
+            items = unpacker.unpack_from(self._buffer, base)
+            if convert:
+                items = tuple(map(convert, items))
+            if keys:
+                value = dict(zip(keys, items))
+            elif count > 1:
+                value = list(items)
+            else:
+                value = items[0]
+        elif kind == CARS:
+            value = []
+            for i in range(NUM_CARS):
+                car = view_type(self._buffer, (base + i * view_type._size,))
+                car.index = i
+                value.append(car)
+        else:
+            value = view_type(self._buffer, (base,))
+
+        setattr(self, name, value)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Decode every field; matches the dict returned by the regular decoders."""
+        decoded = {}
+        for name in type(self).__slots__:
+            value = getattr(self, name)
+            if isinstance(value, LazyView):
+                value = value.to_dict()
+            elif isinstance(value, list) and value and isinstance(value[0], LazyView):
+                value = [item.to_dict() for item in value]
+            decoded[name] = value
+        return decoded
+
+
+def _record_specs(record: Record, section: int) -> Dict[str, tuple]:
+    specs = {}
+    offset = 0
+    for field in record.fields:
+        code = field.code if field.count == 1 else f"{field.count}{field.code}"
+        unpacker = struct.Struct('<' + code)
+        if not field.name.startswith('_'):
+            keys = field.shape if isinstance(field.shape, tuple) else None
+            specs[field.name] = (FIELD, section, offset, unpacker, field.count, keys, field.convert, None)
+        offset += unpacker.size
+    return specs
+
+
+def make_view_type(type_name: str, specs: Dict[str, tuple], eager: Tuple[str, ...] = (), size: int = 0) -> type:
+    """Create a LazyView subclass with one cache slot per field."""
+    return type(type_name, (LazyView,), {
+        '__slots__': eager + tuple(specs),
+        '_specs': specs,
+        '_size': size,
+    })
+
+
+@lru_cache(maxsize=None)
+def lazy_view_type(schema: PacketSchema) -> type:
+    """Build (once per schema) the lazy view type for a packet layout."""
+    specs = {}
+    for i, section in enumerate(schema.sections):
+        record = section.record
+        if isinstance(section, (Block, PlayerCar)):
+            specs.update(_record_specs(record, i))
+        elif isinstance(section, AllCars):
+            car_type = make_view_type(f"{camel_case(section.key)}EntryView", _record_specs(record, 0),
+                                      eager=('index',), size=record.size)
+            specs[section.key] = (CARS, i, 0, None, NUM_CARS, None, None, car_type)
+        else:
+            tail_type = make_view_type(f"{camel_case(section.key)}View", _record_specs(record, 0), size=record.size)
+            specs[section.key] = (RECORD, i, 0, None, 1, None, None, tail_type)
+
+    return make_view_type(f"{camel_case(schema.name)}View", specs, eager=('packet_id', 'frame_id'))
+
+# Packet headers, keyed by packet_format (the first uint16 of every packet)
+PACKET_FORMAT = struct.Struct('<H')
+
+HEADER_2021 = Record([
+    ('packet_format', 'H'),
+    ('game_major_version', 'B'),
+    ('game_minor_version', 'B'),
+    ('packet_version', 'B'),
+    ('packet_id', 'B'),
+    ('session_uid', 'Q'),
+    ('session_time', 'f'),
+    ('frame_identifier', 'I'),
+    ('player_car_index', 'B'),
+    ('secondary_player_car_index', 'B'),
+])
+
+HEADER_2023 = Record([
+    ('packet_format', 'H'),
+    ('game_year', 'B'),
+    ('game_major_version', 'B'),
+    ('game_minor_version', 'B'),
+    ('packet_version', 'B'),
+    ('packet_id', 'B'),
+    ('session_uid', 'Q'),
+    ('session_time', 'f'),
+    ('frame_identifier', 'I'),
+    ('overall_frame_identifier', 'I'),
+    ('player_car_index', 'B'),
+    ('secondary_player_car_index', 'B'),
+])
+
+HEADER_LAYOUTS = {
+    2021: HEADER_2021,
+    2022: HEADER_2021,
+    2023: HEADER_2023,
+}
+
+# F1 2021 packet bodies
+# packet 0
+CAR_MOTION_2021 = Record([
+    ('position', 'f', XYZ),
+    ('velocity', 'f', XYZ),
+    ('forward_dir', 'h', XYZ, normalize_direction),
+    ('right_dir', 'h', XYZ, normalize_direction),
+    ('g_force', 'f', ('lateral', 'longitudinal', 'vertical')),
+    ('rotation', 'f', ('yaw', 'pitch', 'roll')),
+])
+
+MOTION_EXTRA_2021 = Record([
+    ('suspension_position', 'f', 4),
+    ('suspension_velocity', 'f', 4),
+    ('suspension_acceleration', 'f', 4),
+    ('wheel_speed', 'f', 4),
+    ('wheel_slip', 'f', 4),
+    ('local_velocity', 'f', XYZ),
+    ('angular_velocity', 'f', XYZ),
+    ('angular_acceleration', 'f', XYZ),
+    ('front_wheels_angle', 'f'),
+])
+
+# packet 1
+SESSION_2021 = Record([
+    ('weather', 'B'),
+    ('track_temp', 'b'),
+    ('air_temp', 'b'),
+    ('total_laps', 'B'),
+    ('track_length', 'H'),
+    ('session_type', 'B'),
+    ('track_id', 'b'),
+    ('formula', 'B'),
+    ('session_time_left', 'H'),
+    ('session_duration', 'H'),
+    ('pit_speed_limit', 'B'),
+    ('game_paused', 'B'),
+    ('is_spectating', 'B'),
+    ('spectator_car_index', 'B'),
+    ('sli_pro_native_support', 'B'),
+    ('num_marshal_zones', 'B'),
+])
+
+# Assist settings — 9 bytes at the very end
+ASSIST_SETTINGS_2021 = Record([
+    ('steering_assist', 'B'),
+    ('braking_assist', 'B'),
+    ('gearbox_assist', 'B'),
+    ('pit_assist', 'B'),
+    ('pit_release_assist', 'B'),
+    ('ers_assist', 'B'),
+    ('drs_assist', 'B'),
+    ('racing_line', 'B'),
+    ('racing_line_type', 'B'),
+])
+
+# packet 2
+LAP_DATA_2021 = Record([
+    ('last_lap_time_ms', 'I'),
+    ('current_lap_time_ms', 'I'),
+    ('sector1_time_ms', 'H'),
+    ('sector2_time_ms', 'H'),
+    ('lap_distance', 'f'),
+    ('total_distance', 'f'),
+    ('safety_car_delta', 'f'),
+    ('car_position', 'B'),
+    ('current_lap_num', 'B'),
+    ('pit_status', 'B'),
+    ('num_pit_stops', 'B'),
+    ('sector', 'B'),
+    ('current_lap_invalid', 'B'),
+    ('penalties', 'B'),
+    ('warnings', 'B'),
+    ('num_unserved_drive_through_pens', 'B'),
+    ('num_unserved_stop_go_pens', 'B'),
+    ('grid_position', 'B'),
+    ('driver_status', 'B'),
+    ('result_status', 'B'),
+    ('pit_lane_timer_active', 'B'),
+    ('pit_lane_time_in_lane_ms', 'H'),
+    ('pit_stop_timer_ms', 'H'),
+    ('pit_stop_should_serve_pen', 'B'),
+])
+
+# packet 3: event details follow the 4-character event code
+EVENT_CODE = Record([('event_code', '4s')])
+
+EVENT_DETAILS_2021 = {
+    'FTLP': Record([('vehicle_idx', 'B'), ('lap_time', 'f')]),  # Fastest Lap
+    'RTMT': Record([('vehicle_idx', 'B')]),  # Retirement
+    'RCWN': Record([('winner', 'B')]),  # Race Winner
+    'PENA': Record([  # Penalty
+        ('penalty_type', 'B'),
+        ('infringement_type', 'B'),
+        ('vehicle_idx', 'B'),
+        ('other_vehicle_idx', 'B'),
+        ('time', 'B'),
+        ('lap_num', 'H'),
+        ('places_gained', 'B'),
+    ]),
+    'SPTP': Record([  # Speed Trap - Fastest Speed
+        ('vehicle_idx', 'B'),
+        ('speed', 'f'),
+        ('is_overall_fastest', 'B'),
+    ]),
+}
+
+# packet 4
+PARTICIPANT_2021 = Record([
+    ('ai_controlled', 'B', 1, bool),
+    ('driver_id', 'B'),
+    ('network_id', 'B'),
+    ('team_id', 'B'),
+    ('my_team', 'B', 1, bool),
+    ('race_number', 'B'),
+    ('nationality', 'B'),
+    ('name', '48s', 1, decode_name),
+    ('telemetry_public', 'B', 1, bool),
+])
+
+# packet 5
+CAR_SETUP_2021 = Record([
+    ('front_wing', 'B'),
+    ('rear_wing', 'B'),
+    ('on_throttle', 'B'),
+    ('off_throttle', 'B'),
+    ('front_camber', 'f'),
+    ('rear_camber', 'f'),
+    ('front_toe', 'f'),
+    ('rear_toe', 'f'),
+    ('front_suspension', 'B'),
+    ('rear_suspension', 'B'),
+    ('front_anti_roll_bar', 'B'),
+    ('rear_anti_roll_bar', 'B'),
+    ('front_suspension_height', 'B'),
+    ('rear_suspension_height', 'B'),
+    ('brake_pressure', 'B'),
+    ('brake_bias', 'B'),
+    ('rear_left_tyre_pressure', 'f'),
+    ('rear_right_tyre_pressure', 'f'),
+    ('front_left_tyre_pressure', 'f'),
+    ('front_right_tyre_pressure', 'f'),
+    ('ballast', 'B'),
+    ('fuel_load', 'f'),
+])
+
+# packet 6
+CAR_TELEMETRY_2021 = Record([
+    ('speed', 'H'),
+    ('throttle', 'f'),
+    ('steer', 'f'),
+    ('brake', 'f'),
+    ('clutch', 'B'),
+    ('gear', 'b'),
+    ('engine_rpm', 'H'),
+    ('drs', 'B'),
+    ('rev_lights_percent', 'B'),
+    ('rev_lights_bit_value', 'H'),
+    ('brakes_temperature', 'H', 4),
+    ('tyres_surface_temperature', 'B', 4),
+    ('tyres_inner_temperature', 'B', 4),
+    ('engine_temperature', 'H'),
+    ('tyres_pressure', 'f', 4),
+    ('surface_type', 'B', 4),
+])
+
+CAR_TELEMETRY_FOOTER_2021 = Record([
+    ('mfd_panel_index', 'B'),
+    ('mfd_panel_index_secondary', 'B'),
+    ('suggested_gear', 'b'),
+])
+
+# packet 7
+CAR_STATUS_2021 = Record([
+    ('traction_control', 'B'),
+    ('abs', 'B'),
+    ('fuel_mix', 'B'),
+    ('brake_bias', 'B'),
+    ('pit_limiter_status', 'B'),
+    ('fuel_in_tank', 'f'),
+    ('fuel_capacity', 'f'),
+    ('fuel_remaining_laps', 'f'),
+    ('max_rpm', 'H'),
+    ('idle_rpm', 'H'),
+    ('max_gears', 'B'),
+    ('drs_allowed', 'B'),
+    ('drs_activation_distance', 'H'),
+    ('actual_tyre_compound', 'B'),
+    ('visual_tyre_compound', 'B'),
+    ('tyres_age_laps', 'B'),
+    ('vehicle_fia_flags', 'b'),
+    ('ers_store_energy', 'f'),
+    ('ers_deploy_mode', 'B'),
+    ('ers_harvested_mguk', 'f'),
+    ('ers_harvested_mguh', 'f'),
+    ('ers_deployed', 'f'),
+    ('network_paused', 'B'),
+])
+
+# packet 8
+FINAL_CLASSIFICATION_2021 = Record([
+    ('position', 'B'),
+    ('num_laps', 'B'),
+    ('grid_position', 'B'),
+    ('points', 'B'),
+    ('num_pit_stops', 'B'),
+    ('result_status', 'B'),
+    ('best_lap_time_ms', 'I'),
+    ('total_race_time', 'd'),
+    ('penalties_time', 'B'),
+    ('num_penalties', 'B'),
+    ('num_tyre_stints', 'B'),
+    ('tyre_stints_actual', 'B', 8),
+    ('tyre_stints_visual', 'B', 8),
+    ('tyre_stints_end_laps', 'B', 8),
+])
+
+# packet 10
+CAR_DAMAGE_2021 = Record([
+    ('tyres_wear', 'f', 4),
+    ('tyres_damage', 'B', 4),
+    ('brakes_damage', 'B', 4),
+    ('front_left_wing_damage', 'B'),
+    ('front_right_wing_damage', 'B'),
+    ('rear_wing_damage', 'B'),
+    ('floor_damage', 'B'),
+    ('diffuser_damage', 'B'),
+    ('sidepod_damage', 'B'),
+    ('drs_fault', 'B'),
+    ('gearbox_damage', 'B'),
+    ('engine_damage', 'B'),
+    ('engine_mguh_wear', 'B'),
+    ('engine_es_wear', 'B'),
+    ('engine_ce_wear', 'B'),
+    ('engine_ice_wear', 'B'),
+    ('engine_mguk_wear', 'B'),
+    ('engine_tc_wear', 'B'),
+])
+
+# packet 11
+SESSION_HISTORY_2021 = Record([
+    ('car_index', 'B'),
+    ('num_laps', 'B'),
+    ('num_tyre_stints', 'B'),
+    ('best_lap_lap_num', 'B'),
+    ('best_sector1_lap_num', 'B'),
+    ('best_sector2_lap_num', 'B'),
+    ('best_sector3_lap_num', 'B'),
+])
+
+LAP_HISTORY_2021 = Record([
+    ('lap_time_ms', 'I'),
+    ('sector1_time_ms', 'H'),
+    ('sector2_time_ms', 'H'),
+    ('sector3_time_ms', 'H'),
+    ('lap_valid_bit_flags', 'B'),
+])
+MAX_LAP_HISTORY = 100
+
+TYRE_STINT_HISTORY_2021 = Record([
+    ('end_lap', 'B'),
+    ('tyre_actual_compound', 'B'),
+    ('tyre_visual_compound', 'B'),
+])
+MAX_TYRE_STINTS = 8
+
+# Generic packet layouts, keyed by (packet_format, packet_id, packet_version).
+# Event, lobby info and session history need bespoke logic and are registered by the decoder.
+PACKET_SCHEMAS: Dict[Tuple[int, int, int], PacketSchema] = {
+    (2021, 0, 1): PacketSchema('motion', (PlayerCar(CAR_MOTION_2021), Block(MOTION_EXTRA_2021))),
+    (2021, 1, 1): PacketSchema('session', (Block(SESSION_2021), Tail('assist_settings', ASSIST_SETTINGS_2021))),
+    (2021, 2, 1): PacketSchema('lap_data', (PlayerCar(LAP_DATA_2021),)),
+    (2021, 4, 1): PacketSchema('participants', (
+        Block(Record([('num_active_cars', 'B')])),
+        AllCars('participants', PARTICIPANT_2021),
+    )),
+    (2021, 5, 1): PacketSchema('car_setups', (AllCars('car_setups', CAR_SETUP_2021),)),
+    (2021, 6, 1): PacketSchema('car_telemetry', (PlayerCar(CAR_TELEMETRY_2021), Block(CAR_TELEMETRY_FOOTER_2021))),
+    (2021, 7, 1): PacketSchema('car_status', (PlayerCar(CAR_STATUS_2021),)),
+    (2021, 8, 1): PacketSchema('final_classification', (
+        Block(Record([('_num_cars', 'B')])),
+        PlayerCar(FINAL_CLASSIFICATION_2021),
+    )),
+    (2021, 10, 1): PacketSchema('car_damage', (PlayerCar(CAR_DAMAGE_2021),)),
+}
+
+
+def header_layout(packet) -> Record:
+    """Header record for a packet, falling back to the 2021 layout for unknown formats."""
+    return HEADER_LAYOUTS.get(PACKET_FORMAT.unpack_from(packet)[0], HEADER_2021)
+
+
+def decode_body(schema: PacketSchema, packet, header: Dict[str, Any], header_size: int) -> Dict[str, Any]:
+    """Walk a schema's sections over a packet body and build the decoded dict."""
+    decoded = {'packet_id': header['packet_id'], 'frame_id': header['frame_identifier']}
+    offset = header_size
+
+    for section in schema.sections:
+        record = section.record
+        if isinstance(section, Block):
+            decoded.update(record.unpack(packet, offset))
+            offset += record.size
+        elif isinstance(section, PlayerCar):
+            decoded.update(record.unpack(packet, offset + record.size * header['player_car_index']))
+            offset += record.size * NUM_CARS
+        elif isinstance(section, AllCars):
+            cars = []
+            for i in range(NUM_CARS):
+                car = {'index': i}
+                car.update(record.unpack(packet, offset + i * record.size))
+                cars.append(car)
+            decoded[section.key] = cars
+            offset += record.size * NUM_CARS
+        else:
+            decoded[section.key] = record.unpack(packet, len(packet) - record.size)
+
+    return decoded
+
+
+def decode_body_record(schema: PacketSchema, packet, packet_id: int, frame_id: int, player_index: int,
+                       header_size: int):
+    """Walk a schema's sections over a packet body and build its compact record."""
+    layout = compact_layout(schema)
+    values = [packet_id, frame_id]
+    offset = header_size
+
+    for section, section_type in zip(schema.sections, layout.section_types):
+        record = section.record
+        unpack = record.struct.unpack_from
+        if isinstance(section, Block):
+            values.extend(record.compact_values(unpack(packet, offset)))
+            offset += record.size
+        elif isinstance(section, PlayerCar):
+            values.extend(record.compact_values(unpack(packet, offset + record.size * player_index)))
+            offset += record.size * NUM_CARS
+        elif isinstance(section, AllCars):
+            values.append(tuple(
+                section_type._make((i, *record.compact_values(unpack(packet, offset + i * record.size))))
+                for i in range(NUM_CARS)
+            ))
+            offset += record.size * NUM_CARS
+        else:
+            values.append(section_type._make(record.compact_values(unpack(packet, len(packet) - record.size))))
+
+    return layout.record_type._make(values)
+
+
+def make_packet_view(schema: PacketSchema, packet, packet_id: int, frame_id: int, player_index: int,
+                     header_size: int) -> LazyView:
+    """Wrap a packet in its lazy view; only section offsets are computed up front."""
+    bases = []
+    offset = header_size
+    for section in schema.sections:
+        size = section.record.size
+        if isinstance(section, Block):
+            bases.append(offset)
+            offset += size
+        elif isinstance(section, PlayerCar):
+            bases.append(offset + size * player_index)
+            offset += size * NUM_CARS
+        elif isinstance(section, AllCars):
+            bases.append(offset)
+            offset += size * NUM_CARS
+        else:
+            bases.append(len(packet) - size)
+
+    view = lazy_view_type(schema)(packet, tuple(bases))
+    view.packet_id = packet_id
+    view.frame_id = frame_id
+    return view
@@ -0,0 +1,222 @@
+"""SQLite catalog of the logs in telemetry_logs and the sessions they hold.
+
+Scanning a log goes through its sidecar indexes, so it writes the .idx (raw logs) or .blk
+(block logs) and the .laps sidecar next to any log that does not have them yet.
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from block_log import is_block_log
+from lap_index import LAP_SEGMENT, load_lap_index
+from Packet_decoder import PACKET_DECODERS, decode_packet_header, iter_packets
+from packet_index import iter_indexed_packets, load_index, query_index
+from Packet_reader import LOG_FOLDER, TRACK_NAMES
+
+CATALOG_FILE = 'catalog.sqlite'
+
+SESSION_TYPES = {
+    0: "Unknown", 1: "P1", 2: "P2", 3: "P3", 4: "Short_Practice",
+    5: "Q1", 6: "Q2", 7: "Q3", 8: "Short_Qualifying", 9: "One_Shot_Qualifying",
+    10: "Race", 11: "Race_2", 12: "Time_Trial",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    packets INTEGER NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    path TEXT NOT NULL REFERENCES logs(path) ON DELETE CASCADE,
+    session_uid TEXT NOT NULL,
+    track TEXT,
+    session_type TEXT,
+    laps INTEGER NOT NULL,
+    best_lap_ms INTEGER,
+    start_time REAL,
+    end_time REAL,
+    PRIMARY KEY (path, session_uid)
+);
+CREATE INDEX IF NOT EXISTS sessions_track ON sessions (track, session_type, best_lap_ms);
+CREATE TABLE IF NOT EXISTS packet_counts (
+    path TEXT NOT NULL REFERENCES logs(path) ON DELETE CASCADE,
+    packet_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (path, packet_id)
+);
+"""
+
+
+def open_catalog(path: str = os.path.join(LOG_FOLDER, CATALOG_FILE)) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _header_columns(log_path: str) -> Dict[str, np.ndarray]:
+    """packet_id, session_uid and session_time of every packet, from the sidecar index where there is one."""
+    if not is_block_log(log_path):
+        index = load_index(log_path)
+        return {name: index[name] for name in ('packet_id', 'session_uid', 'session_time')}
+
+    headers = [decode_packet_header(packet) for packet in iter_packets(log_path)]
+    return {
+        'packet_id': np.array([h['packet_id'] for h in headers], dtype=np.uint8),
+        'session_uid': np.array([h['session_uid'] for h in headers], dtype=np.uint64),
+        'session_time': np.array([h['session_time'] for h in headers], dtype=np.float32),
+    }
+
+
+def _session_details(log_path: str) -> Dict[int, Dict[str, int]]:
+    """Decoded first session packet of every session in a log."""
+    if is_block_log(log_path):
+        packets = (packet for packet in iter_packets(log_path) if packet[5] == 1)
+    else:
+        # Only the first session packet of each session is read from the log
+        rows = query_index(load_index(log_path), packet_id=1)
+        _, first = np.unique(rows['session_uid'], return_index=True)
+        packets = iter_indexed_packets(log_path, rows[np.sort(first)])
+
+    details = {}
+    for packet in packets:
+        header = decode_packet_header(packet)
+        if header['session_uid'] not in details:
+            session = PACKET_DECODERS[1](packet, header)
+            if session:
+                details[header['session_uid']] = session
+    return details
+
+
+def scan_log(log_path: str) -> Dict:
+    """Catalog rows for one log: packet counts and a summary per session."""
+    headers = _header_columns(log_path)
+    packet_ids, counts = np.unique(headers['packet_id'], return_counts=True)
+    details = _session_details(log_path)
+    laps = load_lap_index(log_path)
+    laps = laps[laps['sector'] == LAP_SEGMENT]
+
+    sessions = []
+    for session_uid in np.unique(headers['session_uid']).tolist():
+        if session_uid == 0:
+            continue  # Packets sent outside a session
+        times = headers['session_time'][headers['session_uid'] == session_uid]
+        session_laps = laps[laps['session_uid'] == session_uid]
+        timed = session_laps[(session_laps['complete'] == 1) & (session_laps['invalid'] == 0)]
+        session = details.get(session_uid, {})
+        track_id = session.get('track_id')
+        sessions.append({
+            'session_uid': str(session_uid),  # SQLite integers are signed 64-bit
+            'track': TRACK_NAMES.get(track_id, f"UnknownTrack_{track_id}") if track_id is not None else None,
+            'session_type': SESSION_TYPES.get(session.get('session_type')) if session else None,
+            'laps': int(np.count_nonzero(session_laps['complete'])),
+            'best_lap_ms': int(timed['time_ms'].min()) if len(timed) else None,
+            'start_time': float(times.min()),
+            'end_time': float(times.max()),
+        })
+
+    return {
+        'packets': int(len(headers['packet_id'])),
+        'packet_counts': dict(zip(packet_ids.tolist(), counts.tolist())),
+        'sessions': sessions,
+    }
+
+
+def rescan(conn: sqlite3.Connection, log_folder: str = LOG_FOLDER) -> Dict[str, int]:
+    """Catalog new or changed logs (by size and mtime) and forget deleted ones."""
+    cataloged = {row['path']: (row['size'], row['mtime_ns']) for row in conn.execute("SELECT path, size, mtime_ns FROM logs")}
+    present = sorted(glob.glob(os.path.join(log_folder, '*.bin')))
+    stats = {'scanned': 0, 'unchanged': 0, 'removed': 0}
+
+    for log_path in present:
+        stat = os.stat(log_path)
+        if cataloged.get(log_path) == (stat.st_size, stat.st_mtime_ns):
+            stats['unchanged'] += 1
+            continue
+        try:
+            summary = scan_log(log_path)
+        except (OSError, ValueError) as e:
+            print(f" Error scanning {log_path}: {e}")
+            continue
+
+        with conn:
+            conn.execute("DELETE FROM logs WHERE path = ?", (log_path,))
+            conn.execute("INSERT INTO logs VALUES (?, ?, ?, ?, ?)",
+                         (log_path, stat.st_size, stat.st_mtime_ns, summary['packets'], time.time()))
+            conn.executemany("INSERT INTO packet_counts VALUES (?, ?, ?)",
+                             [(log_path, packet_id, count) for packet_id, count in summary['packet_counts'].items()])
+            conn.executemany(
+                "INSERT INTO sessions VALUES (:path, :session_uid, :track, :session_type, :laps, :best_lap_ms,"
+                " :start_time, :end_time)",
+                [dict(session, path=log_path) for session in summary['sessions']])
+        stats['scanned'] += 1
+
+    removed = set(cataloged) - set(present)
+    with conn:
+        conn.executemany("DELETE FROM logs WHERE path = ?", [(path,) for path in removed])
+    stats['removed'] = len(removed)
+    return stats
+
+
+def find_sessions(conn: sqlite3.Connection, track: Optional[str] = None, session_type: Optional[str] = None,
+                  best_lap_under_ms: Optional[int] = None) -> List[sqlite3.Row]:
+    """Cataloged sessions matching every given filter, fastest first."""
+    clauses, params = [], []
+    if track is not None:
+        clauses.append("track = ?")
+        params.append(track)
+    if session_type is not None:
+        clauses.append("session_type = ?")
+        params.append(session_type)
+    if best_lap_under_ms is not None:
+        clauses.append("best_lap_ms < ?")
+        params.append(best_lap_under_ms)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return conn.execute(f"SELECT * FROM sessions {where} ORDER BY best_lap_ms IS NULL, best_lap_ms, path", params).fetchall()
+
+
+def parse_lap_time(text: str) -> int:
+    """'1:18', '1:17.5' or '78.2' seconds → milliseconds."""
+    minutes, _, seconds = text.rpartition(':')
+    return round((int(minutes or 0) * 60 + float(seconds)) * 1000)
+
+
+def format_lap_time(ms: Optional[int]) -> str:
+    if ms is None:
+        return "-"
+    return f"{ms // 60000}:{ms % 60000 / 1000:06.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog telemetry logs in SQLite and query their sessions.")
+    parser.add_argument('--folder', default=LOG_FOLDER, help="folder of .bin logs")
+    parser.add_argument('--db', help=f"catalog database (default: <folder>/{CATALOG_FILE})")
+    parser.add_argument('--no-rescan', action='store_true', help="query without looking for new or changed logs")
+    parser.add_argument('--track', help="track name, e.g. Mexico")
+    parser.add_argument('--type', dest='session_type', choices=sorted(SESSION_TYPES.values()), help="session type")
+    parser.add_argument('--best-under', type=parse_lap_time, help="best lap under this time, e.g. 1:18")
+    args = parser.parse_args()
+
+    conn = open_catalog(args.db or os.path.join(args.folder, CATALOG_FILE))
+    if not args.no_rescan:
+        start_time = time.time()
+        stats = rescan(conn, args.folder)
+        print(f" Scanned {stats['scanned']} logs ({stats['unchanged']} unchanged, {stats['removed']} removed) "
+              f"in {time.time() - start_time:.2f} s")
+
+    for row in find_sessions(conn, args.track, args.session_type, args.best_under):
+        print(f" {row['track'] or '?':<14} {row['session_type'] or '?':<10} laps {row['laps']:<3} "
+              f"best {format_lap_time(row['best_lap_ms']):>9}  {row['path']}")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
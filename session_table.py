@@ -0,0 +1,116 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch_decoder import decode_log_batch, player_columns
+
+# Fill methods: carry the latest sample forward, or interpolate float fields between samples
+FFILL = 'ffill'
+INTERPOLATE = 'interpolate'
+
+# Default joined columns: output name → (packet, field) of the player's car
+TABLE_COLUMNS = {
+    'speed': ('car_telemetry', 'speed'),
+    'throttle': ('car_telemetry', 'throttle'),
+    'brake': ('car_telemetry', 'brake'),
+    'steer': ('car_telemetry', 'steer'),
+    'gear': ('car_telemetry', 'gear'),
+    'engine_rpm': ('car_telemetry', 'engine_rpm'),
+    'drs': ('car_telemetry', 'drs'),
+    'lap_distance': ('lap_data', 'lap_distance'),
+    'total_distance': ('lap_data', 'total_distance'),
+    'current_lap_num': ('lap_data', 'current_lap_num'),
+    'current_lap_time_ms': ('lap_data', 'current_lap_time_ms'),
+    'sector': ('lap_data', 'sector'),
+    'current_lap_invalid': ('lap_data', 'current_lap_invalid'),
+    'car_position': ('lap_data', 'car_position'),
+    'position': ('motion', 'position'),
+    'velocity': ('motion', 'velocity'),
+    'g_force': ('motion', 'g_force'),
+    'fuel_in_tank': ('car_status', 'fuel_in_tank'),
+    'ers_store_energy': ('car_status', 'ers_store_energy'),
+    'actual_tyre_compound': ('car_status', 'actual_tyre_compound'),
+    'tyres_age_laps': ('car_status', 'tyres_age_laps'),
+    'tyres_wear': ('car_damage', 'tyres_wear'),
+}
+
+AXES = ('session_time', 'frame_identifier')
+
+# Name of the joined table in the columnar store
+SESSION_TABLE = 'session_table'
+
+
+def _sorted_unique(columns: Dict[str, np.ndarray], rows: np.ndarray, axis: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows ordered by the axis with repeated axis values reduced to the last one received."""
+    rows = rows[np.argsort(columns[axis][rows], kind='stable')]
+    values = columns[axis][rows]
+    last = np.append(values[1:] != values[:-1], True)
+    return rows[last], values[last].astype(np.float64)
+
+
+def _align(source_axis: np.ndarray, values: np.ndarray, grid: np.ndarray, method: str) -> np.ndarray:
+    if method == INTERPOLATE and values.dtype.kind == 'f':
+        flat = values.reshape(len(values), -1)
+        aligned = np.column_stack([np.interp(grid, source_axis, flat[:, i]) for i in range(flat.shape[1])])
+        return aligned.reshape((len(grid),) + values.shape[1:]).astype(values.dtype)
+    # Latest sample at or before each grid point; the grid never starts before the first sample
+    return values[np.searchsorted(source_axis, grid, side='right') - 1]
+
+
+def join_packets(decoded: Dict[str, Dict[str, np.ndarray]], columns: Dict[str, Tuple[str, str]] = TABLE_COLUMNS,
+                 axis: str = 'session_time', base: str = 'car_telemetry', rate: Optional[float] = None,
+                 method: str = FFILL, session_uid: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Align player fields from several packet types onto one dense, sorted axis.
+
+    decoded is batch_decoder output. The axis is the base packet's samples, or a uniform
+    grid of rate samples per second when rate is given (session_time only). Rows start once
+    every joined packet type has been seen; columns whose packet is missing are left out.
+    """
+    if axis not in AXES:
+        raise ValueError(f"axis must be one of {AXES}")
+    if method not in (FFILL, INTERPOLATE):
+        raise ValueError(f"Unknown fill method {method!r}")
+    if base not in decoded:
+        return {}
+
+    packets = {base} | {packet for packet, _ in columns.values() if packet in decoded}
+    player = {packet: player_columns(decoded[packet]) for packet in packets}
+
+    if session_uid is None:
+        # The session most of the base packets belong to
+        uids, counts = np.unique(player[base]['session_uid'], return_counts=True)
+        session_uid = int(uids[counts.argmax()])
+
+    sources = {}
+    for packet in packets:
+        rows = np.flatnonzero(player[packet]['session_uid'] == session_uid)
+        if len(rows):
+            sources[packet] = _sorted_unique(player[packet], rows, axis)
+    if base not in sources:
+        return {}
+
+    if rate is not None:
+        if axis != 'session_time':
+            raise ValueError("A uniform rate needs the session_time axis")
+        base_axis = sources[base][1]
+        grid = np.arange(base_axis[0], base_axis[-1], 1.0 / rate)
+    else:
+        grid = sources[base][1]
+    grid = grid[grid >= max(source_axis[0] for _, source_axis in sources.values())]
+
+    base_rows, base_axis = sources[base]
+    table = {axis: grid.astype(player[base][axis].dtype)}
+    other_axis = AXES[1 - AXES.index(axis)]
+    table[other_axis] = _align(base_axis, player[base][other_axis][base_rows], grid, method)
+
+    for name, (packet, field) in columns.items():
+        if packet in sources:
+            rows, source_axis = sources[packet]
+            table[name] = _align(source_axis, player[packet][field][rows], grid, method)
+    return table
+
+
+def load_session_table(log_path: str, columns: Dict[str, Tuple[str, str]] = TABLE_COLUMNS,
+                       packet_ids: Sequence[int] = (0, 2, 6, 7, 10), **options) -> Dict[str, np.ndarray]:
+    """Batch-decode a log and join it; options are passed to join_packets."""
+    return join_packets(decode_log_batch(log_path, packet_ids), columns, **options)
@@ -0,0 +1,65 @@
+import os
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+# Every sidecar (.idx, .blk, .laps) starts with this header, followed by fixed-width rows
+SIDECAR_HEADER = struct.Struct('<4sHH')  # magic, version, row size
+
+
+class SidecarFormat(NamedTuple):
+    magic: bytes
+    version: int
+    row_size: int
+    name: str  # used in error messages, e.g. "packet index"
+
+    def header(self) -> bytes:
+        return SIDECAR_HEADER.pack(self.magic, self.version, self.row_size)
+
+
+class SidecarWriter:
+    """Appends rows to a sidecar while its log is written, creating it or dropping a torn final row first."""
+
+    def __init__(self, path: str, sidecar: SidecarFormat):
+        self.path = path
+        self._file = open(path, 'ab')
+        size = self._file.tell()
+        if size == 0:
+            self._file.write(sidecar.header())
+        elif (size - SIDECAR_HEADER.size) % sidecar.row_size:
+            # Drop a torn final row so new rows stay aligned
+            self._file.truncate(size - (size - SIDECAR_HEADER.size) % sidecar.row_size)
+
+    def write(self, rows: bytes, flush: bool = False) -> None:
+        self._file.write(rows)
+        if flush:
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_sidecar(path: str, sidecar: SidecarFormat) -> np.ndarray:
+    """The complete rows of a sidecar as bytes (uint8); empty when not even the header was written."""
+    with open(path, 'rb') as f:
+        header = f.read(SIDECAR_HEADER.size)
+    if len(header) < SIDECAR_HEADER.size:
+        return np.empty(0, dtype=np.uint8)
+
+    magic, version, row_size = SIDECAR_HEADER.unpack(header)
+    if magic != sidecar.magic or version != sidecar.version or row_size != sidecar.row_size:
+        raise ValueError(f"{path} is not a version {sidecar.version} {sidecar.name}")
+
+    rows = np.fromfile(path, dtype=np.uint8, offset=SIDECAR_HEADER.size)
+    usable = len(rows) - len(rows) % row_size  # Ignore a torn final row
+    return rows[:usable]
+
+
+def save_sidecar(path: str, sidecar: SidecarFormat, rows: bytes) -> None:
+    """Replace a sidecar with header + rows in one step, so readers never see it half written."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(sidecar.header())
+        f.write(rows)
+    os.replace(tmp_path, path)
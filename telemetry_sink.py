@@ -0,0 +1,110 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Records waiting for the writer thread before write() starts to wait...
+MAX_PENDING_RECORDS = 10000
+# ...and how long it waits for room before dropping the record (seconds)
+WRITE_TIMEOUT = 0.05
+
+
+class NdjsonSink:
+    """Append-only NDJSON writer that persists records on a background thread.
+
+    Up to max_pending records wait for the writer. Once that many are queued (the disk is
+    falling behind), write() blocks for at most write_timeout seconds and then drops the
+    record, counting it in dropped, so a stalled disk cannot stall the receive loop for long.
+    """
+
+    def __init__(self, file_path: str, flush_interval: float = 0.5, fsync_interval: float = 5.0,
+                 max_pending: int = MAX_PENDING_RECORDS, write_timeout: float = WRITE_TIMEOUT):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.write_timeout = write_timeout
+        self.written = 0
+        self.dropped = 0
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pending)
+        self._file = open(file_path, 'a', encoding='utf-8')
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='ndjson-sink', daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Queue a record, waiting up to write_timeout for room; drops it if the writer is still behind."""
+        try:
+            self._queue.put(record, timeout=self.write_timeout)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Drain every queued record, fsync and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        last_flush = last_fsync = time.monotonic()
+        running = True
+
+        while running:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None if self._closed else {}
+
+            # Drain whatever else is already waiting so one wakeup writes a batch
+            batch = []
+            while record is not None:
+                if record:
+                    batch.append(json.dumps(record, separators=(',', ':')))
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                running = False
+
+            if batch:
+                self._file.write('\n'.join(batch) + '\n')
+                self.written += len(batch)
+
+            now = time.monotonic()
+            if not running or now - last_flush >= self.flush_interval:
+                self._file.flush()
+                last_flush = now
+            if not running or now - last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                last_fsync = now
+
+        self._file.close()
+
+
+def compact_to_json(ndjson_path: str, json_path: str) -> int:
+    """Rewrite an NDJSON stream as the indented JSON array older tools expect."""
+    count = 0
+    tmp_path = json_path + '.tmp'
+
+    with open(ndjson_path, encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        dst.write('[')
+        for line in src:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # Torn final line from an unclean shutdown
+            dst.write(',\n' if count else '\n')
+            dst.write('\n'.join('  ' + row for row in json.dumps(record, indent=2).split('\n')))
+            count += 1
+        dst.write('\n]' if count else ']')
+
+    os.replace(tmp_path, json_path)
+    return count
@@ -0,0 +1,68 @@
+import asyncio
+import socket
+
+from ingest_pipeline import PipelineStats, run_pipeline
+
+DATAGRAMS = 200
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_with(persist, batch_size: int = 16) -> PipelineStats:
+    """Send DATAGRAMS numbered datagrams through a pipeline, then stop it; fails if shutdown hangs."""
+    port = free_port()
+    stats = PipelineStats()
+
+    async def main():
+        stop = asyncio.Event()
+        task = asyncio.create_task(run_pipeline(lambda data: data, persist, port=port, batch_size=batch_size,
+                                                stop=stop, stats=stats))
+        await asyncio.sleep(0.1)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for i in range(DATAGRAMS):
+                sock.sendto(i.to_bytes(4, 'little'), ('127.0.0.1', port))
+                if i % 50 == 0:
+                    await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        stop.set()
+        return await asyncio.wait_for(task, timeout=5)
+
+    asyncio.run(main())
+    return stats
+
+
+def test_shutdown_persists_everything_received():
+    persisted = []
+    stats = run_with(persisted.extend)
+    assert stats.received == DATAGRAMS
+    assert stats.persisted == len(persisted) == DATAGRAMS
+    assert persisted == sorted(persisted)  # Batches keep arrival order
+    assert stats.persist_errors == 0
+
+
+def test_failing_persist_is_counted_and_shutdown_still_drains():
+    persisted = []
+    failures = []
+
+    def persist(batch):
+        if not failures:
+            failures.append(batch)
+            raise OSError("disk full")
+        persisted.extend(batch)
+
+    stats = run_with(persist)
+    assert stats.persist_errors == 1
+    assert stats.persisted == len(persisted) == DATAGRAMS - len(failures[0])
+
+
+def test_persist_failing_every_time_does_not_hang():
+    def persist(batch):
+        raise OSError("disk gone")
+
+    stats = run_with(persist, batch_size=1)
+    assert stats.persisted == 0
+    assert stats.persist_errors == stats.decoded == stats.received
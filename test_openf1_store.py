@@ -0,0 +1,131 @@
+import struct
+
+import numpy as np
+import pytest
+
+from batch_decoder import PACKET_DTYPES
+from distance_resample import distance_grid
+from openf1_store import OpenF1Store, payloads_from_log, start_stand_in
+
+SESSION_UID = 42
+SAMPLE_RATE = 10  # packets of each type per second
+TRACK_LENGTH = 1000.0  # metres
+SPEED = 180  # km/h, so a lap takes 20 s
+LAP_SECONDS = TRACK_LENGTH / (SPEED / 3.6)
+LAPS = 2.5  # two finished laps, then one cut short
+
+
+def make_packet(packet_id: int, session_time: float, frame: int, **cars) -> bytes:
+    """One packet of the player's car (index 0) with the given per-car fields set."""
+    packet = np.zeros(1, dtype=PACKET_DTYPES[packet_id][1])
+    header = packet['header']
+    header['packet_format'], header['packet_id'] = 2021, packet_id
+    header['session_uid'], header['session_time'], header['frame_identifier'] = SESSION_UID, session_time, frame
+    for field, value in cars.items():
+        packet['cars'][field][0, 0] = value
+    return packet.tobytes()
+
+
+@pytest.fixture
+def game_log(tmp_path):
+    """A raw log of constant-speed laps: full throttle to 500 m, braking from 500 m to 600 m."""
+    path = tmp_path / 'Test.bin'
+    with open(path, 'wb') as f:
+        for frame in range(int(LAPS * LAP_SECONDS * SAMPLE_RATE)):
+            session_time = frame / SAMPLE_RATE
+            lap, lap_time = divmod(session_time, LAP_SECONDS)
+            distance = lap_time / LAP_SECONDS * TRACK_LENGTH
+            packets = [
+                make_packet(0, session_time, frame, position=(distance, 0.0, -distance)),
+                make_packet(2, session_time, frame, current_lap_num=int(lap) + 1, lap_distance=distance,
+                            current_lap_time_ms=round(lap_time * 1000),
+                            last_lap_time_ms=round(LAP_SECONDS * 1000) if lap else 0,
+                            sector=min(int(distance / TRACK_LENGTH * 3), 2)),
+                make_packet(6, session_time, frame, speed=SPEED, gear=7, engine_rpm=11000,
+                            throttle=1.0 if distance < 500 else 0.0, brake=1.0 if 500 <= distance < 600 else 0.0),
+            ]
+            for packet in packets:
+                f.write(struct.pack('<H', len(packet)) + packet)
+    return str(path)
+
+
+@pytest.fixture
+def store(game_log, tmp_path):
+    server = start_stand_in(payloads_from_log(game_log, session_key=7, driver_number=44), port=0)
+    try:
+        yield OpenF1Store(str(tmp_path / 'cache'), f"http://127.0.0.1:{server.server_address[1]}/v1")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_caches_columns(store):
+    car = store.get('car_data', 7, 44)
+    assert len(car['date']) == int(LAPS * LAP_SECONDS * SAMPLE_RATE)
+    assert np.all(np.diff(car['date']) > 0)
+    assert np.all(car['speed'] == SPEED)
+    assert set(np.unique(car['throttle']).tolist()) == {0, 100}
+    assert np.all(car['driver_number'] == 44)
+
+    laps = store.get('laps', 7, 44)
+    assert laps['lap_number'].tolist() == [1, 2, 3]
+    assert laps['lap_duration'][:2].tolist() == [LAP_SECONDS, LAP_SECONDS]
+    assert np.isnan(laps['lap_duration'][2])  # Not finished
+
+    location = store.get('location', 7, 44)
+    # The game's y-up position is stored z-up
+    assert np.array_equal(location['y'], -location['x'])
+    assert np.all(location['z'] == 0)
+
+    for endpoint in ('car_data', 'laps', 'location'):
+        assert store.has(endpoint, 7, 44)
+
+
+def test_get_reads_the_cache_once_fetched(store):
+    first = store.get('car_data', 7, 44)
+    store.base_url = 'http://127.0.0.1:9/v1'  # Nothing listens here
+    cached = store.get('car_data', 7, 44)
+    assert first.keys() == cached.keys()
+    assert all(np.array_equal(first[name], cached[name]) for name in first)
+
+
+def test_get_rejects_unknown_endpoints(store):
+    with pytest.raises(ValueError):
+        store.get('weather', 7, 44)
+
+
+def test_align_on_lap_distance_grid(store):
+    grid = distance_grid(TRACK_LENGTH, 10.0)
+    laps, channels = store.align(7, 44, grid, TRACK_LENGTH)
+
+    assert laps.tolist() == [1, 2]  # The unfinished lap has no duration to place it with
+    for values in channels.values():
+        assert values.shape == (2, len(grid))
+
+    speed = channels['speed']
+    assert np.all(speed[~np.isnan(speed)] == SPEED)
+    # Laps start on the line, so the grid is covered from its first point
+    assert not np.isnan(speed[:, 0]).any()
+    assert not np.isnan(speed[:, -1]).any()
+
+    throttle, brake = channels['throttle'], channels['brake']
+    assert np.all(throttle[:, grid < 480] == 1.0)
+    assert np.all(throttle[:, grid > 520] == 0.0)
+    assert np.all(brake[:, (grid > 520) & (grid < 580)] == 1.0)
+    assert np.all(brake[:, grid > 620] == 0.0)
+
+    # Lap time grows with distance at the constant speed
+    lap_time = channels['lap_time_ms']
+    expected = grid / TRACK_LENGTH * LAP_SECONDS * 1000
+    assert np.allclose(lap_time, expected, atol=150)
+
+
+def test_align_without_cached_laps(tmp_path):
+    server = start_stand_in({'car_data': [], 'laps': [], 'location': []}, port=0)
+    try:
+        store = OpenF1Store(str(tmp_path), f"http://127.0.0.1:{server.server_address[1]}/v1")
+        laps, channels = store.align(7, 44, distance_grid(TRACK_LENGTH, 10.0), TRACK_LENGTH)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(laps) == 0 and channels == {}
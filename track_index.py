@@ -0,0 +1,216 @@
+import argparse
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from trajectory_store import TrajectoryStore
+
+# One .npz per track, named like the trajectory store files
+TRACK_INDEX_DIR = 'track_index'
+
+CENTRE_SPACING = 2.0  # metres between centre line points
+CELL_SIZE = 25.0  # metres per grid cell (x/z plane)
+SEARCH_RADIUS = 30.0  # positions further than this from the centre line may not be located
+LOCATE_CHUNK = 8192  # positions tested per pass, bounding the (positions, segments) work arrays
+
+# A corner is where the centre line turns tighter than this radius (metres)...
+CORNER_RADIUS = 200.0
+# ...measured over this much track, with gaps this short merged...
+CORNER_WINDOW = 20.0
+CORNER_GAP = 30.0
+# ...and keeping only runs that turn at least this far (degrees)
+CORNER_MIN_TURN = 15.0
+
+
+def centre_line(positions: np.ndarray, distance: np.ndarray,
+                spacing: float = CENTRE_SPACING) -> Tuple[np.ndarray, np.ndarray]:
+    """A lap's positions resampled every spacing metres of lap distance."""
+    on_lap = distance >= 0
+    positions, distance = positions[on_lap].astype(np.float64), distance[on_lap].astype(np.float64)
+    if len(distance) == 0:
+        return np.empty((0, 3)), np.empty(0)  # Never across the line (e.g. an out-lap)
+    # Keep strictly increasing distances so interp is well defined
+    increasing = np.append(True, distance[1:] > np.maximum.accumulate(distance)[:-1])
+    positions, distance = positions[increasing], distance[increasing]
+    samples = np.arange(distance[0], distance[-1], spacing)
+    points = np.column_stack([np.interp(samples, distance, positions[:, axis]) for axis in range(3)])
+    return points, samples
+
+
+def find_corners(points: np.ndarray, spacing: float = CENTRE_SPACING) -> np.ndarray:
+    """Corner number (1, 2, ... along the lap, 0 on straights) of every centre line point."""
+    steps = np.diff(points[:, [0, 2]], axis=0)
+    heading = np.unwrap(np.arctan2(steps[:, 1], steps[:, 0]))
+    window = max(int(CORNER_WINDOW / spacing), 1)
+    # Heading change across the window, per metre
+    turn = np.zeros(len(points))
+    turn[window:len(heading)] = (heading[window:] - heading[:-window]) / (window * spacing)
+    turn = np.roll(turn, -(window // 2))
+    cornering = np.abs(turn) > 1.0 / CORNER_RADIUS
+
+    # Merge runs separated by short straights, then drop runs that barely turn
+    padded = np.concatenate([[False], cornering, [False]]).astype(np.int8)
+    starts = np.flatnonzero(np.diff(padded) == 1)
+    ends = np.flatnonzero(np.diff(padded) == -1)
+    if len(starts) > 1:
+        joined = (starts[1:] - ends[:-1]) * spacing < CORNER_GAP
+        starts = starts[np.append(True, ~joined)]
+        ends = ends[np.append(~joined, True)]
+    turned = np.degrees(np.abs(heading[np.minimum(ends, len(heading)) - 1] - heading[np.minimum(starts, len(heading) - 1)]))
+    starts, ends = starts[turned >= CORNER_MIN_TURN], ends[turned >= CORNER_MIN_TURN]
+
+    corners = np.zeros(len(points), dtype=np.uint8)
+    for number, (start, end) in enumerate(zip(starts.tolist(), ends.tolist()), start=1):
+        corners[start:end] = number
+    return corners
+
+
+class TrackIndex:
+    """Uniform x/z grid over a track's centre line for bulk position → track location lookups.
+
+    Each cell lists every centre line segment within SEARCH_RADIUS of it (padded with -1 to
+    a fixed width), so a query tests a handful of segments instead of the whole lap.
+    """
+
+    def __init__(self, points: np.ndarray, distance: np.ndarray, corners: np.ndarray,
+                 origin: np.ndarray, shape: Tuple[int, int], cells: np.ndarray, cell_size: float = CELL_SIZE,
+                 source: Optional[Tuple[int, int]] = None):
+        self.points = points
+        self.distance = distance
+        self.corners = corners
+        self.origin = origin
+        self.shape = shape
+        self.cells = cells
+        self.cell_size = cell_size
+        self.source = source  # (session_uid, lap) of the reference lap it was built from
+
+    @classmethod
+    def build(cls, points: np.ndarray, distance: np.ndarray, cell_size: float = CELL_SIZE,
+              radius: float = SEARCH_RADIUS) -> 'TrackIndex':
+        planar = points[:, [0, 2]]
+        # Cells whose positions can be within radius of a segment starting in the home cell
+        longest = float(np.linalg.norm(np.diff(points, axis=0), axis=1).max()) if len(points) > 1 else 0.0
+        reach = int((radius + longest) // cell_size) + 1
+        origin = planar.min(axis=0) - (reach + 1) * cell_size
+        shape = tuple((np.ceil((planar.max(axis=0) - origin) / cell_size).astype(int) + reach + 2).tolist())
+
+        # Every segment (between points i and i + 1) in every cell around its endpoints
+        segments = np.arange(len(points) - 1)
+        home = np.floor((planar[:-1] - origin) / cell_size).astype(int)
+        offsets = np.arange(-reach, reach + 1)
+        di, dj = np.meshgrid(offsets, offsets, indexing='ij')
+        cell_ids = ((home[:, 0, None] + di.ravel()) * shape[1] + home[:, 1, None] + dj.ravel()).ravel()
+        pairs = np.unique(np.column_stack([cell_ids, np.repeat(segments, di.size)]), axis=0)
+
+        cell_counts = np.bincount(pairs[:, 0], minlength=shape[0] * shape[1])
+        cells = np.full((shape[0] * shape[1], max(int(cell_counts.max()), 1)), -1, dtype=np.int32)
+        first = np.cumsum(cell_counts) - cell_counts
+        cells[pairs[:, 0], np.arange(len(pairs)) - first[pairs[:, 0]]] = pairs[:, 1]
+        return cls(points, distance, find_corners(points), origin, shape, cells, cell_size)
+
+    def locate(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(segment, distance along the centre line, corner, offset from it) for (n, 3) positions.
+
+        Positions outside the indexed area get segment -1 and NaN distance/offset.
+        """
+        positions = np.atleast_2d(np.asarray(positions, dtype=np.float64))
+        if len(positions) > LOCATE_CHUNK:
+            parts = [self.locate(positions[i:i + LOCATE_CHUNK]) for i in range(0, len(positions), LOCATE_CHUNK)]
+            return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+        cell_ij = np.floor((positions[:, [0, 2]] - self.origin) / self.cell_size).astype(int)
+        inside = np.all((cell_ij >= 0) & (cell_ij < self.shape), axis=1)
+        cell_ids = np.where(inside, cell_ij[:, 0] * self.shape[1] + cell_ij[:, 1], 0)
+
+        candidates = np.where(inside[:, None], self.cells[cell_ids], -1)  # (n, width)
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+        a, b = self.points[safe], self.points[safe + 1]
+        segment = b - a
+        t = np.clip(np.einsum('nkd,nkd->nk', positions[:, None] - a, segment) /
+                    np.maximum(np.einsum('nkd,nkd->nk', segment, segment), 1e-12), 0.0, 1.0)
+        gap = np.linalg.norm(positions[:, None] - (a + t[..., None] * segment), axis=2)
+        gap[~valid] = np.inf
+
+        best = gap.argmin(axis=1)
+        rows = np.arange(len(positions))
+        found = valid[rows, best]
+        nearest = np.where(found, candidates[rows, best], -1)
+        spans = self.distance[safe[rows, best] + 1] - self.distance[safe[rows, best]]
+        along = np.where(found, self.distance[safe[rows, best]] + t[rows, best] * spans, np.nan)
+        offset = np.where(found, gap[rows, best], np.nan)
+        corner = np.where(found, self.corners[safe[rows, best]], 0).astype(np.uint8)
+        return nearest, along, corner, offset
+
+    def save(self, path: str, source: Tuple[int, int]) -> None:
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, points=self.points, distance=self.distance, corners=self.corners, origin=self.origin,
+                 shape=np.array(self.shape), cells=self.cells, cell_size=np.array(self.cell_size),
+                 source=np.array(source, dtype=np.uint64))
+        os.replace(tmp_path, path)
+        self.source = tuple(source)
+
+    @classmethod
+    def load(cls, path: str) -> 'TrackIndex':
+        with np.load(path) as stored:
+            return cls(stored['points'], stored['distance'], stored['corners'], stored['origin'],
+                       tuple(stored['shape'].tolist()), stored['cells'], float(stored['cell_size']),
+                       tuple(stored['source'].tolist()))
+
+
+def reference_lap(store: TrajectoryStore, track: str) -> Optional[Tuple[int, int]]:
+    """(session_uid, lap) of the fastest finished stored lap, or the longest one if none finished."""
+    laps = store.laps(track)
+    if len(laps) == 0:
+        return None
+    finished = np.flatnonzero(laps['lap_time_ms'] > 0)
+    row = finished[laps['lap_time_ms'][finished].argmin()] if len(finished) else laps['count'].argmax()
+    return int(laps['session_uid'][row]), int(laps['lap'][row])
+
+
+def track_index_path(track: str, root: str = TRACK_INDEX_DIR) -> str:
+    return os.path.join(root, f"{track}.npz")
+
+
+def load_track_index(track: str, store: Optional[TrajectoryStore] = None, root: str = TRACK_INDEX_DIR,
+                     rebuild: bool = False) -> Optional[TrackIndex]:
+    """The cached index of a track, (re)built from its reference lap in the trajectory store when that changes."""
+    path = track_index_path(track, root)
+    store = store or TrajectoryStore()
+    source = reference_lap(store, track)
+    if os.path.exists(path) and not rebuild:
+        index = TrackIndex.load(path)
+        # Keep the cached index while its lap is still the reference (or the store has no laps to replace it)
+        if source is None or index.source == source:
+            return index
+    if source is None:
+        return None
+    positions, distance = store.load_lap(track, *source)
+    points, samples = centre_line(positions, distance)
+    if len(points) < 2:
+        return None
+
+    index = TrackIndex.build(points, samples)
+    os.makedirs(root, exist_ok=True)
+    index.save(path, source)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build spatial track indexes from the trajectory store.")
+    parser.add_argument('tracks', nargs='*', help="track names (default: every stored track)")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild indexes that already exist")
+    args = parser.parse_args()
+
+    store = TrajectoryStore()
+    for track in args.tracks or store.tracks():
+        index = load_track_index(track, store, rebuild=args.rebuild)
+        if index is None:
+            print(f" {track}: no stored laps")
+            continue
+        print(f" {track}: {len(index.points)} centre line points, {int(index.corners.max())} corners, "
+              f"{index.cells.shape[1]} segments per cell")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import argparse
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from batch_decoder import decode_log_batch, player_columns
+from Packet_decoder import PACKET_DECODERS, decode_packet_header, iter_packets
+from Packet_reader import TRACK_NAMES
+
+# One .npz per track holding every stored lap
+TRAJECTORY_DIR = 'trajectories'
+
+# Simplified lines stay within this distance (metres) of the recorded positions
+SIMPLIFY_EPSILON = 0.25
+
+# Positions are stored as uint16 steps of scale metres from a per-lap origin
+QUANTIZE_LEVELS = np.iinfo(np.uint16).max
+
+TRAJECTORY_LAP_DTYPE = np.dtype([
+    ('session_uid', '<u8'),
+    ('lap', 'u1'),
+    ('lap_time_ms', '<u4'),  # 0 while the lap is unfinished
+    ('start', '<u4'),  # first row in points/distance
+    ('count', '<u4'),
+    ('origin', '<f4', (3,)),
+    ('scale', '<f4'),
+])
+
+
+def simplify_polyline(points: np.ndarray, epsilon: float) -> np.ndarray:
+    """Indices of the points Ramer-Douglas-Peucker keeps, so no point is further than epsilon from the result."""
+    count = len(points)
+    if count < 3:
+        return np.arange(count)
+
+    points = points.astype(np.float64)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = points[start + 1:end]
+        a, segment = points[start], points[end] - points[start]
+        length2 = segment @ segment
+        t = np.clip((inner - a) @ segment / length2, 0.0, 1.0) if length2 else np.zeros(len(inner))
+        distances = np.linalg.norm(inner - (a + t[:, None] * segment), axis=1)
+        farthest = int(distances.argmax())
+        if distances[farthest] > epsilon:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def quantize(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+    """uint16 codes, origin and step; the reconstruction error is at most step / 2 per axis."""
+    origin = points.min(axis=0)
+    span = float((points.max(axis=0) - origin).max())
+    scale = span / QUANTIZE_LEVELS if span > 0 else 1.0
+    codes = np.rint((points - origin) / scale).astype(np.uint16)
+    return codes, origin.astype(np.float32), np.float32(scale)
+
+
+def session_track(log_path: str) -> Optional[str]:
+    """Track name from the first session packet of a log."""
+    for packet in iter_packets(log_path):
+        if packet[5] == 1:
+            header = decode_packet_header(packet)
+            session = PACKET_DECODERS[1](packet, header)
+            if session:
+                track_id = session['track_id']
+                return TRACK_NAMES.get(track_id, f"UnknownTrack_{track_id}")
+    return None
+
+
+def extract_laps(log_path: str) -> Dict[Tuple[int, int], Dict[str, np.ndarray]]:
+    """Player positions per (session_uid, lap), with lap distance and the finished lap time."""
+    decoded = decode_log_batch(log_path, packet_ids=(0, 2))
+    if 'motion' not in decoded or 'lap_data' not in decoded:
+        return {}
+    motion = player_columns(decoded['motion'])
+    lap_data = player_columns(decoded['lap_data'])
+
+    laps = {}
+    for session_uid in np.unique(motion['session_uid']).tolist():
+        # Each motion frame takes the lap of the latest lap data packet at or before it
+        m_rows = np.flatnonzero(motion['session_uid'] == session_uid)
+        l_rows = np.flatnonzero(lap_data['session_uid'] == session_uid)
+        m_rows = m_rows[np.argsort(motion['frame_identifier'][m_rows], kind='stable')]
+        l_rows = l_rows[np.argsort(lap_data['frame_identifier'][l_rows], kind='stable')]
+        if len(l_rows) == 0:
+            continue
+
+        positions = np.searchsorted(lap_data['frame_identifier'][l_rows], motion['frame_identifier'][m_rows],
+                                    side='right') - 1
+        valid = positions >= 0
+        m_rows, matched = m_rows[valid], l_rows[positions[valid]]
+        lap_numbers = lap_data['current_lap_num'][matched]
+
+        for lap in np.unique(lap_numbers).tolist():
+            if lap == 0:
+                continue
+            in_lap = lap_numbers == lap
+            # The lap's time is reported as the last lap time once the next lap starts
+            next_lap = l_rows[lap_data['current_lap_num'][l_rows] == lap + 1]
+            laps[(session_uid, lap)] = {
+                'position': motion['position'][m_rows[in_lap]],
+                'distance': lap_data['lap_distance'][matched[in_lap]],
+                'lap_time_ms': int(lap_data['last_lap_time_ms'][next_lap[0]]) if len(next_lap) else 0,
+            }
+    return laps
+
+
+class TrajectoryStore:
+    """Simplified, quantized racing lines keyed by track and (session_uid, lap)."""
+
+    def __init__(self, root: str = TRAJECTORY_DIR):
+        self.root = root
+
+    def track_path(self, track: str) -> str:
+        return os.path.join(self.root, f"{track}.npz")
+
+    def tracks(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith('.npz'))
+
+    def _load(self, track: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        path = self.track_path(track)
+        if not os.path.exists(path):
+            return (np.empty(0, dtype=TRAJECTORY_LAP_DTYPE), np.empty((0, 3), dtype=np.uint16),
+                    np.empty(0, dtype=np.float32))
+        with np.load(path) as stored:
+            return stored['laps'], stored['points'], stored['distance']
+
+    def _save(self, track: str, laps: np.ndarray, points: np.ndarray, distance: np.ndarray) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self.track_path(track)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, laps=laps, points=points, distance=distance)
+        os.replace(tmp_path, path)
+
+    def add_log(self, log_path: str, epsilon: float = SIMPLIFY_EPSILON) -> int:
+        """Store every player lap of a log, replacing laps already stored for its sessions; returns laps added."""
+        track = session_track(log_path)
+        laps = extract_laps(log_path)
+        if track is None or not laps:
+            return 0
+
+        stored_laps, stored_points, stored_distance = self._load(track)
+        sessions = {session_uid for session_uid, _ in laps}
+        kept = ~np.isin(stored_laps['session_uid'], list(sessions))
+
+        rows, points, distance = [], [], []
+        offset = 0
+        for row in stored_laps[kept]:
+            start, count = int(row['start']), int(row['count'])
+            points.append(stored_points[start:start + count])
+            distance.append(stored_distance[start:start + count])
+            row['start'] = offset
+            rows.append(row)
+            offset += count
+
+        for (session_uid, lap), lap_data in sorted(laps.items()):
+            kept_idx = simplify_polyline(lap_data['position'], epsilon)
+            codes, origin, scale = quantize(lap_data['position'][kept_idx])
+            points.append(codes)
+            distance.append(lap_data['distance'][kept_idx].astype(np.float32))
+            rows.append(np.array((session_uid, lap, lap_data['lap_time_ms'], offset, len(kept_idx), origin, scale),
+                                 dtype=TRAJECTORY_LAP_DTYPE))
+            offset += len(kept_idx)
+
+        self._save(track, np.array(rows, dtype=TRAJECTORY_LAP_DTYPE),
+                   np.concatenate(points) if points else np.empty((0, 3), dtype=np.uint16),
+                   np.concatenate(distance) if distance else np.empty(0, dtype=np.float32))
+        return len(laps)
+
+    def laps(self, track: str) -> np.ndarray:
+        """The stored laps of a track (TRAJECTORY_LAP_DTYPE rows)."""
+        return self._load(track)[0]
+
+    def load_lap(self, track: str, session_uid: int, lap: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """float32 positions (n, 3) and lap distances of one stored lap."""
+        laps, points, distance = self._load(track)
+        match = np.flatnonzero((laps['session_uid'] == session_uid) & (laps['lap'] == lap))
+        if len(match) == 0:
+            return None
+        return self._decode(laps[match[0]], points, distance)
+
+    def iter_racing_lines(self, track: str) -> Iterator[Tuple[int, int, np.ndarray, np.ndarray]]:
+        """(session_uid, lap, positions, distances) for every stored lap of a track."""
+        laps, points, distance = self._load(track)
+        for row in laps:
+            yield (int(row['session_uid']), int(row['lap'])) + self._decode(row, points, distance)
+
+    @staticmethod
+    def _decode(row, points: np.ndarray, distance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        start, count = int(row['start']), int(row['count'])
+        positions = row['origin'] + points[start:start + count].astype(np.float32) * row['scale']
+        return positions.astype(np.float32), distance[start:start + count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the player's laps from telemetry logs to the trajectory store.")
+    parser.add_argument('logs', nargs='+', help="raw or block .bin logs")
+    parser.add_argument('--epsilon', type=float, default=SIMPLIFY_EPSILON,
+                        help="maximum deviation in metres allowed by simplification")
+    args = parser.parse_args()
+
+    store = TrajectoryStore()
+    for log_path in args.logs:
+        print(f" {log_path}: stored {store.add_log(log_path, args.epsilon)} laps")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,29 @@
+import argparse
+import asyncio
 import socket
 import struct
 import json
 import os
+import time
+
+from ingest_metrics import IngestMetrics
+from ingest_pipeline import DROP_NEWEST, DROP_OLDEST, run_pipeline
+from live_feed import LiveFeedPublisher
+from telemetry_sink import NdjsonSink, compact_to_json
 
 # Define the JSON file path
 JSON_FILE_PATH = 'telemetry_data.json'
-
-# Delete the JSON file if it already exists
-if os.path.exists(JSON_FILE_PATH):
-    os.remove(JSON_FILE_PATH)
-
-# Initialize an empty list to store telemetry data
-telemetry_data = []
+# Records are streamed here and compacted into JSON_FILE_PATH on shutdown
+STREAM_FILE_PATH = 'telemetry_data.ndjson'
 
 # Track which packet IDs have already been printed
 printed_packets = set()
 
-def parse_telemetry_data(data):
+def parse_telemetry_data(data, verbose=True):
+    """Build the record stored for a car telemetry packet; other packets return None."""
     if len(data) < 24:
         print("Received data is too small to contain a valid packet.")
-        return
+        return None
 
     # PacketHeader: Little Endian
     header_format = '<HBBBBQfIBB'
@@ -28,9 +32,10 @@ def parse_telemetry_data(data):
 
     packet_id = header[4]
     player_index = header[8]
-    print(f"Packet ID: {packet_id}, Size: {len(data)}")
+    if verbose:
+        print(f"Packet ID: {packet_id}, Size: {len(data)}")
 
-    if packet_id not in printed_packets:
+    if verbose and packet_id not in printed_packets:
         print(f"First time receiving packet ID {packet_id}.")
         printed_packets.add(packet_id)
 
@@ -79,7 +84,7 @@ def parse_telemetry_data(data):
     #         'lapData': lap_data
     #     })
 
-    elif packet_id == 6:  # Car Telemetry Packet
+    if packet_id == 6:  # Car Telemetry Packet
         car_format = '<HfffBbHBBH4H4B4BH4f4B'
         car_size = struct.calcsize(car_format)
         offset = header_size + (car_size * player_index)
@@ -108,11 +113,12 @@ def parse_telemetry_data(data):
         footer_offset = header_size + (car_size * 22)
         mfd_panel_index, mfd_panel_secondary, suggested_gear = struct.unpack_from('<BBb', data, footer_offset)
 
-        print(f"Suggested Gear: {suggested_gear}")
-        print("Player car telemetry:")
-        print(json.dumps(car_data, indent=2))
+        if verbose:
+            print(f"Suggested Gear: {suggested_gear}")
+            print("Player car telemetry:")
+            print(json.dumps(car_data, indent=2))
 
-        telemetry_data.append({
+        return {
             'header': {
                 'packetId': packet_id,
                 'frameIdentifier': header[7],
@@ -122,13 +128,26 @@ def parse_telemetry_data(data):
             'mfdPanelIndex': mfd_panel_index,
             'mfdPanelIndexSecondary': mfd_panel_secondary,
             'suggestedGear': suggested_gear
-        })
+        }
+
+    return None
+
+def open_session():
+    """Replace the previous session's output files with a fresh append-only sink."""
+    for path in (JSON_FILE_PATH, STREAM_FILE_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    # The writer thread keeps disk I/O off the receive loop
+    return NdjsonSink(STREAM_FILE_PATH)
 
-    # Save to file (append data)
-    with open(JSON_FILE_PATH, 'w') as json_file:
-        json.dump(telemetry_data, json_file, indent=2)
+def finish_session(telemetry_sink):
+    telemetry_sink.close()
+    count = compact_to_json(STREAM_FILE_PATH, JSON_FILE_PATH)
+    print(f"Compacted {count} records → {JSON_FILE_PATH}")
+    if telemetry_sink.dropped:
+        print(f"Dropped {telemetry_sink.dropped} records while the disk was behind")
 
-def start_udp_server():
+def start_udp_server(verbose=False, live_feed=None):
     UDP_IP = "127.0.0.1"
     UDP_PORT = 20777
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -136,9 +155,72 @@ def start_udp_server():
 
     print(f"Listening for telemetry data on {UDP_IP}:{UDP_PORT}...")
 
-    while True:
-        data, addr = sock.recvfrom(2048)
-        parse_telemetry_data(data)
+    # Periodic summary line instead of a print per datagram
+    metrics = IngestMetrics(UDP_PORT)
+    telemetry_sink = open_session()
+    metrics.sink = telemetry_sink
+
+    try:
+        while True:
+            data, addr = sock.recvfrom(2048)
+            metrics.observe_datagram(data)
+
+            started = time.perf_counter()
+            record = parse_telemetry_data(data, verbose)
+            metrics.decode_latency.record(time.perf_counter() - started)
+
+            if record:
+                if live_feed:
+                    live_feed.publish(record)
+                started = time.perf_counter()
+                telemetry_sink.write(record)
+                metrics.write_latency.record(time.perf_counter() - started)
+    except KeyboardInterrupt:
+        print("\nStopping listener...")
+    finally:
+        # Report while the socket still exists so its kernel drop counter can be read
+        metrics.report()
+        sock.close()
+        finish_session(telemetry_sink)
+
+def start_async_udp_server(drop_policy=DROP_OLDEST, live_feed=None):
+    """Run receive, decode and persistence as separate asyncio stages with bounded queues."""
+    def decode(data):
+        record = parse_telemetry_data(data, verbose=False)
+        if record and live_feed:
+            live_feed.publish(record)
+        return record
+
+    telemetry_sink = open_session()
+    metrics = IngestMetrics(20777)
+    metrics.sink = telemetry_sink
+
+    def write_records(records):
+        for record in records:
+            telemetry_sink.write(record)
+
+    try:
+        asyncio.run(run_pipeline(decode, write_records,
+                                 drop_policy=drop_policy, metrics=metrics))
+    except KeyboardInterrupt:
+        print("\nStopping listener...")
+    finally:
+        finish_session(telemetry_sink)
 
 if __name__ == "__main__":
-    start_udp_server()
+    parser = argparse.ArgumentParser(description="Record player car telemetry from F1 2021 UDP packets.")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="receive, decode and write on separate asyncio pipeline stages")
+    parser.add_argument('--drop-policy', choices=(DROP_OLDEST, DROP_NEWEST), default=DROP_OLDEST,
+                        help="what to shed when the receive queue is full (--async only)")
+    parser.add_argument('--verbose', action='store_true',
+                        help="print every packet and decoded record (slow; blocking listener only)")
+    parser.add_argument('--live-feed', action='store_true',
+                        help="forward player samples to live_dashboard.py as they arrive")
+    args = parser.parse_args()
+
+    live_feed = LiveFeedPublisher() if args.live_feed else None
+    if args.use_async:
+        start_async_udp_server(args.drop_policy, live_feed)
+    else:
+        start_udp_server(args.verbose, live_feed)